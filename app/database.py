@@ -1,19 +1,75 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from typing import Optional, Dict, Any
 import os
 from dotenv import load_dotenv
 
+from app.exceptions.domain import ConfigurationException
+from app.utils.settings import env_int, env_bool
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def default_pool_options() -> Dict[str, Any]:
+    return {
+        "pool_size": env_int("DB_POOL_SIZE", 5),
+        "max_overflow": env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def to_async_url(db_url: str) -> str:
+    scheme, sep, rest = db_url.partition("://")
+    if not sep:
+        raise ConfigurationException("DATABASE_URL", details={"reason": "Malformed database URL"})
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def create_async_db_engine(
+    db_url: Optional[str] = None,
+    pool_options: Optional[Dict[str, Any]] = None
+) -> AsyncEngine:
+    db_url = db_url or DATABASE_URL
+    if not db_url:
+        raise ConfigurationException("DATABASE_URL")
+    options = pool_options if pool_options is not None else default_pool_options()
+    return create_async_engine(to_async_url(db_url), echo=env_bool("DB_ECHO", False), **options)
+
+
+_engine: Optional[AsyncEngine] = None
 AsyncSessionLocal = sessionmaker(
-    bind=engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
 
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_async_db_engine()
+        AsyncSessionLocal.configure(bind=_engine)
+    return _engine
+
+
+async def dispose_engine():
+    global _engine
+    engine, _engine = _engine, None
+    if engine is not None:
+        await engine.dispose()
+
+
 async def get_db():
+    get_engine()
     async with AsyncSessionLocal() as session:
         yield session
@@ -3,6 +3,8 @@ from enum import Enum
 import uuid
 from datetime import datetime, timezone
 
+from app.utils.request_context import current_correlation_id
+
 
 class ErrorCode(Enum):
     # 400
@@ -13,6 +15,10 @@ class ErrorCode(Enum):
     # 403
     UNSAFE_SQL_DETECTED = "UNSAFE_SQL_DETECTED"
     UNAUTHORIZED_OPERATION = "UNAUTHORIZED_OPERATION"
+    QUERY_TOO_EXPENSIVE = "QUERY_TOO_EXPENSIVE"
+    
+    # 404
+    RESULT_NOT_FOUND = "RESULT_NOT_FOUND"
     
     # 422
     SQL_GENERATION_FAILED = "SQL_GENERATION_FAILED"
@@ -45,7 +51,7 @@ class BaseAppException(Exception):
         self.http_status = http_status
         self.details = details or {}
         self.original_exception = original_exception
-        self.correlation_id = correlation_id or str(uuid.uuid4())
+        self.correlation_id = correlation_id or current_correlation_id() or str(uuid.uuid4())
         self.timestamp = datetime.now(timezone.utc).isoformat()
     
     def to_dict(self) -> Dict[str, Any]:
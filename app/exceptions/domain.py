@@ -46,6 +46,16 @@ class InvalidRequestDataException(ValidationException):
             **kwargs
         )
 
+class ResultNotFoundException(ValidationException):
+    def __init__(self, result_id: str, **kwargs):
+        super().__init__(
+            message=f"Result '{result_id}' not found or expired; ask the question again",
+            error_code=ErrorCode.RESULT_NOT_FOUND,
+            field="result_id",
+            **kwargs
+        )
+        self.http_status = 404
+
 class UnsafeSqlException(SecurityException):
     def __init__(self, sql_query: Optional[str] = None, **kwargs):
         details = kwargs.pop('details', {})
@@ -60,6 +70,22 @@ class UnsafeSqlException(SecurityException):
             **kwargs
         )
 
+class QueryTooExpensiveException(SecurityException):
+    def __init__(self, sql_query: Optional[str] = None, estimate: Optional[Dict[str, Any]] = None, **kwargs):
+        details = kwargs.pop('details', {})
+        if sql_query:
+            details['sql_preview'] = sql_query[:50] + "..." if len(sql_query) > 50 else sql_query
+        if estimate:
+            details.update(estimate)
+        
+        super().__init__(
+            message="The generated query is too expensive to run",
+            error_code=ErrorCode.QUERY_TOO_EXPENSIVE,
+            operation="sql_execution",
+            details=details,
+            **kwargs
+        )
+
 class SqlGenerationException(ProcessingException):
     def __init__(self, question: Optional[str] = None, **kwargs):
         details = kwargs.pop('details', {})
@@ -1,15 +1,17 @@
-from fastapi import FastAPI, Request, Form, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, Request, Form, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import logging
-import os
 import json
 import io
 from dotenv import load_dotenv
-from typing import Optional
+from typing import AsyncIterator, Optional, List, Tuple
 from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
 import time
+import asyncio
 
 from app.services.base.protocols import (
     TextToSqlProtocol,
@@ -22,17 +24,40 @@ from app.utils.dependencies import (
     get_sql_query_service,
     get_voice_to_text_service,
     get_report_service,
+    init_sql_executor,
+    close_sql_executor,
+    init_openai_client,
+    close_openai_client,
+    get_runtime_stats,
+    get_sql_result_cache,
+    init_question_cache,
+    close_question_cache,
+    init_transcription_cache,
+    close_transcription_cache,
+    init_schema_catalog,
+    get_schema_catalog,
+    close_schema_catalog,
+    refresh_schema_catalog_periodically,
+    clear_caches,
+    register_result,
+    lookup_result,
 )
-from app.utils.sanitize import sanitize_rows
+from app.utils.sanitize import sanitize_value
+from app.utils.usage_accounting import default_usage_ledger, summarize
+from app.utils.request_context import current_correlation_id, start_correlation, end_correlation
+from app.utils.settings import env_float, env_int
 from app.utils.pdf_utils import (
     validate_rows_json,
     parse_headers,
     create_query_result,
     generate_pdf_response,
 )
-from app.models.query_result import QueryResult  
+from app.utils.audio_upload import receive_audio_stream, receive_audio_upload
+from app.utils.export_utils import EXPORT_ENCODERS, EXPORT_MEDIA_TYPES, export_filename, iter_sse, ws_event
+from app.models.query_result import QueryResult, BatchItem
+from app.models.input_query_dto import BatchQuestionsDto
 from fastapi.exceptions import RequestValidationError
-from app.exceptions.base import BaseAppException
+from app.exceptions.base import BaseAppException, InternalServerException
 from app.models.api_responses import add_common_responses, COMMON_RESPONSES
 from app.middleware.exception_handler import (
     app_exception_handler,
@@ -49,14 +74,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+async def start_schema_catalog() -> Optional[asyncio.Task]:
+    """Load the prompt schema from the database once and keep it in sync in the background."""
+    try:
+        catalog = init_schema_catalog()
+        if catalog is None:
+            return None
+        await catalog.refresh()
+    except Exception as e:
+        logger.error(f"Schema catalog not loaded at startup, using the built-in schema: {e}")
+        return None
+    interval = env_float("SCHEMA_REFRESH_INTERVAL", 300.0)
+    if interval <= 0:
+        return None
+    return asyncio.create_task(refresh_schema_catalog_periodically(catalog, interval))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        init_sql_executor()
+    except BaseAppException as e:
+        logger.error(f"SQL executor not initialized at startup, will retry on first request: {e}")
+    try:
+        init_openai_client()
+    except BaseAppException as e:
+        logger.error(f"OpenAI client not initialized at startup, will retry on first request: {e}")
+    init_question_cache()
+    init_transcription_cache()
+    schema_refresher = await start_schema_catalog()
+    yield
+    if schema_refresher is not None:
+        schema_refresher.cancel()
+    close_schema_catalog()
+    await close_sql_executor()
+    await close_openai_client()
+    close_question_cache()
+    close_transcription_cache()
+    default_usage_ledger.close()
+
+
 app = FastAPI(
     title="AI SQL Assistant API",
     description="API for natural language to SQL conversion with voice support",
     version="1.0.0",
-    responses=COMMON_RESPONSES
+    responses=COMMON_RESPONSES,
+    lifespan=lifespan
 )
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
+templates.env.filters["sanitize"] = sanitize_value
 
 app.add_exception_handler(BaseAppException, app_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -66,7 +134,7 @@ app.add_exception_handler(Exception, unexpected_exception_handler)
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Render the main page."""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse(request, "index.html")
 
 @app.post(
     "/ask", 
@@ -88,21 +156,149 @@ async def ask(
     if not question or question.strip() == "":
         from app.exceptions.domain import EmptyQuestionException
         raise EmptyQuestionException()
-    result = sql_query_service.process_question(question)
+    result = await sql_query_service.process_question(question)
     
-    sanitized = sanitize_rows(result.rows, headers=result.headers)
     context = {
         "request": request,
         "question": question,
         "sql": result.sql,
         "execution_time": result.execution_time_ms,
         "headers": result.headers,
-        "rows": sanitized,
+        "rows": result.rows,
         "error": result.error,
+        "truncated": result.truncated,
+        "result_id": register_result(result.sql, result.headers) if result.truncated else None,
     }
     return templates.TemplateResponse(request, "index.html", context)
 
 
+async def answer_events(events: AsyncIterator[Tuple[str, dict]]) -> AsyncIterator[Tuple[str, dict]]:
+    """Pass on answer events, registering truncated results and turning failures into an ``error`` event."""
+    headers: List[str] = []
+    try:
+        async for event, data in events:
+            if event == "columns":
+                headers = data["headers"]
+            if event == "done" and data["truncated"]:
+                data["result_id"] = register_result(data["sql"], headers)
+            yield event, data
+    except BaseAppException as e:
+        logger.warning(f"Streaming answer failed: {e}")
+        yield "error", e.to_dict()
+    except Exception as e:
+        logger.exception("Unexpected error while streaming answer")
+        yield "error", InternalServerException(
+            message="An unexpected error occurred. Please try again later.",
+            original_exception=e
+        ).to_dict()
+    finally:
+        await events.aclose()
+
+
+@app.post(
+    "/ask/stream",
+    summary="Ask a question and stream the answer",
+    description=(
+        "Server-Sent Events: sql_token while the SQL is written, sql, execution_started, "
+        "columns, rows per fetched batch, then done with timings (or error)"
+    ),
+    responses={
+        200: {
+            "description": "Success - Progress and rows streamed as Server-Sent Events",
+            "content": {"text/event-stream": {"schema": {"type": "string"}}}
+        },
+        **COMMON_RESPONSES
+    },
+    tags=["Query Processing"]
+)
+async def ask_stream(
+    question: str = Form(..., description="Natural language question about the data"),
+    sql_query_service: QueryProcessorProtocol = Depends(get_sql_query_service),
+):
+    logger.info(f"Received streaming question: {question}")
+    if not question or question.strip() == "":
+        from app.exceptions.domain import EmptyQuestionException
+        raise EmptyQuestionException()
+
+    events = sql_query_service.stream_answer(question, max_rows=env_int("SQL_MAX_ROWS", 500))
+    # Failures before the first event (e.g. the model being unreachable) still get a normal error response.
+    first = await events.__anext__()
+
+    async def stream_events():
+        yield first
+        async for event in answer_events(events):
+            yield event
+
+    return StreamingResponse(
+        iter_sse(stream_events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def batch_item_response(item: BatchItem) -> dict:
+    response = {"question": item.question, "sql": item.sql, "execution_time_ms": item.execution_time_ms}
+    if item.error is not None:
+        if isinstance(item.error, BaseAppException):
+            response["error"] = item.error.to_dict()["error"]
+        else:
+            logger.error(f"Batch question failed: {type(item.error).__name__}: {item.error}")
+            response["error"] = InternalServerException(
+                message="An unexpected error occurred. Please try again later."
+            ).to_dict()["error"]
+        return response
+    result = item.result
+    response.update({
+        "headers": result.headers,
+        "column_types": result.column_types,
+        "rows": result.rows,
+        "row_count": len(result.rows),
+        "truncated": result.truncated,
+        "result_id": register_result(item.sql, result.headers) if result.truncated else None,
+        "error": None,
+    })
+    return response
+
+
+@app.post(
+    "/api/ask/batch",
+    summary="Ask many questions at once",
+    description=(
+        "Generate SQL for a list of questions (several per model call), execute the distinct statements "
+        "concurrently and return one result or error per question, in order"
+    ),
+    responses={
+        200: {"description": "Success - One entry per question; failed questions carry an error"},
+        **COMMON_RESPONSES
+    },
+    tags=["Query Processing"]
+)
+async def ask_batch(
+    payload: BatchQuestionsDto,
+    sql_query_service: QueryProcessorProtocol = Depends(get_sql_query_service),
+):
+    max_questions = env_int("BATCH_MAX_QUESTIONS", 500)
+    if len(payload.questions) > max_questions:
+        from app.exceptions.domain import InvalidRequestDataException
+        raise InvalidRequestDataException(
+            field_name="questions",
+            reason=f"At most {max_questions} questions per batch",
+            details={"received": len(payload.questions)}
+        )
+
+    start_time = time.time()
+    items = await sql_query_service.process_batch(
+        payload.questions, max_concurrency=env_int("BATCH_MAX_CONCURRENCY", 4)
+    )
+    results = [batch_item_response(item) for item in items]
+    return {
+        "count": len(results),
+        "failed": sum(1 for result in results if result["error"] is not None),
+        "execution_time_ms": int((time.time() - start_time) * 1000),
+        "results": results,
+    }
+
+
 @app.post(
     "/ask-voice", 
     response_class=HTMLResponse,
@@ -112,60 +308,103 @@ async def ask(
         200: {"description": "Success - Voice processed and results returned"},
         **COMMON_RESPONSES
     },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {
+                            "file": {
+                                "type": "string",
+                                "format": "binary",
+                                "description": "Audio file (mp3, mp4, mpeg, mpga, m4a, wav, webm)",
+                            }
+                        },
+                    }
+                }
+            },
+        }
+    },
     tags=["Voice"]
 )
 async def ask_voice(
     request: Request,
-    file: UploadFile = File(..., description="Audio file (mp3, mp4, mpeg, mpga, m4a, wav, webm)"),
     sql_query_service: QueryProcessorProtocol = Depends(get_sql_query_service),
     voice_to_text_service: VoiceToTextProtocol = Depends(get_voice_to_text_service),
 ):
+    # The body is parsed here rather than through an UploadFile parameter so the
+    # size limit applies while the audio arrives instead of after it is stored.
+    upload = await receive_audio_upload(request)
+    try:
+        question = await voice_to_text_service.transcribe(upload.file, filename=upload.filename)
+    finally:
+        upload.close()
+    logger.info(f"Voice transcription: {question}")
 
-    if not file.filename:
-        from app.exceptions.domain import InvalidFileFormatException
-        raise InvalidFileFormatException(details={"reason": "No filename provided"})
-    
-    file_ext = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
-    if file_ext not in ['mp3', 'mp4', 'mpeg', 'mpga', 'm4a', 'wav', 'webm']:
-        from app.exceptions.domain import InvalidFileFormatException
-        raise InvalidFileFormatException(file_type=file_ext)
-
-    file_content = await file.read()
-    if len(file_content) == 0:
-        from app.exceptions.domain import InvalidFileFormatException
-        raise InvalidFileFormatException(
-            details={"reason": "Empty file", "file_size": 0}
-        )
+    result = await sql_query_service.process_question(question)
+
+    context = {
+        "request": request,
+        "question": question,
+        "sql": result.sql,
+        "execution_time": result.execution_time_ms,
+        "headers": result.headers,
+        "rows": result.rows,
+        "error": result.error,
+        "truncated": result.truncated,
+        "result_id": register_result(result.sql, result.headers) if result.truncated else None,
+    }
+    return templates.TemplateResponse(request, "index.html", context)
+
+@app.websocket("/ws/ask-voice")
+async def ask_voice_stream(
+    websocket: WebSocket,
+    sql_query_service: QueryProcessorProtocol = Depends(get_sql_query_service),
+    voice_to_text_service: VoiceToTextProtocol = Depends(get_voice_to_text_service),
+):
+    """Voice questions streamed while they are recorded.
 
-    import uuid
-    tmp_path = f"/tmp/{uuid.uuid4().hex}_{file.filename}"
+    Audio arrives in chunks during recording (see ``receive_audio_stream``),
+    so only transcription and the SQL pipeline remain once the client sends
+    ``stop``. Stage events go back on the same socket as JSON messages:
+    ``received``, ``transcript``, then the ``/ask/stream`` events. The socket
+    can carry several recordings in turn.
+    """
+    await websocket.accept()
+    token = start_correlation(websocket.headers.get("x-correlation-id"))
     try:
-        with open(tmp_path, "wb") as buf:
-            buf.write(file_content)
-        
-        question = voice_to_text_service.transcribe(tmp_path)
-        logger.info(f"Voice transcription: {question}")
-        
-        result = sql_query_service.process_question(question)
-        
-        sanitized = sanitize_rows(result.rows, headers=result.headers)
-        context = {
-            "request": request,
-            "question": question,
-            "sql": result.sql,
-            "execution_time": result.execution_time_ms,
-            "headers": result.headers,
-            "rows": sanitized,
-            "error": result.error,
-        }
-        return templates.TemplateResponse("index.html", context)
-        
+        while True:
+            try:
+                upload = await receive_audio_stream(websocket)
+                if upload is None:
+                    return
+                stopped = time.perf_counter()
+                await websocket.send_text(ws_event("received", {"filename": upload.filename, "bytes": upload.size}))
+                try:
+                    question = await voice_to_text_service.transcribe(upload.file, filename=upload.filename)
+                finally:
+                    upload.close()
+            except BaseAppException as e:
+                logger.warning(f"Voice stream failed: {e}")
+                await websocket.send_text(ws_event("error", e.to_dict()))
+                await websocket.close(code=1008 if e.http_status < 500 else 1011)
+                return
+            logger.info(f"Voice transcription: {question}")
+            await websocket.send_text(ws_event("transcript", {
+                "question": question,
+                "transcription_ms": int((time.perf_counter() - stopped) * 1000),
+            }))
+
+            events = sql_query_service.stream_answer(question, max_rows=env_int("SQL_MAX_ROWS", 500))
+            async for event, data in answer_events(events):
+                await websocket.send_text(ws_event(event, data))
+    except WebSocketDisconnect:
+        logger.info("Voice stream closed by the client")
     finally:
-        try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception as e:
-            logger.warning(f"Failed to cleanup temp file {tmp_path}: {e}")
+        end_correlation(token)
 
 @app.post(
     "/download-report-pdf",
@@ -210,6 +449,90 @@ async def download_report_pdf(
     return generate_pdf_response(pdf_bytes, question, logger)
 
 
+@app.post(
+    "/export",
+    summary="Export query results",
+    description="Convert a question to SQL and stream the full result set as CSV or NDJSON",
+    responses={
+        200: {
+            "description": "Success - Result rows streamed in the requested format",
+            "content": {
+                "text/csv": {"schema": {"type": "string"}},
+                "application/x-ndjson": {"schema": {"type": "string"}}
+            }
+        },
+        **COMMON_RESPONSES
+    },
+    tags=["Reports"]
+)
+async def export_results(
+    question: str = Form(..., description="Natural language question about the data"),
+    format: str = Form("csv", description="Export format: csv or ndjson"),
+    sql_query_service: QueryProcessorProtocol = Depends(get_sql_query_service),
+):
+    export_format = format.lower()
+    if export_format not in EXPORT_ENCODERS:
+        from app.exceptions.domain import InvalidRequestDataException
+        raise InvalidRequestDataException(
+            field_name="format",
+            reason=f"Unsupported export format '{format}'",
+            details={"supported_formats": list(EXPORT_ENCODERS)}
+        )
+
+    sql, stream = await sql_query_service.stream_question(question)
+    logger.info(f"Streaming {export_format} export for SQL: {sql}")
+
+    return StreamingResponse(
+        EXPORT_ENCODERS[export_format](stream),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_filename(question, export_format)}"'
+        }
+    )
+
+
+@app.get(
+    "/api/results/{result_id}",
+    summary="Page through query results",
+    description=(
+        "Page through the rows of a previously asked question. Without a cursor the first page is returned; "
+        "pages hold at most SQL_MAX_ROWS rows"
+    ),
+    responses={
+        200: {"description": "One page of rows and the cursor of the following page"},
+        404: {"description": "Unknown or expired result id"},
+        **COMMON_RESPONSES
+    },
+    tags=["Query Processing"]
+)
+async def result_page(
+    result_id: str,
+    cursor: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of rows in the page (100, at most SQL_MAX_ROWS)"),
+    sql_query_service: QueryProcessorProtocol = Depends(get_sql_query_service),
+):
+    registered = lookup_result(result_id)
+    if registered is None:
+        from app.exceptions.domain import ResultNotFoundException
+        raise ResultNotFoundException(result_id)
+    max_rows = env_int("SQL_MAX_ROWS", 500)
+    if limit is None:
+        limit = min(100, max_rows)
+    elif limit > max_rows:
+        from app.exceptions.domain import InvalidRequestDataException
+        raise InvalidRequestDataException(field_name="limit", reason=f"A page holds at most {max_rows} rows")
+
+    sql, headers = registered
+    page = await sql_query_service.fetch_page(sql, headers, cursor=cursor, limit=limit)
+    return {
+        "result_id": result_id,
+        "headers": page.headers,
+        "column_types": page.column_types,
+        "rows": page.rows,
+        "next_cursor": page.next_cursor,
+    }
+
+
 @app.get(
     "/health",
     summary="Health check",
@@ -236,13 +559,107 @@ async def health_check():
         )
 
 
+@app.get(
+    "/admin/metrics",
+    summary="Runtime metrics",
+    description="Connection pool and shared service statistics of this worker process",
+    responses={
+        200: {"description": "Current runtime statistics"}
+    },
+    tags=["Admin"]
+)
+async def admin_metrics():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **get_runtime_stats()
+    }
+
+
+@app.get(
+    "/admin/usage",
+    summary="LLM and Whisper usage",
+    description=(
+        "Tokens, audio seconds, estimated cost and latency of upstream calls, totalled per stage and model, "
+        "with the most expensive and slowest requests"
+    ),
+    responses={
+        200: {"description": "Usage aggregates over the selected records"}
+    },
+    tags=["Admin"]
+)
+async def admin_usage(
+    since: Optional[datetime] = Query(None, description="Only count calls made at or after this time (ISO 8601)"),
+    correlation_id: Optional[str] = Query(None, description="Only count calls made while handling this request"),
+    top: int = Query(10, ge=0, le=100, description="Number of most expensive and slowest calls to list"),
+):
+    records = await run_in_threadpool(default_usage_ledger.records, since, correlation_id)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "records": len(records),
+        **summarize(records, top=top),
+    }
+
+
+@app.post(
+    "/admin/cache/sql/invalidate",
+    summary="Invalidate cached SQL results",
+    description="Drop cached results that reference the given tables, or the whole cache when no table is given",
+    responses={
+        200: {"description": "Number of cache entries removed"}
+    },
+    tags=["Admin"]
+)
+async def invalidate_sql_cache(
+    table: Optional[List[str]] = Query(None, description="Table whose cached results should be dropped"),
+):
+    cache = get_sql_result_cache()
+    if cache is None:
+        return {"enabled": False, "removed": 0}
+    removed = cache.invalidate_tables(table) if table else cache.clear()
+    return {"enabled": True, "removed": removed}
+
+
+@app.post(
+    "/admin/cache/clear",
+    summary="Clear caches",
+    description="Drop every cached SQL result and question-to-SQL mapping of this worker",
+    responses={
+        200: {"description": "Number of entries removed per cache"}
+    },
+    tags=["Admin"]
+)
+async def clear_all_caches():
+    return {"removed": clear_caches()}
+
+
+@app.post(
+    "/admin/schema/refresh",
+    summary="Refresh the schema catalog",
+    description="Re-read the database schema now instead of waiting for the periodic refresh",
+    responses={
+        200: {"description": "Tables whose metadata changed and the catalog statistics"}
+    },
+    tags=["Admin"]
+)
+async def refresh_schema_catalog():
+    catalog = get_schema_catalog() or init_schema_catalog()
+    if catalog is None:
+        return {"enabled": False, "analyzed": []}
+    analyzed = await catalog.refresh()
+    return {"enabled": True, "analyzed": analyzed, **catalog.stats()}
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
+    # One id per request ties its log lines, usage records and error responses together.
+    correlation = start_correlation(request.headers.get("x-correlation-id"))
+    correlation_id = current_correlation_id()
 
     logger.info(
         f"Request: {request.method} {request.url}",
         extra={
+            "correlation_id": correlation_id,
             "method": request.method,
             "url": str(request.url),
             "user_agent": request.headers.get("user-agent", "unknown"),
@@ -250,12 +667,17 @@ async def log_requests(request: Request, call_next):
         }
     )
 
-    response = await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        end_correlation(correlation)
+    response.headers["X-Correlation-ID"] = correlation_id
     
     process_time = time.time() - start_time
     logger.info(
         f"Response: {response.status_code} in {process_time:.3f}s",
         extra={
+            "correlation_id": correlation_id,
             "status_code": response.status_code,
             "process_time": process_time,
             "method": request.method,
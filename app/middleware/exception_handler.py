@@ -1,12 +1,19 @@
 import logging
 import traceback
-from typing import Dict, Any, Optional
-from fastapi import Request, HTTPException
+from typing import Dict, Any, Optional, Union
+from fastapi import Request, HTTPException, WebSocket
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.websockets import WebSocketState
 
 from app.exceptions.base import BaseAppException, ErrorCode, InternalServerException
+from app.utils.export_utils import ws_event
+from app.utils.request_context import current_correlation_id
+
+
+def request_method(request: Union[Request, WebSocket]) -> str:
+    return request.scope.get("method") or request.scope["type"].upper()
 
 
 class ExceptionHandler:
@@ -23,14 +30,14 @@ class ExceptionHandler:
     
     async def handle_app_exception(
         self, 
-        request: Request, 
+        request: Union[Request, WebSocket], 
         exc: BaseAppException
-    ) -> JSONResponse:
+    ) -> Optional[JSONResponse]:
         log_data = {
             "correlation_id": exc.correlation_id,
             "error_code": exc.error_code.value,
             "path": str(request.url),
-            "method": request.method,
+            "method": request_method(request),
             "user_agent": request.headers.get("user-agent", "unknown"),
             "details": exc.details
         }
@@ -53,16 +60,28 @@ class ExceptionHandler:
             )
 
         self.increment_error_counter(exc.error_code.value)
+        if isinstance(request, WebSocket):
+            await self.close_websocket(request, exc)
+            return None
         return JSONResponse(
             status_code=exc.http_status,
             content=exc.to_dict()
         )
+
+    async def close_websocket(self, websocket: WebSocket, exc: BaseAppException):
+        """Report an error raised before or outside a WebSocket handler as an ``error`` event, then close."""
+        if websocket.application_state == WebSocketState.DISCONNECTED:
+            return
+        if websocket.application_state == WebSocketState.CONNECTING:
+            await websocket.accept()
+        await websocket.send_text(ws_event("error", exc.to_dict()))
+        await websocket.close(code=1008 if exc.http_status < 500 else 1011)
     
     async def handle_validation_error(
         self, 
-        request: Request, 
+        request: Union[Request, WebSocket], 
         exc: RequestValidationError
-    ) -> JSONResponse:
+    ) -> Optional[JSONResponse]:
         
         from app.exceptions.domain import InvalidRequestDataException
         validation_errors = []
@@ -81,9 +100,9 @@ class ExceptionHandler:
     
     async def handle_http_exception(
         self, 
-        request: Request, 
+        request: Union[Request, WebSocket], 
         exc: HTTPException
-    ) -> JSONResponse:
+    ) -> Optional[JSONResponse]:
         
         if exc.status_code == 404:
             error_code = ErrorCode.INTERNAL_SERVER_ERROR  
@@ -104,14 +123,14 @@ class ExceptionHandler:
         request: Request, 
         exc: Exception
     ) -> JSONResponse:
-        correlation_id = str(id(exc))  
+        correlation_id = current_correlation_id() or str(id(exc))
 
         self.logger.critical(
             f"Unexpected exception: {type(exc).__name__}: {str(exc)}",
             extra={
                 "correlation_id": correlation_id,
                 "path": str(request.url),
-                "method": request.method,
+                "method": request_method(request),
                 "traceback": traceback.format_exc()
             },
             exc_info=True
@@ -132,13 +151,13 @@ class ExceptionHandler:
 
 exception_handler = ExceptionHandler()
 
-async def app_exception_handler(request: Request, exc: BaseAppException):
+async def app_exception_handler(request: Union[Request, WebSocket], exc: BaseAppException):
     return await exception_handler.handle_app_exception(request, exc)
 
-async def validation_exception_handler(request: Request, exc: RequestValidationError):
+async def validation_exception_handler(request: Union[Request, WebSocket], exc: RequestValidationError):
     return await exception_handler.handle_validation_error(request, exc)
 
-async def http_exception_handler(request: Request, exc: HTTPException):
+async def http_exception_handler(request: Union[Request, WebSocket], exc: HTTPException):
     return await exception_handler.handle_http_exception(request, exc)
 
 async def unexpected_exception_handler(request: Request, exc: Exception):
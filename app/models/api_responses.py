@@ -83,6 +83,23 @@ COMMON_RESPONSES = {
                                 "sql_preview": "DELETE FROM users WHERE..."
                             }
                         }
+                    },
+                    "query_too_expensive": {
+                        "summary": "Query plan over cost limits",
+                        "value": {
+                            "error": {
+                                "code": "QUERY_TOO_EXPENSIVE",
+                                "message": "The generated query is too expensive to run",
+                                "correlation_id": "sec-456-abc",
+                                "timestamp": "2025-01-15T10:30:00Z",
+                                "blocked_operation": "sql_execution",
+                                "sql_preview": "SELECT * FROM ai_service_usage a, ai_service_usage b...",
+                                "estimated_cost": 48210377.5,
+                                "estimated_rows": 250000000,
+                                "max_cost": 1000000.0,
+                                "max_rows": 5000000
+                            }
+                        }
                     }
                 }
             }
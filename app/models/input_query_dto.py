@@ -1,7 +1,11 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class InputQueryDto(BaseModel):
     query_text: str
     source: Optional[str] = "text" 
     email: Optional[str] = None     
+
+
+class BatchQuestionsDto(BaseModel):
+    questions: List[str] = Field(..., min_length=1, description="Natural language questions about the data")
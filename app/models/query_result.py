@@ -1,6 +1,36 @@
-from typing import List, Tuple, Optional
+from itertools import islice
+from typing import List, Tuple, Optional, Sequence, Iterator, Dict, Any, Union
+
+
+class ResultSet:
+    """Rows returned by an executor: one tuple per row plus column metadata."""
+
+    __slots__ = ("headers", "rows", "column_types", "truncated")
+
+    def __init__(
+        self,
+        headers: List[str],
+        rows: List[Tuple],
+        column_types: Optional[List[str]] = None,
+        truncated: bool = False,
+    ):
+        self.headers = headers
+        self.rows = rows
+        self.column_types = column_types or []
+        self.truncated = truncated
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        headers = self.headers
+        for row in self.rows:
+            yield dict(zip(headers, row))
+
 
 class QueryResult:
+    __slots__ = ("question", "headers", "rows", "execution_time_ms", "sql", "error", "column_types", "truncated")
+
     def __init__(
         self,
         question: str,
@@ -9,6 +39,8 @@ class QueryResult:
         execution_time_ms: int,
         sql: Optional[str] = None,
         error: Optional[str] = None,
+        column_types: Optional[List[str]] = None,
+        truncated: bool = False,
     ):
         self.question = question
         self.headers = headers
@@ -16,6 +48,55 @@ class QueryResult:
         self.execution_time_ms = execution_time_ms
         self.sql = sql
         self.error = error
+        self.column_types = column_types or []
+        self.truncated = truncated
 
     def has_results(self) -> bool:
         return bool(self.headers and self.rows and not self.error)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def iter_rows(self, limit: Optional[int] = None) -> Iterator[Sequence[Any]]:
+        return iter(self.rows) if limit is None else islice(self.rows, limit)
+
+    def iter_dicts(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        headers = self.headers
+        for row in self.iter_rows(limit):
+            yield dict(zip(headers, row))
+
+    def column(self, key: Union[str, int]) -> Iterator[Any]:
+        index = key if isinstance(key, int) else self.headers.index(key)
+        return (row[index] for row in self.rows)
+
+
+class BatchItem:
+    """Outcome of one question of a batch: its SQL and result set, or the error that stopped it."""
+
+    __slots__ = ("question", "sql", "result", "error", "execution_time_ms")
+
+    def __init__(self, question: str):
+        self.question = question
+        self.sql: Optional[str] = None
+        self.result: Optional[ResultSet] = None
+        self.error: Optional[BaseException] = None
+        self.execution_time_ms: Optional[int] = None
+
+
+class ResultPage:
+    """One keyset page of a query's rows; ``next_cursor`` is None on the last page."""
+
+    __slots__ = ("headers", "rows", "column_types", "next_cursor")
+
+    def __init__(
+        self,
+        headers: List[str],
+        rows: List[Tuple],
+        column_types: Optional[List[str]] = None,
+        next_cursor: Optional[str] = None,
+    ):
+        self.headers = headers
+        self.rows = rows
+        self.column_types = column_types or []
+        self.next_cursor = next_cursor
@@ -0,0 +1,83 @@
+import inspect
+from typing import List, Sequence, Iterable, Iterator, AsyncIterable, AsyncIterator, Callable, Optional, Any
+
+
+class RowStream:
+    """Result set fetched lazily in batches from a server-side cursor."""
+
+    def __init__(
+        self,
+        headers: List[str],
+        batches: Iterable[Sequence[Sequence[Any]]],
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        self.headers = headers
+        self._batches = batches
+        self._on_close = on_close
+        self._closed = False
+
+    def iter_batches(self) -> Iterator[Sequence[Sequence[Any]]]:
+        try:
+            for batch in self._batches:
+                yield batch
+        finally:
+            self.close()
+
+    def __iter__(self) -> Iterator[Sequence[Any]]:
+        for batch in self.iter_batches():
+            yield from batch
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._on_close is not None:
+            self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncRowStream:
+    """Async counterpart of RowStream; on_close may be a plain callable or a coroutine function."""
+
+    def __init__(
+        self,
+        headers: List[str],
+        batches: AsyncIterable[Sequence[Sequence[Any]]],
+        on_close: Optional[Callable[[], Any]] = None,
+    ):
+        self.headers = headers
+        self._batches = batches
+        self._on_close = on_close
+        self._closed = False
+
+    async def iter_batches(self) -> AsyncIterator[Sequence[Sequence[Any]]]:
+        try:
+            async for batch in self._batches:
+                yield batch
+        finally:
+            await self.aclose()
+
+    async def __aiter__(self) -> AsyncIterator[Sequence[Any]]:
+        async for batch in self.iter_batches():
+            for row in batch:
+                yield row
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._on_close is not None:
+            closed = self._on_close()
+            if inspect.isawaitable(closed):
+                await closed
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -1,20 +1,32 @@
-from typing import Protocol, List, Tuple, Optional, Dict, Any
+from typing import Protocol, List, Tuple, Optional, Dict, Any, AsyncIterator, Sequence, Union, BinaryIO
 
-from app.models.query_result import QueryResult
+from app.models.query_result import BatchItem, QueryResult, ResultSet, ResultPage
+from app.models.row_stream import RowStream, AsyncRowStream
 
 class TextToSqlProtocol(Protocol):
     """Convert a natural language question into a SQL query."""
-    def generate_sql(self, question: str) -> str:
+    async def generate_sql(self, question: str) -> str:
         ...
 
 class SqlExecutorProtocol(Protocol):
     """Execute a SQL query and return the results as a list of headers and rows."""
-    def execute(self, sql: str) -> List[Tuple]: 
+    def execute(self, sql: str) -> ResultSet:
+        ...
+
+    def stream(self, sql: str, batch_size: Optional[int] = None) -> RowStream:
+        ...
+
+class AsyncSqlExecutorProtocol(Protocol):
+    """Execute a SQL query without blocking the event loop."""
+    async def execute(self, sql: str) -> ResultSet:
+        ...
+
+    async def stream(self, sql: str, batch_size: Optional[int] = None) -> AsyncRowStream:
         ...
 
 class VoiceToTextProtocol(Protocol):
-    """Transcribe voice to text."""
-    def transcribe(self, filepath: str) -> str:
+    """Transcribe voice to text from a file path, raw bytes or a readable file object."""
+    async def transcribe(self, audio: Union[str, bytes, BinaryIO], filename: Optional[str] = None) -> str:
         ...
 
 class ReportGeneratorProtocol(Protocol):
@@ -24,5 +36,19 @@ class ReportGeneratorProtocol(Protocol):
 
 class QueryProcessorProtocol(Protocol):
     """Process a natural language question and return the query result."""
-    def process_question(self, question: str) -> QueryResult:
+    async def process_question(self, question: str) -> QueryResult:
+        ...
+
+    async def stream_question(self, question: str) -> Tuple[str, AsyncRowStream]:
+        ...
+
+    def stream_answer(self, question: str, max_rows: Optional[int] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        ...
+
+    async def process_batch(self, questions: Sequence[str], max_concurrency: int = 4) -> List[BatchItem]:
+        ...
+
+    async def fetch_page(
+        self, sql: str, headers: Sequence[str], cursor: Optional[str] = None, limit: int = 100
+    ) -> ResultPage:
         ...
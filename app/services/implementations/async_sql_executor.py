@@ -0,0 +1,167 @@
+import logging
+from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import create_async_db_engine, default_pool_options
+from app.exceptions.domain import (
+    UnsafeSqlException,
+    QueryTooExpensiveException,
+    DatabaseExecutionException,
+    DatabaseConnectionException,
+)
+from app.exceptions.base import BaseAppException
+from app.models.query_result import ResultSet
+from app.models.row_stream import AsyncRowStream
+from app.services.base.protocols import AsyncSqlExecutorProtocol
+from app.utils.sql_safety import is_safe_query
+from app.utils.sql_text import apply_row_limit
+from app.utils.column_types import describe_column_types
+from app.utils.query_plan import (
+    QueryCostGuard,
+    default_cost_guard,
+    explain_sql,
+    parse_plan,
+    transaction_guard_statements,
+)
+from app.utils.settings import env_int
+
+
+class AsyncSqlExecutor(AsyncSqlExecutorProtocol):
+    def __init__(
+        self,
+        db_url: Optional[str] = None,
+        engine: Optional[AsyncEngine] = None,
+        pool_options: Optional[Dict[str, Any]] = None,
+        max_rows: Optional[int] = None,
+        cost_guard: Optional[QueryCostGuard] = None
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.pool_options = pool_options if pool_options is not None else default_pool_options()
+        self.stream_batch_size = env_int("DB_STREAM_BATCH_SIZE", 1000)
+        self.max_rows = max_rows if max_rows is not None else env_int("SQL_MAX_ROWS", 500)
+        self.cost_guard = cost_guard or default_cost_guard()
+
+        if engine is not None:
+            self.engine = engine
+            return
+
+        try:
+            self.engine = create_async_db_engine(db_url, self.pool_options)
+        except BaseAppException:
+            raise
+        except Exception as e:
+            raise DatabaseConnectionException(
+                original_exception=e,
+                details={"db_url_provided": bool(db_url)}
+            )
+
+    async def execute(self, sql: str) -> ResultSet:
+        self.logger.info(f"Executing SQL query (async): {sql}")
+
+        if not is_safe_query(sql):
+            self.logger.warning(f"Unsafe SQL blocked: {sql}")
+            raise UnsafeSqlException(sql_query=sql)
+
+        try:
+            async with self.engine.connect() as connection, connection.begin():
+                capped_sql = self._capped_sql(sql)
+                plan_record = await self._guard_transaction(connection, capped_sql)
+                result = await connection.execute(text(capped_sql))
+                headers = list(result.keys())
+                description = result.cursor.description if result.cursor is not None else None
+                rows = [tuple(row) for row in result]
+                if plan_record is not None:
+                    self.cost_guard.record_actual_rows(plan_record, len(rows))
+                truncated = bool(self.max_rows) and len(rows) > self.max_rows
+                if truncated:
+                    del rows[self.max_rows:]
+
+                self.logger.debug(f"Query returned {len(rows)} rows")
+                return ResultSet(headers, rows, describe_column_types(description, rows), truncated=truncated)
+
+        except QueryTooExpensiveException:
+            raise
+        except Exception as e:
+            self.logger.exception("Database execution error")
+            raise self._execution_error(sql, e)
+
+    async def stream(self, sql: str, batch_size: Optional[int] = None) -> AsyncRowStream:
+        self.logger.info(f"Streaming SQL query (async): {sql}")
+
+        if not is_safe_query(sql):
+            self.logger.warning(f"Unsafe SQL blocked: {sql}")
+            raise UnsafeSqlException(sql_query=sql)
+
+        batch_size = batch_size or self.stream_batch_size
+        connection = None
+        try:
+            connection = await self.engine.connect()
+            await connection.begin()
+            await self._guard_transaction(connection, sql)
+            result = await connection.stream(text(sql), execution_options={"yield_per": batch_size})
+            headers = list(result.keys())
+        except Exception as e:
+            if connection is not None:
+                await connection.close()
+            if isinstance(e, QueryTooExpensiveException):
+                raise
+            self.logger.exception("Database execution error")
+            raise self._execution_error(sql, e)
+
+        async def batches():
+            try:
+                async for partition in result.partitions(batch_size):
+                    yield partition
+            except Exception as e:
+                self.logger.exception("Database streaming error")
+                raise self._execution_error(sql, e)
+
+        async def close():
+            await result.close()
+            await connection.close()
+
+        return AsyncRowStream(headers=headers, batches=batches(), on_close=close)
+
+    async def _guard_transaction(self, connection, sql: str) -> Optional[Dict[str, Any]]:
+        if self.engine.dialect.name != "postgresql":
+            return None
+        for statement in transaction_guard_statements(self.cost_guard.statement_timeout_ms):
+            await connection.execute(text(statement))
+        if not self.cost_guard.explain:
+            return None
+        explain_output = await connection.scalar(text(explain_sql(sql)))
+        return self.cost_guard.check(sql, parse_plan(explain_output))
+
+    def plan_stats(self) -> Dict[str, Any]:
+        return self.cost_guard.stats()
+
+    def _capped_sql(self, sql: str) -> str:
+        # One extra row tells a result that hit the cap apart from one that fits exactly.
+        return apply_row_limit(sql, self.max_rows + 1) if self.max_rows else sql
+
+    def _execution_error(self, sql: str, e: Exception) -> DatabaseExecutionException:
+        return DatabaseExecutionException(
+            sql_preview=sql[:100] + "..." if len(sql) > 100 else sql,
+            original_exception=e,
+            details={
+                "error_type": type(e).__name__,
+                "query_length": len(sql)
+            }
+        )
+
+    def pool_status(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        status = {"pool_class": type(pool).__name__, **self.pool_options}
+        for key, method in (
+            ("checked_in", "checkedin"),
+            ("checked_out", "checkedout"),
+            ("overflow", "overflow"),
+        ):
+            if hasattr(pool, method):
+                status[key] = getattr(pool, method)()
+        return status
+
+    async def close(self):
+        self.logger.info("Disposing async SQL executor connection pool")
+        await self.engine.dispose()
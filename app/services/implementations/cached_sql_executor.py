@@ -0,0 +1,83 @@
+import inspect
+import logging
+from typing import Any, Dict, Iterable, Optional, Union
+
+from app.models.query_result import ResultSet
+from app.models.row_stream import RowStream, AsyncRowStream
+from app.services.base.protocols import SqlExecutorProtocol, AsyncSqlExecutorProtocol
+from app.utils.cache import TTLCache
+from app.utils.concurrency import call_maybe_async
+from app.utils.singleflight import SingleFlight
+from app.utils.sql_text import normalize_sql, referenced_tables
+
+
+class CachedSqlExecutor(AsyncSqlExecutorProtocol):
+    def __init__(
+        self,
+        executor: Union[SqlExecutorProtocol, AsyncSqlExecutorProtocol],
+        cache: TTLCache,
+        known_tables: Iterable[str],
+        max_cached_rows: int = 10000,
+        flight: Optional[SingleFlight] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.executor = executor
+        self.cache = cache
+        self.known_tables = list(known_tables)
+        self.max_cached_rows = max_cached_rows
+        self.flight = flight
+
+    async def execute(self, sql: str) -> ResultSet:
+        key = normalize_sql(sql)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.logger.info(f"SQL result cache hit: {key}")
+            return cached
+
+        if self.flight is None:
+            return await self._execute_and_cache(key, sql)
+        # Misses for the same statement while it is still running wait for that run instead of starting another.
+        return await self.flight.run(key, self._execute_and_cache, key, sql)
+
+    async def _execute_and_cache(self, key: str, sql: str) -> ResultSet:
+        result = await call_maybe_async(self.executor.execute, sql)
+
+        if isinstance(result, ResultSet) and len(result) <= self.max_cached_rows:
+            self.cache.set(key, result, tags=referenced_tables(sql, self.known_tables))
+        return result
+
+    async def stream(self, sql: str, batch_size: Optional[int] = None) -> Union[RowStream, AsyncRowStream]:
+        if batch_size is None:
+            return await call_maybe_async(self.executor.stream, sql)
+        return await call_maybe_async(self.executor.stream, sql, batch_size)
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        tables = [table.lower() for table in tables]
+        removed = self.cache.invalidate_tags(tables)
+        self.logger.info(f"Invalidated {removed} cached results for tables {tables}")
+        return removed
+
+    def clear(self) -> int:
+        return self.cache.clear()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    def flight_stats(self) -> Optional[Dict[str, Any]]:
+        return self.flight.stats() if self.flight is not None else None
+
+    @property
+    def engine(self):
+        return self.executor.engine
+
+    def pool_status(self) -> Dict[str, Any]:
+        return self.executor.pool_status()
+
+    def plan_stats(self) -> Dict[str, Any]:
+        return self.executor.plan_stats()
+
+    async def close(self):
+        self.cache.clear()
+        closed = self.executor.close()
+        if inspect.isawaitable(closed):
+            await closed
@@ -0,0 +1,73 @@
+import hashlib
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Union
+
+from app.services.base.protocols import TextToSqlProtocol
+from app.utils.cache import TTLCache, SqliteTTLCache
+from app.utils.concurrency import call_maybe_async, generate_sql_batch, iter_generated_sql
+from app.utils.sql_safety import is_safe_query
+from app.utils.sql_text import clean_generated_sql
+from app.utils.text_normalize import NORMALIZATION_VERSION, normalize_question
+
+
+class CachedTextToSql(TextToSqlProtocol):
+    def __init__(
+        self,
+        text_to_sql_service: TextToSqlProtocol,
+        cache: Union[TTLCache, SqliteTTLCache],
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.text_to_sql_service = text_to_sql_service
+        self.cache = cache
+
+    def cache_key(self, question: str) -> str:
+        fingerprint = getattr(self.text_to_sql_service, "prompt_fingerprint", "")
+        material = f"{fingerprint}\x00{NORMALIZATION_VERSION}\x00{normalize_question(question)}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def generate_sql(self, question: str) -> str:
+        key = self.cache_key(question)
+        cached = await call_maybe_async(self.cache.get, key)
+        if cached is not None:
+            self.logger.info(f"Question cache hit: {question}")
+            return cached
+
+        sql = await call_maybe_async(self.text_to_sql_service.generate_sql, question)
+
+        if is_safe_query(sql):
+            await call_maybe_async(self.cache.set, key, sql)
+        return sql
+
+    async def stream_sql(self, question: str) -> AsyncIterator[str]:
+        key = self.cache_key(question)
+        cached = await call_maybe_async(self.cache.get, key)
+        if cached is not None:
+            self.logger.info(f"Question cache hit: {question}")
+            yield cached
+            return
+
+        pieces = []
+        async for piece in iter_generated_sql(self.text_to_sql_service, question):
+            pieces.append(piece)
+            yield piece
+
+        sql = clean_generated_sql("".join(pieces))
+        if is_safe_query(sql):
+            await call_maybe_async(self.cache.set, key, sql)
+
+    async def generate_sql_batch(self, questions: Sequence[str]) -> List[Union[str, BaseException]]:
+        keys = [self.cache_key(question) for question in questions]
+        results: List[Optional[Union[str, BaseException]]] = [
+            await call_maybe_async(self.cache.get, key) for key in keys
+        ]
+        misses = [index for index, sql in enumerate(results) if sql is None]
+        if misses:
+            generated = await generate_sql_batch(self.text_to_sql_service, [questions[index] for index in misses])
+            for index, sql in zip(misses, generated):
+                results[index] = sql
+                if isinstance(sql, str) and is_safe_query(sql):
+                    await call_maybe_async(self.cache.set, keys[index], sql)
+        return results
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import os
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services.base.protocols import VoiceToTextProtocol
+from app.utils.cache import TTLCache, SqliteTTLCache
+from app.utils.concurrency import call_maybe_async
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def hash_audio_file(audio: BinaryIO) -> Tuple[str, int]:
+    """SHA-256 and size of the rest of ``audio``, read in fixed-size chunks; rewinds it afterwards."""
+    start = audio.tell()
+    digest, size = hashlib.sha256(), 0
+    try:
+        while True:
+            chunk = audio.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                return digest.hexdigest(), size
+            digest.update(chunk)
+            size += len(chunk)
+    finally:
+        audio.seek(start)
+
+
+class CachedVoiceToText(VoiceToTextProtocol):
+    """Reuses the transcript of audio whose bytes were transcribed before.
+
+    Transcripts are keyed by a SHA-256 of the uploaded bytes, so a hit skips
+    preprocessing as well as the Whisper call. Files are hashed in chunks and
+    handed to the wrapped service as they are, never loaded whole. The in-memory LRU is checked
+    first, then the optional on-disk tier, whose hits are promoted.
+    """
+
+    def __init__(
+        self,
+        voice_to_text_service: VoiceToTextProtocol,
+        cache: TTLCache,
+        disk_cache: Optional[SqliteTTLCache] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.voice_to_text_service = voice_to_text_service
+        self.cache = cache
+        self.disk_cache = disk_cache
+
+    def cache_key(self, digest: str) -> str:
+        model = getattr(self.voice_to_text_service, "MODEL", "")
+        return f"{model}:{digest}"
+
+    async def transcribe(self, audio: Union[str, bytes, BinaryIO], filename: Optional[str] = None) -> str:
+        if isinstance(audio, str):
+            try:
+                with open(audio, "rb") as audio_file:
+                    digest, size = await run_in_threadpool(hash_audio_file, audio_file)
+            except OSError:
+                # The wrapped service reports a missing or unreadable file.
+                return await self.voice_to_text_service.transcribe(audio)
+            filename = filename or os.path.basename(audio)
+        elif isinstance(audio, (bytes, bytearray)):
+            audio = bytes(audio)
+            digest, size = hashlib.sha256(audio).hexdigest(), len(audio)
+        else:
+            digest, size = await run_in_threadpool(hash_audio_file, audio)
+            name = getattr(audio, "name", None)
+            filename = filename or (name if isinstance(name, str) else None)
+
+        key = self.cache_key(digest)
+        transcript = self.cache.get(key)
+        if transcript is not None:
+            self.logger.info(f"Transcription cache hit (memory): {size} bytes")
+            return transcript
+        if self.disk_cache is not None:
+            transcript = await call_maybe_async(self.disk_cache.get, key)
+            if transcript is not None:
+                self.logger.info(f"Transcription cache hit (disk): {size} bytes")
+                self.cache.set(key, transcript)
+                return transcript
+
+        transcript = await self.voice_to_text_service.transcribe(audio, filename=filename)
+        self.cache.set(key, transcript)
+        if self.disk_cache is not None:
+            await call_maybe_async(self.disk_cache.set, key, transcript)
+        return transcript
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return tiered_cache_stats(self.cache, self.disk_cache)
+
+
+def tiered_cache_stats(cache: TTLCache, disk_cache: Optional[SqliteTTLCache] = None) -> Dict[str, Any]:
+    """Hit ratios of each tier and overall; every lookup reaches memory, only its misses reach disk."""
+    memory = cache.stats()
+    lookups = memory["hits"] + memory["misses"]
+    stats: Dict[str, Any] = {"lookups": lookups, "memory_hits": memory["hits"], "disk_hits": 0, "memory": memory}
+    if disk_cache is not None:
+        stats["disk"] = disk_cache.stats()
+        stats["disk_hits"] = stats["disk"]["hits"]
+    hits = stats["memory_hits"] + stats["disk_hits"]
+    stats["misses"] = lookups - hits
+    stats["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+    return stats
@@ -1,38 +1,107 @@
 from ast import Tuple
 import logging
 from langchain_community.utilities.sql_database import SQLDatabase
-from typing import Protocol, List, Dict, Any
+from typing import Protocol, List, Dict, Any, Optional
 from dotenv import load_dotenv
 import os
-from sqlalchemy import text
+import threading
+from sqlalchemy import text, event
 
 from app.exceptions.domain import (
     UnsafeSqlException,
+    QueryTooExpensiveException,
     DatabaseExecutionException,
     DatabaseConnectionException,
     ConfigurationException
 )
 from app.services.base.protocols import SqlExecutorProtocol
+from app.database import default_pool_options
+from app.models.query_result import ResultSet
+from app.models.row_stream import RowStream
+from app.utils.settings import env_int
+from app.utils.sql_safety import is_safe_query
+from app.utils.sql_text import apply_row_limit
+from app.utils.column_types import describe_column_types
+from app.utils.query_plan import (
+    QueryCostGuard,
+    default_cost_guard,
+    explain_sql,
+    parse_plan,
+    transaction_guard_statements,
+)
 load_dotenv()
 
+
 class LangChainExecutor(SqlExecutorProtocol):
-    def __init__(self, db_url: str = None):
+    INCLUDE_TABLES = ["ai_services", "ai_projects", "ai_service_usage"]
+
+    def __init__(
+        self,
+        db_url: str = None,
+        pool_options: Optional[Dict[str, Any]] = None,
+        max_rows: Optional[int] = None,
+        cost_guard: Optional[QueryCostGuard] = None
+    ):
         self.logger = logging.getLogger(__name__)
         
         db_url = db_url or os.getenv("DATABASE_URL")
         if not db_url:
             raise ConfigurationException("DATABASE_URL")
         
+        self.pool_options = pool_options if pool_options is not None else default_pool_options()
+        self.stream_batch_size = env_int("DB_STREAM_BATCH_SIZE", 1000)
+        self.max_rows = max_rows if max_rows is not None else env_int("SQL_MAX_ROWS", 500)
+        self.cost_guard = cost_guard or default_cost_guard()
+        self._pool_events = {"connects": 0, "checkouts": 0, "invalidations": 0}
+        self._pool_events_lock = threading.Lock()
+        
         try:
-            self.db = SQLDatabase.from_uri(db_url, include_tables=["ai_services", "ai_projects", "ai_service_usage"])
+            self.db = SQLDatabase.from_uri(
+                db_url,
+                include_tables=self.INCLUDE_TABLES,
+                lazy_table_reflection=True,
+                engine_args=dict(self.pool_options)
+            )
             self.engine = self.db._engine
         except Exception as e:
             raise DatabaseConnectionException(
                 original_exception=e,
                 details={"db_url_provided": bool(db_url)}
             )
+        
+        self._register_pool_listeners()
+    
+    def _register_pool_listeners(self):
+        try:
+            event.listen(self.engine, "connect", lambda *_: self._count_pool_event("connects"))
+            event.listen(self.engine, "checkout", lambda *_: self._count_pool_event("checkouts"))
+            event.listen(self.engine, "invalidate", lambda *_: self._count_pool_event("invalidations"))
+        except Exception as e:
+            self.logger.debug(f"Pool event listeners not registered: {e}")
+    
+    def _count_pool_event(self, name: str):
+        with self._pool_events_lock:
+            self._pool_events[name] += 1
+    
+    def pool_status(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        status = {"pool_class": type(pool).__name__, **self.pool_options}
+        for key, method in (
+            ("checked_in", "checkedin"),
+            ("checked_out", "checkedout"),
+            ("overflow", "overflow"),
+        ):
+            if hasattr(pool, method):
+                status[key] = getattr(pool, method)()
+        with self._pool_events_lock:
+            status.update(self._pool_events)
+        return status
+    
+    def close(self):
+        self.logger.info("Disposing SQL executor connection pool")
+        self.engine.dispose()
     
-    def execute(self, sql: str) -> List[Tuple]:
+    def execute(self, sql: str) -> ResultSet:
         self.logger.info(f"Executing SQL query: {sql}")
         
         if not self._is_safe_query(sql):
@@ -40,29 +109,99 @@ class LangChainExecutor(SqlExecutorProtocol):
             raise UnsafeSqlException(sql_query=sql)
         
         try:
-            with self.engine.connect() as connection:
-                result = connection.execute(text(sql))
-                columns = result.keys()
-                rows = [dict(zip(columns, row)) for row in result.fetchall()]
+            with self.engine.connect() as connection, connection.begin():
+                capped_sql = self._capped_sql(sql)
+                plan_record = self._guard_transaction(connection, capped_sql)
+                result = connection.execute(text(capped_sql))
+                headers = list(result.keys())
+                description = result.cursor.description if result.cursor is not None else None
+                rows = [tuple(row) for row in result]
+                if plan_record is not None:
+                    self.cost_guard.record_actual_rows(plan_record, len(rows))
+                truncated = bool(self.max_rows) and len(rows) > self.max_rows
+                if truncated:
+                    del rows[self.max_rows:]
                 
                 self.logger.debug(f"Query returned {len(rows)} rows")
-                return rows
+                return ResultSet(headers, rows, describe_column_types(description, rows), truncated=truncated)
                 
+        except QueryTooExpensiveException:
+            raise
         except Exception as e:
             self.logger.exception("Database execution error")
-            raise DatabaseExecutionException(
-                sql_preview=sql[:100] + "..." if len(sql) > 100 else sql,
-                original_exception=e,
-                details={
-                    "error_type": type(e).__name__,
-                    "query_length": len(sql)
-                }
-            )
+            raise self._execution_error(sql, e)
+    
+    def stream(self, sql: str, batch_size: Optional[int] = None) -> RowStream:
+        self.logger.info(f"Streaming SQL query: {sql}")
+        
+        if not self._is_safe_query(sql):
+            self.logger.warning(f"Unsafe SQL blocked: {sql}")
+            raise UnsafeSqlException(sql_query=sql)
+        
+        batch_size = batch_size or self.stream_batch_size
+        connection = None
+        try:
+            connection = self.engine.connect()
+            connection.begin()
+            self._guard_transaction(connection, sql)
+            result = connection.execution_options(
+                stream_results=True,
+                yield_per=batch_size
+            ).execute(text(sql))
+            headers = list(result.keys())
+        except Exception as e:
+            if connection is not None:
+                connection.close()
+            if isinstance(e, QueryTooExpensiveException):
+                raise
+            self.logger.exception("Database execution error")
+            raise self._execution_error(sql, e)
+        
+        def batches():
+            try:
+                yield from result.partitions(batch_size)
+            except Exception as e:
+                self.logger.exception("Database streaming error")
+                raise self._execution_error(sql, e)
+        
+        def close():
+            result.close()
+            connection.close()
+        
+        return RowStream(headers=headers, batches=batches(), on_close=close)
+    
+    def _guard_transaction(self, connection, sql: str) -> Optional[Dict[str, Any]]:
+        """Make the open transaction read-only with a statement timeout and check the plan.
+        
+        Only PostgreSQL reports planner costs; other dialects run unguarded.
+        """
+        if self.engine.dialect.name != "postgresql":
+            return None
+        for statement in transaction_guard_statements(self.cost_guard.statement_timeout_ms):
+            connection.execute(text(statement))
+        if not self.cost_guard.explain:
+            return None
+        explain_output = connection.execute(text(explain_sql(sql))).scalar()
+        return self.cost_guard.check(sql, parse_plan(explain_output))
+    
+    def plan_stats(self) -> Dict[str, Any]:
+        return self.cost_guard.stats()
+    
+    def _capped_sql(self, sql: str) -> str:
+        # One extra row tells a result that hit the cap apart from one that fits exactly.
+        return apply_row_limit(sql, self.max_rows + 1) if self.max_rows else sql
+    
+    def _execution_error(self, sql: str, e: Exception) -> DatabaseExecutionException:
+        return DatabaseExecutionException(
+            sql_preview=sql[:100] + "..." if len(sql) > 100 else sql,
+            original_exception=e,
+            details={
+                "error_type": type(e).__name__,
+                "query_length": len(sql)
+            }
+        )
     
     def _is_safe_query(self, sql: str) -> bool:
-        normalized_sql = sql.strip().upper()
-        return (normalized_sql.startswith("SELECT") and
-                all(keyword not in normalized_sql for keyword in
-                    ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "CREATE", "EXEC", "EXECUTE"]))
+        return is_safe_query(sql)
 
 
@@ -1,7 +1,9 @@
+import asyncio
+import hashlib
+import json
 import logging
 import openai
-import os
-from typing import Protocol
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
 
 from app.exceptions.domain import (
     SqlGenerationException,
@@ -9,8 +11,21 @@ from app.exceptions.domain import (
     ConfigurationException
 )
 from app.services.base.protocols import TextToSqlProtocol
+from app.utils.cache import TTLCache
+from app.utils.openai_client import create_openai_client
+from app.utils.prompt_cache import default_prompt_cache_stats
+from app.utils.resilience import ResilientCaller, resilient_call
+from app.utils.schema_catalog import SchemaCatalog
+from app.utils.schema_pruning import SchemaPruner
+from app.utils.sql_text import clean_generated_sql, referenced_tables
+from app.utils.settings import env_float, env_int
+from app.utils.usage_accounting import default_usage_ledger
+
+# Built system prompts by schema; a handful of entries covers every pruned table selection.
+_system_prompts = TTLCache(max_entries=64)
 
 class OpenAITextToSql(TextToSqlProtocol):
+    # Fallback for when the schema catalog has not been loaded from the database.
     DATABASE_SCHEMA = """
 Table ai_services (
     id: int,
@@ -46,23 +61,48 @@ Table ai_service_usage (
 )
 """
 
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
-            raise ConfigurationException("OPENAI_API_KEY")
-        
-        openai.api_key = api_key
-        
-    def generate_sql(self, question: str) -> str:
-        self.logger.info(f"Generating SQL for question: {question}")
-        
-        prompt = f"""
-You are an SQL expert. Convert the question to an SQL query using the tables provided below.
+    MODEL = "gpt-4o"
+    PROMPT_VERSION = "2"
 
-SCHEMA:
-{self.DATABASE_SCHEMA}
+    EXAMPLES = [
+        (
+            "Full usage report for all services and users",
+            "SELECT u.prompt_tokens, u.completion_tokens, u.usage_date, COALESCE(s.name, 'Unknown') AS service_name, u.user_name, COALESCE(p.client_name, 'Unknown') AS client_name, COALESCE(p.country, 'Unknown') AS country\n"
+            "FROM ai_service_usage u\n"
+            "LEFT JOIN ai_services s ON u.service_id = s.id\n"
+            "LEFT JOIN ai_projects p ON u.client_id = p.id;",
+        ),
+        (
+            "All active user by total token usage",
+            "SELECT u.user_name, SUM(u.prompt_tokens + u.completion_tokens) AS total_tokens\n"
+            "FROM ai_service_usage u\n"
+            "LEFT JOIN ai_services s ON u.service_id = s.id\n"
+            "WHERE s.available = TRUE OR s.available IS NULL\n"
+            "GROUP BY u.user_name;",
+        ),
+        (
+            "How many times each model was used?",
+            "SELECT COALESCE(s.model, 'Unknown') AS model, COUNT(u.id) AS usage_count\n"
+            "FROM ai_service_usage u\n"
+            "LEFT JOIN ai_services s ON u.service_id = s.id\n"
+            "GROUP BY s.model;",
+        ),
+        (
+            "All countries where clients have used any service",
+            "SELECT DISTINCT COALESCE(p.country, 'Unknown') AS country\n"
+            "FROM ai_projects p\n"
+            "LEFT JOIN ai_service_usage u ON p.id = u.client_id;",
+        ),
+        (
+            "Show usages where no project is associated",
+            "SELECT u.* FROM ai_service_usage u WHERE u.client_id IS NULL;",
+        ),
+    ]
+
+    # Everything except the question lives in the system message, which is built
+    # once per schema and reused byte for byte so the provider's prompt cache
+    # can serve it as a prefix. Parts that vary least come first.
+    SYSTEM_TEMPLATE = """You are an SQL expert. Convert the question to an SQL query using the tables provided below.
 
 INSTRUCTIONS:
 - Use the correct tables based on context.
@@ -73,46 +113,130 @@ INSTRUCTIONS:
 - Date format is YYYY-MM-DD.
 - Ensure the query is compatible with PostgreSQL.
 
+SCHEMA:
+{schema}
+
 EXAMPLES:
-Question: Full usage report for all services and users
-SQL: SELECT u.prompt_tokens, u.completion_tokens, u.usage_date, COALESCE(s.name, 'Unknown') AS service_name, u.user_name, COALESCE(p.client_name, 'Unknown') AS client_name, COALESCE(p.country, 'Unknown') AS country
-FROM ai_service_usage u
-LEFT JOIN ai_services s ON u.service_id = s.id
-LEFT JOIN ai_projects p ON u.client_id = p.id;
-
-Question: All active user by total token usage
-SQL: SELECT u.user_name, SUM(u.prompt_tokens + u.completion_tokens) AS total_tokens
-FROM ai_service_usage u
-LEFT JOIN ai_services s ON u.service_id = s.id
-WHERE s.available = TRUE OR s.available IS NULL
-GROUP BY u.user_name;
-
-Question: How many times each model was used?
-SQL: SELECT COALESCE(s.model, 'Unknown') AS model, COUNT(u.id) AS usage_count
-FROM ai_service_usage u
-LEFT JOIN ai_services s ON u.service_id = s.id
-GROUP BY s.model;
-
-Question: All countries where clients have used any service
-SQL: SELECT DISTINCT COALESCE(p.country, 'Unknown') AS country
-FROM ai_projects p
-LEFT JOIN ai_service_usage u ON p.id = u.client_id;
-
-Question: Show usages where no project is associated
-SQL: SELECT u.* FROM ai_service_usage u WHERE u.client_id IS NULL;
-
-QUESTION: {question}
+{examples}
+"""
+
+    QUESTION_TEMPLATE = """{similar_examples}QUESTION: {question}
 SQL:
 """
+
+    # Several questions per call; the reply is a JSON object so each SQL maps back to its question.
+    BATCH_TEMPLATE = """Write one SQL query for each numbered question below.
+Reply with a JSON object of the form {{"queries": [{{"id": <question number>, "sql": "<query>"}}]}} covering every question.
+
+{questions}
+"""
+
+    def __init__(
+        self,
+        client: Optional[openai.AsyncOpenAI] = None,
+        timeout: Optional[float] = None,
+        schema_catalog: Optional[SchemaCatalog] = None,
+        schema_pruner: Optional[SchemaPruner] = None,
+        resilience: Optional[ResilientCaller] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.client = client or create_openai_client()
+        self.timeout = timeout if timeout is not None else env_float("OPENAI_SQL_TIMEOUT", 30.0)
+        self.schema_catalog = schema_catalog
+        self.schema_pruner = schema_pruner
+        self.resilience = resilience
+        self.batch_size = max(1, batch_size if batch_size is not None else env_int("OPENAI_SQL_BATCH_SIZE", 10))
         
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                max_tokens=150
+    @property
+    def schema(self) -> str:
+        if self.schema_catalog is not None and self.schema_catalog.ready:
+            return self.schema_catalog.render()
+        return self.DATABASE_SCHEMA
+        
+    @property
+    def prompt_fingerprint(self) -> str:
+        """Identifies the model, schema and prompt wording that produced a generated query."""
+        catalog_ready = self.schema_catalog is not None and self.schema_catalog.ready
+        material = "\x00".join([
+            self.MODEL,
+            self.PROMPT_VERSION,
+            # The catalog's fingerprint covers its structure only, not data-dependent statistics.
+            f"catalog:{self.schema_catalog.fingerprint}" if catalog_ready else self.DATABASE_SCHEMA,
+            self.SYSTEM_TEMPLATE,
+            self.QUESTION_TEMPLATE,
+            repr(self.EXAMPLES),
+            "pruned" if self.schema_pruner is not None else "full",
+        ])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+    def build_messages(self, question: str, examples: Optional[Sequence[Tuple[str, str]]] = None) -> List[Dict[str, str]]:
+        schema, prompt_examples = self.schema, self.EXAMPLES
+        pruned = self.schema_pruner.prune(question) if self.schema_pruner is not None else None
+        if pruned is not None:
+            # Keep only the examples that can be answered from the tables left in the schema.
+            selected = set(pruned.tables)
+            schema = pruned.schema
+            prompt_examples = [
+                (example_question, example_sql) for example_question, example_sql in self.EXAMPLES
+                if referenced_tables(example_sql, self.schema_pruner.catalog.tables) <= selected
+            ]
+        system_prompt = self.system_prompt(schema, prompt_examples)
+        question_prompt = self.QUESTION_TEMPLATE.format(
+            similar_examples="".join(
+                f"Question: {example_question}\nSQL: {example_sql}\n\n"
+                for example_question, example_sql in examples or ()
+            ),
+            question=question,
+        )
+        if pruned is not None:
+            full_system_prompt = self.system_prompt(self.schema, self.EXAMPLES)
+            self.schema_pruner.record(full_system_prompt + question_prompt, system_prompt + question_prompt)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question_prompt},
+        ]
+
+    def system_prompt(self, schema: str, prompt_examples: Sequence[Tuple[str, str]]) -> str:
+        """The static prompt prefix for a schema, built once and then reused as the same string."""
+        key = (self.PROMPT_VERSION, self.SYSTEM_TEMPLATE, schema, tuple(prompt_examples))
+        prompt = _system_prompts.get(key)
+        if prompt is None:
+            prompt = self.SYSTEM_TEMPLATE.format(
+                schema=schema.strip("\n"),
+                examples="\n\n".join(
+                    f"Question: {example_question}\nSQL: {example_sql}"
+                    for example_question, example_sql in prompt_examples
+                ),
             )
+            _system_prompts.set(key, prompt)
+            default_prompt_cache_stats.record_prefix_build()
+        return prompt
+
+    async def generate_sql(self, question: str, examples: Optional[Sequence[Tuple[str, str]]] = None) -> str:
+        self.logger.info(f"Generating SQL for question: {question}")
+        
+        messages = self.build_messages(question, examples)
+        
+        try:
+            with default_usage_ledger.track("sql", self.MODEL, question=question) as usage_entry:
+                response = await resilient_call(
+                    self.resilience,
+                    lambda timeout: self.client.chat.completions.create(
+                        model=self.MODEL,
+                        messages=messages,
+                        temperature=0,
+                        max_tokens=150,
+                        timeout=timeout
+                    ),
+                    self.timeout
+                )
+                usage_entry.usage = getattr(response, "usage", None)
        
+            cached_tokens = default_prompt_cache_stats.record_usage(getattr(response, "usage", None))
+            if cached_tokens:
+                self.logger.debug(f"Prompt cache served {cached_tokens} tokens")
+            
             content = response.choices[0].message.content
             if not content or content.isspace():
                 raise SqlGenerationException(
@@ -120,13 +244,12 @@ SQL:
                     details={"reason": "OpenAI returned empty content"}
                 )
                 
-            if content.startswith("```sql"):
-                content = content.replace("```sql", "").replace("```", "").strip()
-            
-            content = content.strip()
+            content = clean_generated_sql(content)
             self.logger.debug(f"Generated SQL: {content}")
             return content
             
+        except OpenAIServiceException:
+            raise
         except openai.APIError as e:
             self.logger.error(f"OpenAI API error: {e}")
             raise OpenAIServiceException(
@@ -147,3 +270,133 @@ SQL:
                     "question_length": len(question)
                 }
             )
+
+    async def stream_sql(
+        self,
+        question: str,
+        examples: Optional[Sequence[Tuple[str, str]]] = None
+    ) -> AsyncIterator[str]:
+        """Yield the SQL text as the model produces it; join and clean_generated_sql the pieces for the query."""
+        self.logger.info(f"Streaming SQL for question: {question}")
+        messages = self.build_messages(question, examples)
+        produced = False
+        
+        try:
+            with default_usage_ledger.track("sql_stream", self.MODEL, question=question) as usage_entry:
+                # Only the request is retried; once tokens flow they are passed on as they come.
+                stream = await resilient_call(
+                    self.resilience,
+                    lambda timeout: self.client.chat.completions.create(
+                        model=self.MODEL,
+                        messages=messages,
+                        temperature=0,
+                        max_tokens=150,
+                        timeout=timeout,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    ),
+                    self.timeout,
+                    hedge=False
+                )
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        usage_entry.usage = chunk.usage
+                        default_prompt_cache_stats.record_usage(chunk.usage)
+                    for choice in chunk.choices or ():
+                        piece = choice.delta.content
+                        if piece:
+                            produced = produced or not piece.isspace()
+                            yield piece
+        except openai.APIError as e:
+            self.logger.error(f"OpenAI API error: {e}")
+            raise OpenAIServiceException(
+                api_error=str(e),
+                original_exception=e,
+                details={
+                    "question_length": len(question),
+                    "api_error_type": type(e).__name__
+                }
+            )
+        
+        if not produced:
+            raise SqlGenerationException(
+                question=question,
+                details={"reason": "OpenAI returned empty content"}
+            )
+
+    def build_batch_messages(self, questions: Sequence[str]) -> List[Dict[str, str]]:
+        # Same system prefix as single questions, so batches hit the provider's prompt cache too.
+        return [
+            {"role": "system", "content": self.system_prompt(self.schema, self.EXAMPLES)},
+            {"role": "user", "content": self.BATCH_TEMPLATE.format(
+                questions="\n".join(f"{number}. {' '.join(question.split())}" for number, question in enumerate(questions, 1))
+            )},
+        ]
+
+    async def generate_sql_batch(self, questions: Sequence[str]) -> List[Union[str, BaseException]]:
+        chunks = [questions[start:start + self.batch_size] for start in range(0, len(questions), self.batch_size)]
+        answers = await asyncio.gather(*(self._generate_chunk(chunk) for chunk in chunks))
+        return [sql for chunk in answers for sql in chunk]
+
+    async def _generate_chunk(self, questions: Sequence[str]) -> List[Union[str, BaseException]]:
+        if len(questions) == 1:
+            try:
+                return [await self.generate_sql(questions[0])]
+            except Exception as e:
+                return [e]
+        
+        self.logger.info(f"Generating SQL for a batch of {len(questions)} questions")
+        messages = self.build_batch_messages(questions)
+        try:
+            with default_usage_ledger.track("sql_batch", self.MODEL, question=" | ".join(questions)) as usage_entry:
+                response = await resilient_call(
+                    self.resilience,
+                    lambda timeout: self.client.chat.completions.create(
+                        model=self.MODEL,
+                        messages=messages,
+                        temperature=0,
+                        max_tokens=150 * len(questions),
+                        response_format={"type": "json_object"},
+                        timeout=timeout
+                    ),
+                    self.timeout
+                )
+                usage_entry.usage = getattr(response, "usage", None)
+            default_prompt_cache_stats.record_usage(getattr(response, "usage", None))
+            payload = json.loads(response.choices[0].message.content or "")
+            answered = {int(item["id"]): item.get("sql") for item in payload["queries"]}
+        except OpenAIServiceException as e:
+            return self._batch_errors(questions, e, e.details)
+        except openai.APIError as e:
+            self.logger.error(f"OpenAI API error: {e}")
+            return self._batch_errors(questions, e, {"api_error": str(e), "api_error_type": type(e).__name__})
+        except (ValueError, TypeError, KeyError) as e:
+            self.logger.warning(f"Unreadable batch response ({type(e).__name__}), asking one question at a time")
+            answers = await asyncio.gather(*(self._generate_chunk([question]) for question in questions))
+            return [sql for chunk in answers for sql in chunk]
+        
+        results: List[Union[str, BaseException]] = []
+        for number, question in enumerate(questions, 1):
+            sql = answered.get(number)
+            if isinstance(sql, str) and sql.strip():
+                results.append(clean_generated_sql(sql))
+            else:
+                results.append(SqlGenerationException(
+                    question=question,
+                    details={"reason": "Question missing from the batch response"}
+                ))
+        return results
+
+    @staticmethod
+    def _batch_errors(
+        questions: Sequence[str], cause: Exception, details: Dict[str, Any]
+    ) -> List[BaseException]:
+        # One exception per question: a shared instance would carry one traceback
+        # and any state attached to it later into every item of the batch.
+        return [
+            OpenAIServiceException(
+                original_exception=cause,
+                details={**details, "batch_size": len(questions), "question_preview": question[:100]}
+            )
+            for question in questions
+        ]
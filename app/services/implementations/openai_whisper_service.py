@@ -1,81 +1,150 @@
+import asyncio
 import logging
 import openai
 import os
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
 from app.exceptions.domain import (
     VoiceTranscriptionException,
     OpenAIServiceException,
     ConfigurationException,
     InvalidFileFormatException
 )
+from starlette.concurrency import run_in_threadpool
 from app.services.base.protocols import VoiceToTextProtocol  
+from app.utils.audio_preprocessing import AudioPreprocessor, stitch_transcripts
+from app.utils.audio_upload import WHISPER_MAX_BYTES
+from app.utils.openai_client import create_openai_client
+from app.utils.resilience import ResilientCaller, resilient_call
+from app.utils.settings import env_float
+from app.utils.usage_accounting import default_usage_ledger
 
 class OpenAIWhisperService(VoiceToTextProtocol):  
-    def __init__(self):
+    MODEL = "whisper-1"
+
+    def __init__(
+        self,
+        client: Optional[openai.AsyncOpenAI] = None,
+        timeout: Optional[float] = None,
+        resilience: Optional[ResilientCaller] = None,
+        preprocessor: Optional[AudioPreprocessor] = None,
+        max_chunk_seconds: Optional[float] = None,
+        max_parallel_chunks: int = 4
+    ):
         self.logger = logging.getLogger(__name__)
-        
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
-            raise ConfigurationException("OPENAI_API_KEY")
-        
-        openai.api_key = api_key
+        self.client = client or create_openai_client()
+        self.timeout = timeout if timeout is not None else env_float("OPENAI_WHISPER_TIMEOUT", 60.0)
+        self.resilience = resilience
+        self.preprocessor = preprocessor
+        self.max_chunk_seconds = max_chunk_seconds
+        self.max_parallel_chunks = max(1, max_parallel_chunks)
     
-    def transcribe(self, audio_file_path: str) -> str:
-        self.logger.info(f"Transcribing audio file: {audio_file_path}")
-        
+    def _read_path(self, audio_file_path: str) -> Tuple[Tuple[str, bytes], Dict[str, Any]]:
         if not os.path.exists(audio_file_path):
             raise VoiceTranscriptionException(
                 file_info={"file_path": audio_file_path, "error": "File not found"}
             )
-        
         try:
-            file_size = os.path.getsize(audio_file_path)
-            if file_size == 0:
-                raise VoiceTranscriptionException(
-                    file_info={"file_path": audio_file_path, "file_size": file_size, "error": "Empty file"}
-                )
-            if file_size > 25 * 1024 * 1024:  
-                raise VoiceTranscriptionException(
-                    file_info={"file_path": audio_file_path, "file_size": file_size, "error": "File too large (>25MB)"}
-                )
+            with open(audio_file_path, "rb") as audio_file:
+                data = audio_file.read()
         except OSError as e:
             raise VoiceTranscriptionException(
                 file_info={"file_path": audio_file_path, "error": f"Cannot access file: {e}"},
                 original_exception=e
             )
-        
+        return (os.path.basename(audio_file_path), data), {"file_path": audio_file_path, "file_size": len(data)}
+
+    async def _transcribe_chunk(self, upload: Tuple[str, bytes]) -> str:
+        with default_usage_ledger.track("transcription", self.MODEL) as usage_entry:
+            # verbose_json reports the audio duration, which is what Whisper bills by.
+            response = await resilient_call(
+                self.resilience,
+                lambda timeout: self.client.audio.transcriptions.create(
+                    model=self.MODEL,
+                    file=upload,
+                    response_format="verbose_json",
+                    language="en",
+                    timeout=timeout
+                ),
+                self.timeout
+            )
+            usage_entry.audio_seconds = getattr(response, "duration", None)
+        return getattr(response, "text", None) or ""
+
+    async def _transcribe_chunks(self, chunks: List[Tuple[str, bytes]]) -> List[str]:
+        """Transcribe chunks concurrently, at most ``max_parallel_chunks`` at a time, keeping their order."""
+        semaphore = asyncio.Semaphore(self.max_parallel_chunks)
+
+        async def transcribe_one(chunk: Tuple[str, bytes]) -> str:
+            async with semaphore:
+                return await self._transcribe_chunk(chunk)
+
+        tasks = [asyncio.ensure_future(transcribe_one(chunk)) for chunk in chunks]
         try:
-            with open(audio_file_path, "rb") as audio_file:
-                transcript = openai.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text",
-                    language="en"
-                )
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # One failed chunk fails the transcript; stop paying for the others.
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def transcribe(self, audio: Union[str, bytes, BinaryIO], filename: Optional[str] = None) -> str:
+        """Transcribe a file path, raw bytes or a readable file object; ``filename`` names the upload's format."""
+        if isinstance(audio, str):
+            self.logger.info(f"Transcribing audio file: {audio}")
+            # Read once so retried and hedged requests each upload the same bytes.
+            upload, file_info = await run_in_threadpool(self._read_path, audio)
+        else:
+            # Uploads over the spool size live on disk, so file objects are read off the event loop.
+            data = bytes(audio) if isinstance(audio, (bytes, bytearray)) else await run_in_threadpool(audio.read)
+            name = filename or getattr(audio, "name", None)
+            name = os.path.basename(name) if isinstance(name, str) and name else "audio.webm"
+            self.logger.info(f"Transcribing uploaded audio: {name}")
+            upload, file_info = (name, data), {"file_name": name, "file_size": len(data)}
+
+        if file_info["file_size"] == 0:
+            raise VoiceTranscriptionException(file_info={**file_info, "error": "Empty file"})
+
+        chunks, overlapped = [upload], []
+        if self.preprocessor is not None:
+            audio = await run_in_threadpool(self.preprocessor.process, upload[1], upload[0], self.max_chunk_seconds)
+            self.logger.info(f"Preprocessed audio: {audio.stats}")
+            if not audio.speech:
+                self.logger.info(f"No speech detected in {upload[0]}, sending the original audio")
+            chunks, overlapped = audio.chunks, audio.overlapped
+
+        file_size = max(len(data) for _, data in chunks)
+        if file_size > WHISPER_MAX_BYTES:
+            raise VoiceTranscriptionException(file_info={**file_info, "error": "File too large (>25MB)"})
+
+        try:
+            if len(chunks) == 1:
+                transcript = await self._transcribe_chunk(chunks[0])
+            else:
+                self.logger.info(f"Transcribing {len(chunks)} chunks, {self.max_parallel_chunks} at a time")
+                transcript = stitch_transcripts(await self._transcribe_chunks(chunks), overlapped)
             
             if not transcript or transcript.strip() == "":
                 raise VoiceTranscriptionException(
-                    file_info={"file_path": audio_file_path, "file_size": file_size},
+                    file_info=file_info,
                     details={"reason": "No speech detected in audio"}
                 )
             
             self.logger.info(f"Successfully transcribed: {len(transcript)} characters")
             return transcript.strip()
             
+        except OpenAIServiceException:
+            raise
         except openai.APIError as e:
             self.logger.error(f"OpenAI Whisper API error: {e}")
             raise OpenAIServiceException(
                 api_error=str(e),
                 original_exception=e,
-                details={
-                    "service": "Whisper",
-                    "file_size": file_size,
-                    "file_path": audio_file_path
-                }
+                details={"service": "Whisper", **file_info}
             )
         except Exception as e:
             self.logger.error(f"Voice transcription error: {e}")
             raise VoiceTranscriptionException(
-                file_info={"file_path": audio_file_path, "file_size": file_size},
+                file_info=file_info,
                 original_exception=e,
                 details={"error_type": type(e).__name__}
             )
\ No newline at end of file
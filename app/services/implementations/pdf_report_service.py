@@ -82,15 +82,17 @@ class PDFReportService(ReportGeneratorProtocol):
 
     def _format_table_data(self, query_result, max_rows=50):
         table_data = [query_result.headers]
-        rows_to_show = query_result.rows[:max_rows]
-        for row in rows_to_show:
-            formatted_row = [
-                "" if value is None else (str(value)[:47] + "..." if len(str(value)) > 50 else str(value))
-                for value in row
-            ]
-            table_data.append(formatted_row)
+        for row in query_result.iter_rows(max_rows):
+            table_data.append([self._format_cell(value) for value in row])
         return table_data
 
+    @staticmethod
+    def _format_cell(value):
+        if value is None:
+            return ""
+        text = str(value)
+        return text[:47] + "..." if len(text) > 50 else text
+
     def _create_table(self, table_data):
         table = Table(table_data)
         table.setStyle(TableStyle([
@@ -116,7 +118,7 @@ class PDFReportService(ReportGeneratorProtocol):
             elements.append(table)
             
             elements.append(Spacer(1, 20))
-            total_rows = len(query_result.rows)
+            total_rows = query_result.row_count
             summary_text = f"Total records: {total_rows}"
             if total_rows > 50:
                 summary_text += " (showing first 50 rows)"
@@ -0,0 +1,70 @@
+import logging
+import time
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, Union
+
+from app.services.base.protocols import TextToSqlProtocol
+from app.utils.concurrency import call_maybe_async, generate_sql_batch, iter_generated_sql
+from app.utils.question_rules import QuestionRules
+
+
+class RuleBasedTextToSql(TextToSqlProtocol):
+    """Answers the common question shapes locally and passes every other question to the wrapped service."""
+
+    def __init__(self, text_to_sql_service: TextToSqlProtocol, rules: QuestionRules):
+        self.logger = logging.getLogger(__name__)
+        self.text_to_sql_service = text_to_sql_service
+        self.rules = rules
+
+    @property
+    def prompt_fingerprint(self) -> str:
+        # Cached answers may come from the rules, so a rules change must not reuse them.
+        return f'{getattr(self.text_to_sql_service, "prompt_fingerprint", "")}:rules-{QuestionRules.VERSION}'
+
+    def _match(self, question: str) -> Optional[str]:
+        started = time.perf_counter()
+        match = self.rules.match(question)
+        self.rules.record_lookup(match, time.perf_counter() - started)
+        if match is None:
+            return None
+        self.logger.info(f"Rule {match.rule} answered question: {question}")
+        return match.sql
+
+    async def generate_sql(self, question: str, examples: Optional[Sequence[Tuple[str, str]]] = None) -> str:
+        sql = self._match(question)
+        if sql is not None:
+            return sql
+
+        started = time.perf_counter()
+        try:
+            if examples:
+                return await call_maybe_async(self.text_to_sql_service.generate_sql, question, examples=examples)
+            return await call_maybe_async(self.text_to_sql_service.generate_sql, question)
+        finally:
+            self.rules.record_fallback(time.perf_counter() - started)
+
+    async def stream_sql(self, question: str, examples: Optional[Sequence[Tuple[str, str]]] = None) -> AsyncIterator[str]:
+        sql = self._match(question)
+        if sql is not None:
+            yield sql
+            return
+
+        started = time.perf_counter()
+        try:
+            kwargs = {"examples": examples} if examples else {}
+            async for piece in iter_generated_sql(self.text_to_sql_service, question, **kwargs):
+                yield piece
+        finally:
+            self.rules.record_fallback(time.perf_counter() - started)
+
+    async def generate_sql_batch(self, questions: Sequence[str]) -> List[Union[str, BaseException]]:
+        results: List[Optional[Union[str, BaseException]]] = [self._match(question) for question in questions]
+        pending = [index for index, sql in enumerate(results) if sql is None]
+        if pending:
+            started = time.perf_counter()
+            try:
+                generated = await generate_sql_batch(self.text_to_sql_service, [questions[index] for index in pending])
+            finally:
+                self.rules.record_fallback(time.perf_counter() - started)
+            for index, sql in zip(pending, generated):
+                results[index] = sql
+        return results
@@ -0,0 +1,126 @@
+import inspect
+import logging
+from typing import Any, AsyncIterator, Callable, FrozenSet, List, Optional, Sequence, Tuple, Union
+
+from app.services.base.protocols import TextToSqlProtocol
+from app.utils.concurrency import call_maybe_async, generate_sql_batch, iter_generated_sql
+from app.utils.question_index import QuestionIndex, QuestionMatch
+from app.utils.sql_safety import is_safe_query
+from app.utils.sql_text import clean_generated_sql
+from app.utils.text_normalize import question_tokens
+
+
+# Words that can be added or dropped without changing what a question asks.
+# Negations, ordering and extremum words are deliberately not filler.
+REUSE_FILLER_WORDS = {
+    "show", "me", "list", "give", "get", "display", "find", "tell", "please", "can", "could", "you",
+    "what", "which", "who", "whose", "is", "are", "was", "were", "be", "the", "a", "an", "all",
+    "of", "that", "there", "do", "does", "did",
+}
+
+
+def _content_tokens(question: str) -> FrozenSet[str]:
+    return frozenset(token for token in question_tokens(question) if token not in REUSE_FILLER_WORDS)
+
+
+class SimilarQuestionTextToSql(TextToSqlProtocol):
+    """Reuses SQL from near-identical past questions and passes close ones as few-shot examples."""
+
+    def __init__(
+        self,
+        text_to_sql_service: TextToSqlProtocol,
+        index: QuestionIndex,
+        reuse_threshold: float = 0.92,
+        example_threshold: float = 0.35,
+        max_examples: int = 3,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.text_to_sql_service = text_to_sql_service
+        self.index = index
+        self.reuse_threshold = reuse_threshold
+        self.example_threshold = example_threshold
+        self.max_examples = max_examples
+
+    @property
+    def prompt_fingerprint(self) -> str:
+        return getattr(self.text_to_sql_service, "prompt_fingerprint", "")
+
+    def _accepts_examples(self, method: Optional[Callable[..., Any]] = None) -> bool:
+        try:
+            return "examples" in inspect.signature(method or self.text_to_sql_service.generate_sql).parameters
+        except (TypeError, ValueError):
+            return False
+
+    def _reusable(self, question: str, match: QuestionMatch) -> bool:
+        # Questions that differ by one word ("top 3" vs "top 5", "used" vs "never
+        # used", "most" vs "least") score very high on n-gram overlap but need
+        # different SQL, so only rephrasings made of the same words are reused.
+        return match.score >= self.reuse_threshold and _content_tokens(question) == _content_tokens(match.question)
+
+    async def _lookup(self, question: str) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+        matches = await call_maybe_async(
+            self.index.search, question, self.max_examples, self.example_threshold
+        )
+        self.index.record("lookups")
+
+        if matches and self._reusable(question, matches[0]):
+            self.index.record("reused")
+            self.logger.info(f"Reusing SQL of similar question ({matches[0].score:.3f}): {matches[0].question}")
+            return matches[0].sql, []
+        return None, [(match.question, match.sql) for match in matches]
+
+    async def generate_sql(self, question: str) -> str:
+        reused, examples = await self._lookup(question)
+        if reused is not None:
+            return reused
+
+        if examples and self._accepts_examples():
+            self.index.record("with_examples")
+            sql = await call_maybe_async(self.text_to_sql_service.generate_sql, question, examples=examples)
+        else:
+            self.index.record("without_examples")
+            sql = await call_maybe_async(self.text_to_sql_service.generate_sql, question)
+
+        if is_safe_query(sql):
+            await call_maybe_async(self.index.add, question, sql)
+        return sql
+
+    async def stream_sql(self, question: str) -> AsyncIterator[str]:
+        reused, examples = await self._lookup(question)
+        if reused is not None:
+            yield reused
+            return
+
+        stream_sql = getattr(self.text_to_sql_service, "stream_sql", None)
+        kwargs = {}
+        if examples and self._accepts_examples(stream_sql if inspect.isasyncgenfunction(stream_sql) else None):
+            self.index.record("with_examples")
+            kwargs["examples"] = examples
+        else:
+            self.index.record("without_examples")
+
+        pieces = []
+        async for piece in iter_generated_sql(self.text_to_sql_service, question, **kwargs):
+            pieces.append(piece)
+            yield piece
+
+        sql = clean_generated_sql("".join(pieces))
+        if is_safe_query(sql):
+            await call_maybe_async(self.index.add, question, sql)
+
+    async def generate_sql_batch(self, questions: Sequence[str]) -> List[Union[str, BaseException]]:
+        # Batched questions share one prompt, so close matches are not passed as examples.
+        results: List[Optional[Union[str, BaseException]]] = []
+        for question in questions:
+            reused, _ = await self._lookup(question)
+            results.append(reused)
+        pending = [index for index, sql in enumerate(results) if sql is None]
+        if pending:
+            for _ in pending:
+                self.index.record("without_examples")
+            generated = await generate_sql_batch(self.text_to_sql_service, [questions[index] for index in pending])
+            for index, sql in zip(pending, generated):
+                results[index] = sql
+                if isinstance(sql, str) and is_safe_query(sql):
+                    await call_maybe_async(self.index.add, questions[index], sql)
+        return results
@@ -1,37 +1,61 @@
+import asyncio
+import base64
+import json
 import logging
+import math
 import time
-from app.models.query_result import QueryResult
-from app.services.base.protocols import TextToSqlProtocol, SqlExecutorProtocol, QueryProcessorProtocol
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Union, Tuple
+from app.models.query_result import BatchItem, QueryResult, ResultSet, ResultPage
+from app.models.row_stream import AsyncRowStream
+from app.services.base.protocols import (
+    TextToSqlProtocol,
+    SqlExecutorProtocol,
+    AsyncSqlExecutorProtocol,
+    QueryProcessorProtocol,
+)
+from app.utils.concurrency import call_maybe_async, generate_sql_batch, iter_generated_sql, to_async_row_stream
+from app.utils.singleflight import SingleFlight
+from app.utils.sql_text import clean_generated_sql, keyset_page_sql, normalize_sql, paging_key
+from app.utils.text_normalize import normalize_question
 
+from app.exceptions.base import BaseAppException, InternalServerException
 from app.exceptions.domain import (
     EmptyQuestionException,
+    InvalidRequestDataException,
     UnsafeSqlException, 
+    QueryTooExpensiveException,
     DatabaseExecutionException
 )
 
 class SqlQueryService(QueryProcessorProtocol):
-    def __init__(self, text_to_sql_service: TextToSqlProtocol, sql_executor_service: SqlExecutorProtocol):
+    def __init__(
+        self,
+        text_to_sql_service: TextToSqlProtocol,
+        sql_executor_service: Union[SqlExecutorProtocol, AsyncSqlExecutorProtocol],
+        question_flight: Optional[SingleFlight] = None
+    ):
         self.logger = logging.getLogger(__name__)
         self.text_to_sql_service = text_to_sql_service
         self.sql_executor_service = sql_executor_service
+        self.question_flight = question_flight
     
-    def process_question(self, question: str) -> QueryResult:
+    async def process_question(self, question: str) -> QueryResult:
         if not question or question.strip() == "":
             raise EmptyQuestionException()
         
         start_time = time.time()
-        sql = None
         
         try:
-            sql = self.text_to_sql_service.generate_sql(question)
-            self.logger.info(f"Generated SQL: {sql}") 
-            
-            result = self.sql_executor_service.execute(sql)
+            if self.question_flight is None:
+                sql, result = await self._answer(question)
+            else:
+                # Identical questions asked at the same time share one generate+execute run.
+                sql, result = await self.question_flight.run(normalize_question(question), self._answer, question)
             
-        except (UnsafeSqlException, DatabaseExecutionException) as e:
+        except (UnsafeSqlException, QueryTooExpensiveException, DatabaseExecutionException) as e:
             execution_time = int((time.time() - start_time) * 1000)
             e.details['execution_time_ms'] = execution_time
-            e.details['sql_query'] = sql
             raise e
         
         execution_time = int((time.time() - start_time) * 1000)
@@ -47,13 +71,257 @@ class SqlQueryService(QueryProcessorProtocol):
                 error="No results found for this query"
             )
         
-        headers = list(result[0].keys())
-        rows = [list(row.values()) for row in result]
+        if isinstance(result, ResultSet):
+            headers, rows, column_types = result.headers, result.rows, result.column_types
+            truncated = result.truncated
+        else:
+            headers = list(result[0].keys())
+            rows = [tuple(row.values()) for row in result]
+            column_types = None
+            truncated = False
         
         return QueryResult(
             question=question,
             headers=headers,
             rows=rows,
             execution_time_ms=execution_time,
-            sql=sql
+            sql=sql,
+            column_types=column_types,
+            truncated=truncated
         )
+
+    async def _answer(self, question: str) -> Tuple[str, Any]:
+        sql = await call_maybe_async(self.text_to_sql_service.generate_sql, question)
+        self.logger.info(f"Generated SQL: {sql}") 
+        
+        try:
+            result = await call_maybe_async(self.sql_executor_service.execute, sql)
+        except (UnsafeSqlException, QueryTooExpensiveException, DatabaseExecutionException) as e:
+            e.details['sql_query'] = sql
+            raise e
+        return sql, result
+
+    async def stream_question(self, question: str) -> Tuple[str, AsyncRowStream]:
+        if not question or question.strip() == "":
+            raise EmptyQuestionException()
+        
+        sql = await call_maybe_async(self.text_to_sql_service.generate_sql, question)
+        self.logger.info(f"Generated SQL for streaming: {sql}")
+        
+        try:
+            stream = await call_maybe_async(self.sql_executor_service.stream, sql)
+        except (UnsafeSqlException, QueryTooExpensiveException, DatabaseExecutionException) as e:
+            e.details['sql_query'] = sql
+            raise e
+        
+        return sql, to_async_row_stream(stream)
+
+    async def stream_answer(self, question: str, max_rows: Optional[int] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``(event, data)`` pairs while a question is answered.
+
+        SQL text is passed on as the model writes it, then rows follow batch
+        by batch from the executor's cursor; ``done`` carries the timings.
+        """
+        if not question or question.strip() == "":
+            raise EmptyQuestionException()
+        
+        start = time.perf_counter()
+        pieces = []
+        async for piece in iter_generated_sql(self.text_to_sql_service, question):
+            pieces.append(piece)
+            yield "sql_token", {"text": piece}
+        sql = clean_generated_sql("".join(pieces))
+        generation_ms = int((time.perf_counter() - start) * 1000)
+        self.logger.info(f"Generated SQL for streaming: {sql}")
+        yield "sql", {"sql": sql, "generation_ms": generation_ms}
+        
+        yield "execution_started", {}
+        try:
+            stream = to_async_row_stream(await call_maybe_async(self.sql_executor_service.stream, sql))
+        except (UnsafeSqlException, QueryTooExpensiveException, DatabaseExecutionException) as e:
+            e.details['sql_query'] = sql
+            raise e
+        
+        row_count, truncated, first_row_ms = 0, False, None
+        try:
+            yield "columns", {"headers": stream.headers}
+            async for batch in stream.iter_batches():
+                rows = [tuple(row) for row in batch]
+                if max_rows is not None and row_count + len(rows) > max_rows:
+                    del rows[max_rows - row_count:]
+                    truncated = True
+                if rows:
+                    if first_row_ms is None:
+                        first_row_ms = int((time.perf_counter() - start) * 1000)
+                    row_count += len(rows)
+                    yield "rows", {"rows": rows}
+                if truncated:
+                    break
+        finally:
+            await stream.aclose()
+        
+        yield "done", {
+            "sql": sql,
+            "row_count": row_count,
+            "truncated": truncated,
+            "generation_ms": generation_ms,
+            "time_to_first_row_ms": first_row_ms,
+            "total_ms": int((time.perf_counter() - start) * 1000),
+        }
+
+    async def process_batch(self, questions: Sequence[str], max_concurrency: int = 4) -> List[BatchItem]:
+        """Answer many questions; a failing question is reported on its item and never fails the batch.
+
+        Repeated questions are generated once, SQL for the rest is asked for
+        in as few calls as the text-to-SQL service allows, and identical
+        statements are executed once, at most ``max_concurrency`` at a time.
+        """
+        items = [BatchItem(question) for question in questions]
+        by_question: Dict[str, List[BatchItem]] = {}
+        for item in items:
+            if not item.question or item.question.strip() == "":
+                item.error = EmptyQuestionException()
+            else:
+                by_question.setdefault(normalize_question(item.question), []).append(item)
+        
+        groups = list(by_question.values())
+        generated = await generate_sql_batch(self.text_to_sql_service, [group[0].question for group in groups])
+        by_statement: Dict[str, List[BatchItem]] = {}
+        for group, sql in zip(groups, generated):
+            for item in group:
+                if isinstance(sql, BaseException):
+                    item.error = sql
+                else:
+                    item.sql = sql
+            if not isinstance(sql, BaseException):
+                by_statement.setdefault(normalize_sql(sql), []).extend(group)
+        self.logger.info(
+            f"Batch of {len(items)} questions: {len(groups)} distinct, {len(by_statement)} distinct statements"
+        )
+        
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def execute(group: List[BatchItem]):
+            sql = group[0].sql
+            async with semaphore:
+                start_time = time.time()
+                result, error = None, None
+                try:
+                    result = await call_maybe_async(self.sql_executor_service.execute, sql)
+                except BaseAppException as e:
+                    e.details['sql_query'] = sql
+                    error = e
+                except Exception as e:
+                    self.logger.exception(f"Unexpected error executing batch SQL: {sql}")
+                    error = InternalServerException(original_exception=e, details={"sql_query": sql})
+                execution_time = int((time.time() - start_time) * 1000)
+            if result is not None and not isinstance(result, ResultSet):
+                headers = list(result[0].keys()) if result else []
+                result = ResultSet(headers, [tuple(row.values()) for row in result])
+            for item in group:
+                item.result, item.error, item.execution_time_ms = result, error, execution_time
+        
+        await asyncio.gather(*(execute(group) for group in by_statement.values()))
+        return items
+
+    async def fetch_page(
+        self,
+        sql: str,
+        headers: Sequence[str],
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> ResultPage:
+        """Fetch the rows after ``cursor`` in the order given by ``paging_key``.
+
+        The cursor holds the key of the last row returned and how many rows
+        just before it had that same key. Those rows are identical in every
+        key column, so skipping that many of them resumes exactly where the
+        previous page stopped.
+        """
+        key = paging_key(sql, headers)
+        if not key:
+            raise InvalidRequestDataException(field_name="result_id", reason="No column of this result can order its pages")
+        after, skip = _decode_cursor(cursor, len(key)) if cursor else (None, 0)
+        
+        try:
+            result = await call_maybe_async(
+                self.sql_executor_service.execute,
+                keyset_page_sql(sql, key, _literal_values(after) if after is not None else None, limit + skip + 1)
+            )
+        except (UnsafeSqlException, QueryTooExpensiveException, DatabaseExecutionException) as e:
+            e.details['sql_query'] = sql
+            raise e
+        
+        positions = [result.headers.index(column) for column, _, _ in key]
+        
+        def key_of(row: Sequence[Any]) -> List[Any]:
+            return [_cursor_value(row[position]) for position in positions]
+        
+        rows = list(result.rows)
+        skipped = 0
+        while skipped < min(skip, len(rows)) and key_of(rows[skipped]) == after:
+            skipped += 1
+        del rows[:skipped]
+        has_more = result.truncated or len(rows) > limit
+        del rows[limit:]
+        
+        next_cursor = None
+        if has_more and rows:
+            last = key_of(rows[-1])
+            ties = 0
+            while ties < len(rows) and key_of(rows[-1 - ties]) == last:
+                ties += 1
+            if ties == len(rows) and last == after:
+                ties += skip
+            next_cursor = _encode_cursor(last, ties)
+        return ResultPage(
+            headers=result.headers,
+            rows=rows,
+            column_types=result.column_types,
+            next_cursor=next_cursor
+        )
+
+
+def _cursor_value(value: Any) -> Any:
+    """A key value as it is stored in a cursor: JSON, with numerics kept exact."""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else str(value)
+    if isinstance(value, Decimal):
+        return {"numeric": str(value)}
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _literal_values(values: Sequence[Any]) -> List[Any]:
+    return [Decimal(value["numeric"]) if isinstance(value, dict) else value for value in values]
+
+
+def _encode_cursor(values: Sequence[Any], skip: int) -> str:
+    payload = json.dumps({"after": list(values), "skip": skip}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, key_length: int) -> Tuple[List[Any], int]:
+    invalid = InvalidRequestDataException(field_name="cursor", reason="Cursor must come from a previous page")
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values, skip = payload["after"], payload["skip"]
+    except (ValueError, TypeError, KeyError):
+        raise invalid
+    if not isinstance(values, list) or len(values) != key_length or type(skip) is not int or skip < 0:
+        raise invalid
+    for value in values:
+        if isinstance(value, dict):
+            try:
+                if set(value) != {"numeric"} or not Decimal(value["numeric"]).is_finite():
+                    raise invalid
+            except (ArithmeticError, TypeError):
+                raise invalid
+        elif isinstance(value, float) and not math.isfinite(value):
+            raise invalid
+        elif not (value is None or isinstance(value, (bool, int, float, str))):
+            raise invalid
+    return values, skip
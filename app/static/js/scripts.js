@@ -101,6 +101,147 @@ function formatDate(dateStr) {
 
 let mediaRecorder;
 let audioChunks = [];
+let voiceStream = null;
+
+// How often MediaRecorder hands over audio, so it is uploaded while the user speaks.
+const VOICE_CHUNK_MS = 250;
+
+function showRecordButton() {
+  document.getElementById("stopRecordingBtn").style.display = "none";
+  document.getElementById("startRecordingBtn").style.display = "inline-block";
+}
+
+// Opens /ws/ask-voice and queues messages until it is connected; null without WebSocket support.
+function openVoiceStream() {
+  if (typeof window.WebSocket !== "function") return null;
+  const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+  const socket = new WebSocket(`${protocol}//${window.location.host}/ws/ask-voice`);
+  const queue = [JSON.stringify({ type: "start", filename: "recording.webm" })];
+  const stream = {
+    socket: socket,
+    failed: false,
+    send: function (message) {
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(message);
+      } else {
+        queue.push(message);
+      }
+    },
+  };
+  socket.onopen = function () {
+    queue.splice(0).forEach(function (message) {
+      socket.send(message);
+    });
+  };
+  socket.onerror = function () {
+    stream.failed = true;
+  };
+  return stream;
+}
+
+function finishVoiceStream(stream) {
+  hideError();
+  resetStreamingResults();
+  document.getElementById("recordCount").textContent = "Uploading the recording...";
+
+  const state = { question: "", sql: "" };
+  const handlers = createAnswerHandlers(state);
+  let answered = false;
+
+  handlers.received = function () {
+    document.getElementById("recordCount").textContent = "Transcribing...";
+  };
+  handlers.transcript = function (data) {
+    state.question = data.question;
+    document.getElementById("question").value = data.question;
+    document.getElementById("streamTiming").textContent = `Transcribed in ${data.transcription_ms} ms.`;
+    document.getElementById("recordCount").textContent = "Generating SQL...";
+  };
+
+  stream.socket.onmessage = function (message) {
+    const payload = JSON.parse(message.data);
+    if (handlers[payload.event]) handlers[payload.event](payload.data);
+    if (payload.event === "done" || payload.event === "error") {
+      answered = true;
+      if (state.question) {
+        saveQueryToHistory(state.question, state.sql || "-- The request failed");
+      }
+      stream.socket.close();
+    }
+  };
+  stream.socket.onclose = function () {
+    // Nothing came back: send the same recording the old way.
+    if (!answered && !state.question) {
+      postRecording();
+    }
+  };
+  stream.send(JSON.stringify({ type: "stop" }));
+}
+
+async function postRecording() {
+  const audioBlob = new Blob(audioChunks, { type: "audio/webm" });
+  const formData = new FormData();
+  formData.append("file", audioBlob, "recording.webm");
+
+  try {
+    console.log("Sending audio to /ask-voice");
+    document.getElementById("loadingIndicator").style.display = "block";
+    const response = await fetch("/ask-voice", {
+      method: "POST",
+      body: formData,
+    });
+    console.log("Response:", response);
+    document.getElementById("loadingIndicator").style.display = "none";
+
+    if (response.ok) {
+      const html = await response.text();
+      const parser = new DOMParser();
+      const doc = parser.parseFromString(html, "text/html");
+      document.querySelector(".app-container").innerHTML =
+        doc.querySelector(".app-container").innerHTML;
+      const sqlCode = document.getElementById("sqlCode");
+      if (
+        sqlCode &&
+        sqlCode.textContent.trim() !== "" &&
+        sqlCode.textContent.trim().toUpperCase() !== "NONE"
+      ) {
+        hljs.highlightElement(sqlCode);
+        const sqlSection = document.getElementById("sqlSection");
+        if (sqlSection) {
+          sqlSection.style.display = "block";
+        }
+      }
+
+      const resultsContainer = document.getElementById("resultsContainer");
+      if (resultsContainer) {
+        resultsContainer.style.display = "block";
+      }
+
+      const questionInput = document.getElementById("question");
+      if (questionInput && questionInput.value.trim() !== "") {
+        saveQueryToHistory(
+          questionInput.value,
+          sqlCode ? sqlCode.textContent : "-- Voice query executed"
+        );
+      }
+
+      bindEventListeners();
+    } else {
+      console.error("Request failed:", response.status);
+      document.getElementById(
+        "errorContainer"
+      ).innerHTML = `Failed to process voice query: HTTP ${response.status}`;
+      document.getElementById("errorContainer").style.display = "block";
+    }
+  } catch (error) {
+    console.error("Error:", error);
+    document.getElementById("loadingIndicator").style.display = "none";
+    document.getElementById(
+      "errorContainer"
+    ).innerHTML = `Error: ${error.message}`;
+    document.getElementById("errorContainer").style.display = "block";
+  }
+}
 
 async function startRecording() {
   try {
@@ -109,81 +250,25 @@ async function startRecording() {
     });
     mediaRecorder = new MediaRecorder(stream);
     audioChunks = [];
+    voiceStream = openVoiceStream();
 
     mediaRecorder.ondataavailable = (event) => {
       audioChunks.push(event.data);
+      if (voiceStream && !voiceStream.failed && event.data.size > 0) {
+        voiceStream.send(event.data);
+      }
     };
 
     mediaRecorder.onstop = async () => {
-      const audioBlob = new Blob(audioChunks, { type: "audio/webm" });
-      const formData = new FormData();
-      formData.append("file", audioBlob, "recording.webm");
-
-      document.getElementById("stopRecordingBtn").style.display = "none";
-      document.getElementById("startRecordingBtn").style.display =
-        "inline-block";
-
-      try {
-        console.log("Sending audio to /ask-voice");
-        document.getElementById("loadingIndicator").style.display = "block";
-        const response = await fetch("/ask-voice", {
-          method: "POST",
-          body: formData,
-        });
-        console.log("Response:", response);
-        document.getElementById("loadingIndicator").style.display = "none";
-
-        if (response.ok) {
-          const html = await response.text();
-          const parser = new DOMParser();
-          const doc = parser.parseFromString(html, "text/html");
-          document.querySelector(".app-container").innerHTML =
-            doc.querySelector(".app-container").innerHTML;
-          const sqlCode = document.getElementById("sqlCode");
-          if (
-            sqlCode &&
-            sqlCode.textContent.trim() !== "" &&
-            sqlCode.textContent.trim().toUpperCase() !== "NONE"
-          ) {
-            hljs.highlightElement(sqlCode);
-            const sqlSection = document.getElementById("sqlSection");
-            if (sqlSection) {
-              sqlSection.style.display = "block";
-            }
-          }
-
-          const resultsContainer = document.getElementById("resultsContainer");
-          if (resultsContainer) {
-            resultsContainer.style.display = "block";
-          }
-
-          const questionInput = document.getElementById("question");
-          if (questionInput && questionInput.value.trim() !== "") {
-            saveQueryToHistory(
-              questionInput.value,
-              sqlCode ? sqlCode.textContent : "-- Voice query executed"
-            );
-          }
-
-          bindEventListeners();
-        } else {
-          console.error("Request failed:", response.status);
-          document.getElementById(
-            "errorContainer"
-          ).innerHTML = `Failed to process voice query: HTTP ${response.status}`;
-          document.getElementById("errorContainer").style.display = "block";
-        }
-      } catch (error) {
-        console.error("Error:", error);
-        document.getElementById("loadingIndicator").style.display = "none";
-        document.getElementById(
-          "errorContainer"
-        ).innerHTML = `Error: ${error.message}`;
-        document.getElementById("errorContainer").style.display = "block";
+      showRecordButton();
+      if (voiceStream && !voiceStream.failed && voiceStream.socket.readyState <= WebSocket.OPEN) {
+        finishVoiceStream(voiceStream);
+      } else {
+        postRecording();
       }
     };
 
-    mediaRecorder.start();
+    mediaRecorder.start(VOICE_CHUNK_MS);
 
     document.getElementById("startRecordingBtn").style.display = "none";
     document.getElementById("stopRecordingBtn").style.display = "inline-block";
@@ -191,9 +276,6 @@ async function startRecording() {
     setTimeout(() => {
       if (mediaRecorder.state === "recording") {
         mediaRecorder.stop();
-        document.getElementById("stopRecordingBtn").style.display = "none";
-        document.getElementById("startRecordingBtn").style.display =
-          "inline-block";
       }
     }, 10000);
   } catch (error) {
@@ -321,16 +403,337 @@ function setupPdfDownload() {
   });
 }
 
+async function fetchResultPage(resultId, cursor, limit) {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+  if (limit) params.set("limit", limit);
+  const response = await fetch(
+    `/api/results/${encodeURIComponent(resultId)}?${params}`
+  );
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+  }
+  return response.json();
+}
+
+function appendResultRows(tbody, rows) {
+  rows.forEach(function (row) {
+    const tr = document.createElement("tr");
+    row.forEach(function (cell, index) {
+      const td = document.createElement("td");
+      td.dataset.index = index;
+      td.textContent = cell === null ? "NULL" : String(cell);
+      tr.appendChild(td);
+    });
+    tbody.appendChild(tr);
+  });
+}
+
+function setupLoadMoreRows() {
+  const loadMoreBtn = document.getElementById("loadMoreRowsBtn");
+  if (!loadMoreBtn) return;
+
+  loadMoreBtn.onclick = async function () {
+    const tbody = document.querySelector("#resultsTable tbody");
+    const resultId = loadMoreBtn.dataset.resultId;
+    let cursor = loadMoreBtn.dataset.cursor;
+    loadMoreBtn.disabled = true;
+
+    try {
+      if (!cursor) {
+        // The rows shown so far are in the order the query happened to
+        // return them; reload them in paging order so no row is repeated or
+        // skipped by the pages that follow.
+        const first = await fetchResultPage(resultId, null, loadMoreBtn.dataset.shown);
+        tbody.replaceChildren();
+        appendResultRows(tbody, first.rows);
+        cursor = first.next_cursor;
+      }
+      const page = cursor
+        ? await fetchResultPage(resultId, cursor)
+        : { rows: [], next_cursor: null };
+      appendResultRows(tbody, page.rows);
+
+      const rowCount = tbody.querySelectorAll("tr").length;
+      const recordCount = document.getElementById("recordCount");
+      if (page.next_cursor) {
+        loadMoreBtn.dataset.cursor = page.next_cursor;
+        loadMoreBtn.disabled = false;
+        if (recordCount) recordCount.textContent = `${rowCount}+ records found`;
+      } else {
+        loadMoreBtn.remove();
+        if (recordCount) recordCount.textContent = `${rowCount} records found`;
+      }
+    } catch (error) {
+      console.error("Error loading more rows:", error);
+      alert("Error loading more rows: " + error.message);
+      loadMoreBtn.disabled = false;
+    }
+  };
+}
+
+function escapeHtml(value) {
+  return String(value)
+    .replace(/&/g, "&amp;")
+    .replace(/</g, "&lt;")
+    .replace(/>/g, "&gt;")
+    .replace(/"/g, "&quot;")
+    .replace(/'/g, "&#39;");
+}
+
+function supportsStreaming() {
+  return (
+    typeof window.fetch === "function" &&
+    typeof window.ReadableStream === "function" &&
+    typeof window.TextDecoder === "function"
+  );
+}
+
+function showError(message) {
+  let errorContainer = document.getElementById("errorContainer");
+  if (!errorContainer) {
+    errorContainer = document.createElement("div");
+    errorContainer.className = "error-message";
+    errorContainer.id = "errorContainer";
+    const resultsContainer = document.getElementById("resultsContainer");
+    resultsContainer.parentNode.insertBefore(errorContainer, resultsContainer);
+  }
+  errorContainer.textContent = message;
+  errorContainer.style.display = "block";
+}
+
+function hideError() {
+  const errorContainer = document.getElementById("errorContainer");
+  if (errorContainer) {
+    errorContainer.textContent = "";
+    errorContainer.style.display = "none";
+  }
+}
+
+// Parses a text/event-stream body and calls onEvent(event, data) per message.
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  const dispatch = function (block) {
+    let event = "message";
+    const data = [];
+    block.split("\n").forEach(function (line) {
+      if (line.startsWith("event:")) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith("data:")) {
+        data.push(line.slice(5).trimStart());
+      }
+    });
+    if (data.length > 0) {
+      onEvent(event, JSON.parse(data.join("\n")));
+    }
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      dispatch(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+    }
+  }
+  if (buffer.trim() !== "") {
+    dispatch(buffer);
+  }
+}
+
+function resetStreamingResults() {
+  const resultsContainer = document.getElementById("resultsContainer");
+  resultsContainer.style.display = "block";
+
+  const sqlSection = document.getElementById("sqlSection");
+  sqlSection.style.display = "block";
+  const sqlCode = document.getElementById("sqlCode");
+  sqlCode.className = "language-sql";
+  delete sqlCode.dataset.highlighted;
+  sqlCode.textContent = "";
+
+  const resultSection = resultsContainer.querySelector(".result-section");
+  resultSection.style.display = "none";
+  resultSection.innerHTML = `
+    <h4 class="mb-3">
+      <i class="bi bi-table text-primary me-1"></i>Query Results:
+    </h4>
+    <div class="table-container">
+      <table class="table result-table" id="resultsTable">
+        <thead><tr></tr></thead>
+        <tbody></tbody>
+      </table>
+    </div>
+  `;
+
+  resultsContainer.querySelector(".result-info").innerHTML = `
+    <i class="bi bi-info-circle"></i>
+    <span id="recordCount">Generating SQL...</span>
+    <span class="ms-2" id="streamTiming"></span>
+  `;
+}
+
+function appendResultActions(question, summary) {
+  const resultSection = document.querySelector("#resultsContainer .result-section");
+  const safeQuestion = escapeHtml(question);
+  const loadMore = summary.result_id
+    ? `
+    <button
+      type="button"
+      class="btn btn-outline-primary mt-3"
+      id="loadMoreRowsBtn"
+      data-result-id="${escapeHtml(summary.result_id)}"
+      data-shown="${summary.row_count}"
+    >
+      <i class="bi bi-arrow-down-circle me-1"></i> Load more rows
+    </button>`
+    : "";
+
+  resultSection.insertAdjacentHTML(
+    "beforeend",
+    `${loadMore}
+    <form id="downloadReportForm" action="/download-report-pdf" method="post" class="mt-3">
+      <input type="hidden" id="rowsJsonInput" name="rows_json" value="" />
+      <input type="hidden" id="headersJsonInput" name="headers_json" value="" />
+      <input type="hidden" name="question" value="${safeQuestion}" />
+      <input type="hidden" name="sql" value="${escapeHtml(summary.sql)}" />
+      <button type="submit" class="btn btn-success" id="downloadPdfBtn">
+        <i class="bi bi-file-earmark-pdf me-1"></i> Download Report (PDF)
+      </button>
+    </form>
+    <form action="/export" method="post" class="mt-2" id="exportCsvForm">
+      <input type="hidden" name="question" value="${safeQuestion}" />
+      <input type="hidden" name="format" value="csv" />
+      <button type="submit" class="btn btn-outline-success">
+        <i class="bi bi-filetype-csv me-1"></i> Export Full Results (CSV)
+      </button>
+    </form>`
+  );
+}
+
+// Handlers for the answer events of /ask/stream and /ws/ask-voice; state.question may be set later.
+function createAnswerHandlers(state) {
+  const sqlCode = document.getElementById("sqlCode");
+  const resultSection = document.querySelector("#resultsContainer .result-section");
+  const headRow = document.querySelector("#resultsTable thead tr");
+  const tbody = document.querySelector("#resultsTable tbody");
+  const recordCount = document.getElementById("recordCount");
+  const timing = document.getElementById("streamTiming");
+  let rowCount = 0;
+
+  return {
+    sql_token: function (data) {
+      sqlCode.textContent += data.text;
+    },
+    sql: function (data) {
+      state.sql = data.sql;
+      sqlCode.textContent = data.sql;
+      hljs.highlightElement(sqlCode);
+      timing.textContent = `SQL generated in ${data.generation_ms} ms.`;
+    },
+    execution_started: function () {
+      recordCount.textContent = "Running query...";
+    },
+    columns: function (data) {
+      data.headers.forEach(function (header) {
+        const th = document.createElement("th");
+        th.dataset.header = header;
+        th.textContent = header;
+        headRow.appendChild(th);
+      });
+    },
+    rows: function (data) {
+      const fragment = document.createDocumentFragment();
+      data.rows.forEach(function (row) {
+        const tr = document.createElement("tr");
+        row.forEach(function (cell, index) {
+          const td = document.createElement("td");
+          td.dataset.index = index;
+          td.textContent = cell === null ? "NULL" : String(cell);
+          tr.appendChild(td);
+        });
+        fragment.appendChild(tr);
+      });
+      tbody.appendChild(fragment);
+      rowCount += data.rows.length;
+      resultSection.style.display = "block";
+      recordCount.textContent = `${rowCount} records loaded...`;
+    },
+    done: function (data) {
+      recordCount.textContent = `${data.row_count}${data.truncated ? "+" : ""} records found`;
+      timing.textContent =
+        `SQL in ${data.generation_ms} ms, first row in ${data.time_to_first_row_ms ?? "-"} ms, ` +
+        `total ${data.total_ms} ms.`;
+      if (data.row_count > 0) {
+        appendResultActions(state.question, data);
+        setupPdfDownload();
+        setupLoadMoreRows();
+      } else {
+        showError("No results found for this query");
+      }
+    },
+    error: function (data) {
+      showError(data.error ? data.error.message : "Failed to process the question");
+      recordCount.textContent = "0 records found";
+    },
+  };
+}
+
+async function streamQuestion(question) {
+  const submitBtn = document.querySelector(".submit-btn");
+  if (submitBtn) submitBtn.disabled = true;
+  hideError();
+  resetStreamingResults();
+
+  const state = { question: question, sql: "" };
+  const handlers = createAnswerHandlers(state);
+
+  try {
+    const formData = new FormData();
+    formData.append("question", question);
+    const response = await fetch("/ask/stream", { method: "POST", body: formData });
+    if (!response.ok) {
+      let message = `HTTP ${response.status}: ${response.statusText}`;
+      try {
+        const body = await response.json();
+        if (body.error && body.error.message) message = body.error.message;
+      } catch (parseError) {}
+      throw new Error(message);
+    }
+    await readEventStream(response, function (event, data) {
+      if (handlers[event]) handlers[event](data);
+    });
+    saveQueryToHistory(question, state.sql || "-- The request failed");
+  } catch (error) {
+    console.error("Error streaming question:", error);
+    showError(error.message);
+    document.getElementById("recordCount").textContent = "0 records found";
+  } finally {
+    if (submitBtn) submitBtn.disabled = false;
+  }
+}
+
 function bindEventListeners() {
   const queryForm = document.getElementById("queryForm");
   if (queryForm) {
-    queryForm.addEventListener("submit", function () {
-      document.getElementById("loadingIndicator").style.display = "block";
+    queryForm.onsubmit = function (e) {
       const question = document.getElementById("question").value;
+      if (question.trim() !== "" && supportsStreaming()) {
+        e.preventDefault();
+        streamQuestion(question);
+        return;
+      }
+      document.getElementById("loadingIndicator").style.display = "block";
       if (question.trim() !== "") {
         saveQueryToHistory(question, "-- The request is executed...");
       }
-    });
+    };
   }
 
   document.querySelectorAll(".copy-btn").forEach((btn) => {
@@ -396,5 +799,7 @@ function bindEventListeners() {
 
   setupPdfDownload();
 
+  setupLoadMoreRows();
+
   updateHistoryUI();
 }
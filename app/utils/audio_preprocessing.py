@@ -0,0 +1,398 @@
+import io
+import logging
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+import wave
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.resilience import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Silence is trimmed before resampling so the filter only runs over speech.
+STAGES = ("decode", "downmix", "trim", "resample", "split", "encode")
+# Taps of the low-pass filter applied before downsampling.
+RESAMPLE_TAPS = 63
+# How far above a clip's noise floor a frame must be to count as speech.
+NOISE_MARGIN_DB = 10.0
+# Frames at or below this level (digital silence, dither) never count as speech.
+SPEECH_FLOOR_DB = -80.0
+
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """PCM WAV bytes as float32 samples shaped (frames, channels) in [-1, 1], and the sample rate."""
+    with wave.open(io.BytesIO(data)) as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        triplets = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+        samples = ((values << 8) >> 8).astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise wave.Error(f"unsupported sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def encode_wav(samples: np.ndarray, rate: int) -> bytes:
+    """Mono float samples as 16-bit PCM WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    # A matrix-vector product is several times faster than mean() over a short axis.
+    return samples @ np.full(samples.shape[1], 1.0 / samples.shape[1], dtype=np.float32)
+
+
+def resample(samples: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    """Resample mono audio by linear interpolation, low-pass filtering first when downsampling."""
+    if rate == target_rate or samples.size == 0:
+        return samples
+    if target_rate < rate:
+        cutoff = target_rate / rate / 2
+        offsets = np.arange(RESAMPLE_TAPS) - (RESAMPLE_TAPS - 1) / 2
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * offsets) * np.hamming(RESAMPLE_TAPS)
+        samples = np.convolve(samples, (kernel / kernel.sum()).astype(np.float32), mode="same")
+    count = int(round(samples.size * target_rate / rate))
+    positions = np.arange(count, dtype=np.float64) * (rate / target_rate)
+    return np.interp(positions, np.arange(samples.size), samples).astype(np.float32)
+
+
+def frame_energy_db(samples: np.ndarray, frame: int) -> np.ndarray:
+    """Mean power of each ``frame``-sample frame in dBFS; the last frame is zero-padded."""
+    frames = np.pad(samples, (0, -samples.size % frame)).reshape(-1, frame)
+    return 10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-12)
+
+
+def speech_threshold_db(
+    energy_db: np.ndarray,
+    relative_db: float = -40.0,
+    noise_margin_db: float = NOISE_MARGIN_DB,
+    floor_db: float = SPEECH_FLOOR_DB,
+) -> float:
+    """Frame energy above which a clip counts as speech, measured against the clip itself.
+
+    A frame is speech when it is within ``relative_db`` of the loudest frame
+    or ``noise_margin_db`` above the noise floor (the quietest tenth of
+    frames), whichever is more lenient, so quietly recorded speech is kept.
+    Nothing at or below ``floor_db`` dBFS counts.
+    """
+    if energy_db.size == 0:
+        return floor_db
+    peak = float(energy_db.max())
+    noise_floor = float(np.percentile(energy_db, 10))
+    return max(floor_db, min(peak + relative_db, noise_floor + noise_margin_db))
+
+
+def speech_bounds(
+    samples: np.ndarray,
+    rate: int,
+    relative_db: float = -40.0,
+    frame_ms: int = 30,
+    pad_ms: int = 250,
+) -> Optional[Tuple[int, int]]:
+    """Sample range from the first to the last speech frame (see ``speech_threshold_db``), padded; None if all silent."""
+    frame = max(1, rate * frame_ms // 1000)
+    energy_db = frame_energy_db(samples, frame)
+    voiced = np.flatnonzero(energy_db > speech_threshold_db(energy_db, relative_db))
+    if voiced.size == 0:
+        return None
+    pad = rate * pad_ms // 1000
+    return max(0, int(voiced[0]) * frame - pad), min(samples.size, (int(voiced[-1]) + 1) * frame + pad)
+
+
+def split_points(
+    samples: np.ndarray,
+    rate: int,
+    max_chunk_seconds: float,
+    relative_db: float = -40.0,
+    frame_ms: int = 30,
+    search_fraction: float = 0.25,
+) -> List[Tuple[int, bool]]:
+    """Where to cut audio longer than ``max_chunk_seconds`` into near-equal chunks.
+
+    Each cut is placed at the quietest frame within ``search_fraction`` of a
+    chunk around its evenly spaced target, never leaving a chunk longer than
+    the limit. Returns the cut sample indices, each with whether it falls in
+    silence (a cut in speech needs overlapping chunks).
+    """
+    max_length = int(max_chunk_seconds * rate)
+    if max_length <= 0 or samples.size <= max_length:
+        return []
+    frame = max(1, rate * frame_ms // 1000)
+    energy_db = frame_energy_db(samples, frame)
+    threshold_db = speech_threshold_db(energy_db, relative_db)
+    count = math.ceil(samples.size / max_length)
+    target_length = samples.size / count
+    cuts: List[Tuple[int, bool]] = []
+    previous = 0
+    for index in range(1, count):
+        target = index * target_length
+        low = max(target - search_fraction * target_length, samples.size - (count - index) * max_length, previous + frame)
+        high = min(target + search_fraction * target_length, previous + max_length)
+        first = min(int(low) // frame + 1, energy_db.size - 1)
+        last = max(int(high) // frame, first + 1)
+        quietest = first + int(np.argmin(energy_db[first:last]))
+        cut = min(quietest * frame + frame // 2, previous + max_length)
+        cuts.append((cut, bool(energy_db[quietest] <= threshold_db)))
+        previous = cut
+    return cuts
+
+
+_WORD_RE = re.compile(r"[^\w']+")
+
+
+def stitch_transcripts(parts: Sequence[str], overlapped: Sequence[bool], max_overlap_words: int = 30) -> str:
+    """Join chunk transcripts in order, dropping words repeated across an overlapping boundary.
+
+    ``overlapped[i]`` says whether chunks ``i`` and ``i + 1`` share audio; only
+    those boundaries are de-duplicated, so a word legitimately repeated at a
+    silent cut is kept.
+    """
+    words: List[str] = []
+    for index, part in enumerate(parts):
+        new_words = part.split()
+        overlap = 0
+        if index > 0 and words and overlapped[index - 1]:
+            tail = [_WORD_RE.sub("", word.lower()) for word in words[-max_overlap_words:]]
+            head = [_WORD_RE.sub("", word.lower()) for word in new_words[:max_overlap_words]]
+            overlap = next((size for size in range(min(len(tail), len(head)), 0, -1) if tail[-size:] == head[:size]), 0)
+        words.extend(new_words[overlap:])
+    return " ".join(words)
+
+
+class PreprocessedAudio:
+    """Audio ready for upload: one ``(filename, bytes)`` chunk, or several for a long recording."""
+
+    __slots__ = ("chunks", "overlapped", "speech", "stats")
+
+    def __init__(
+        self,
+        data: bytes,
+        filename: str,
+        speech: bool = True,
+        stats: Optional[Dict[str, Any]] = None,
+        chunks: Optional[List[Tuple[str, bytes]]] = None,
+        overlapped: Optional[List[bool]] = None,
+    ):
+        self.chunks = chunks or [(filename, data)]
+        self.overlapped = overlapped or [False] * (len(self.chunks) - 1)
+        self.speech = speech
+        self.stats = stats or {}
+
+    @property
+    def filename(self) -> str:
+        return self.chunks[0][0]
+
+    @property
+    def data(self) -> bytes:
+        return self.chunks[0][1]
+
+
+class AudioPreprocessor:
+    """Shrinks audio before transcription: decode, downmix to mono, trim silence, resample, re-encode.
+
+    WAV is decoded with NumPy; other formats (the browser's webm/opus) need
+    an ``ffmpeg`` binary, which also encodes the result as Opus. Without it
+    those uploads pass through unchanged and the output is 16-bit WAV.
+    Leading and trailing silence is cut, so Whisper bills fewer seconds; the
+    threshold is relative to each clip (``silence_threshold_db`` below its
+    loudest frame, or just above its noise floor), so quiet recordings keep
+    their speech. A clip in which no speech is found is sent unchanged. With
+    ``max_chunk_seconds``, longer audio is split at its quietest points into
+    separately encoded chunks that can be transcribed concurrently. Any
+    decoding or encoding failure falls back to the original bytes.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        silence_threshold_db: float = -40.0,
+        frame_ms: int = 30,
+        pad_ms: int = 250,
+        ffmpeg: Optional[str] = None,
+        ffmpeg_timeout: float = 30.0,
+        opus_bitrate: str = "24k",
+        chunk_overlap_ms: int = 1000,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.sample_rate = sample_rate
+        self.silence_threshold_db = silence_threshold_db
+        self.frame_ms = frame_ms
+        self.pad_ms = pad_ms
+        self.ffmpeg = ffmpeg
+        self.ffmpeg_timeout = ffmpeg_timeout
+        self.opus_bitrate = opus_bitrate
+        self.chunk_overlap_ms = chunk_overlap_ms
+        self._lock = threading.Lock()
+        self._counters = {"processed": 0, "passed_through": 0, "silent": 0, "input_bytes": 0, "output_bytes": 0,
+                          "input_seconds": 0.0, "output_seconds": 0.0, "chunked": 0, "chunks": 0}
+        self._latencies = {stage: LatencyWindow() for stage in STAGES}
+
+    def _ffmpeg(self, args: list, data: bytes) -> bytes:
+        result = subprocess.run(
+            [self.ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", *args],
+            input=data,
+            capture_output=True,
+            timeout=self.ffmpeg_timeout,
+            check=True,
+        )
+        return result.stdout
+
+    def decode(self, data: bytes, filename: str) -> Tuple[np.ndarray, int]:
+        if filename.lower().endswith(".wav"):
+            try:
+                return decode_wav(data)
+            except (wave.Error, EOFError, ValueError):
+                if not self.ffmpeg:
+                    raise
+        if not self.ffmpeg:
+            raise ValueError("decoding this format needs ffmpeg")
+        # ffmpeg downmixes and resamples while decoding, leaving those stages no work.
+        raw = self._ffmpeg(["-i", "pipe:0", "-f", "f32le", "-ac", "1", "-ar", str(self.sample_rate), "pipe:1"], data)
+        return np.frombuffer(raw, dtype="<f4"), self.sample_rate
+
+    def encode(self, samples: np.ndarray, filename: str) -> Tuple[bytes, str]:
+        stem = os.path.splitext(os.path.basename(filename))[0] or "audio"
+        if self.ffmpeg:
+            try:
+                data = self._ffmpeg([
+                    "-f", "f32le", "-ar", str(self.sample_rate), "-ac", "1", "-i", "pipe:0",
+                    "-c:a", "libopus", "-b:a", self.opus_bitrate, "-application", "voip", "-f", "ogg", "pipe:1",
+                ], samples.astype("<f4").tobytes())
+                return data, f"{stem}.ogg"
+            except (OSError, subprocess.SubprocessError) as e:
+                self.logger.warning(f"Opus encoding failed, sending WAV instead: {e}")
+        return encode_wav(samples, self.sample_rate), f"{stem}.wav"
+
+    def process(self, data: bytes, filename: str, max_chunk_seconds: Optional[float] = None) -> PreprocessedAudio:
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        def lap(stage: str):
+            nonlocal started
+            now = time.perf_counter()
+            timings[stage] = now - started
+            started = now
+
+        try:
+            samples, rate = self.decode(data, filename)
+            input_seconds = samples.shape[0] / rate if rate else 0.0
+            lap("decode")
+            samples = downmix(samples)
+            lap("downmix")
+            bounds = speech_bounds(samples, rate, self.silence_threshold_db, self.frame_ms, self.pad_ms)
+            lap("trim")
+            if bounds is None:
+                # The gate can be wrong about unusual recordings; Whisper gets the final say.
+                self._record(timings, len(data), len(data), input_seconds, input_seconds, silent=True)
+                stats = self._summary(timings, len(data), len(data), input_seconds, input_seconds)
+                return PreprocessedAudio(data, filename, speech=False, stats=stats)
+            samples = resample(samples[bounds[0]:bounds[1]], rate, self.sample_rate)
+            lap("resample")
+            cuts = split_points(
+                samples, self.sample_rate, max_chunk_seconds or 0, self.silence_threshold_db, self.frame_ms
+            )
+            lap("split")
+            if cuts:
+                chunks, overlapped = self._encode_chunks(samples, cuts, filename)
+            else:
+                encoded, encoded_name = self.encode(samples, filename)
+                chunks, overlapped = [(encoded_name, encoded)], []
+            lap("encode")
+        except (ValueError, EOFError, wave.Error, OSError, subprocess.SubprocessError) as e:
+            self.logger.info(f"Sending {filename} unprocessed: {e}")
+            with self._lock:
+                self._counters["passed_through"] += 1
+            return PreprocessedAudio(data, filename, stats={"skipped": str(e)})
+
+        output_seconds = samples.size / self.sample_rate
+        output_bytes = sum(len(chunk) for _, chunk in chunks)
+        if len(chunks) == 1 and output_bytes >= len(data) and output_seconds >= input_seconds:
+            chunks, output_bytes = [(filename, data)], len(data)
+        self._record(timings, len(data), output_bytes, input_seconds, output_seconds, chunks=len(chunks))
+        stats = self._summary(timings, len(data), output_bytes, input_seconds, output_seconds)
+        stats["chunks"] = len(chunks)
+        return PreprocessedAudio(data, filename, stats=stats, chunks=chunks, overlapped=overlapped)
+
+    def _encode_chunks(
+        self, samples: np.ndarray, cuts: List[Tuple[int, bool]], filename: str
+    ) -> Tuple[List[Tuple[str, bytes]], List[bool]]:
+        overlap = self.sample_rate * self.chunk_overlap_ms // 1000
+        stem, _ = os.path.splitext(os.path.basename(filename))
+        boundaries = [(0, True)] + cuts + [(samples.size, True)]
+        chunks = []
+        for index in range(len(boundaries) - 1):
+            (start, start_silent), (end, end_silent) = boundaries[index], boundaries[index + 1]
+            # A cut inside speech is shared by both neighbours so no word is split in half.
+            start = start if start_silent else max(0, start - overlap)
+            end = end if end_silent else min(samples.size, end + overlap)
+            data, name = self.encode(samples[start:end], f"{stem or 'audio'}_part{index + 1}")
+            chunks.append((name, data))
+        return chunks, [not silent for _, silent in cuts]
+
+    @staticmethod
+    def _summary(timings: Dict[str, float], input_bytes: int, output_bytes: int,
+                 input_seconds: float, output_seconds: float) -> Dict[str, Any]:
+        return {
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "input_seconds": round(input_seconds, 3),
+            "output_seconds": round(output_seconds, 3),
+            "stage_ms": {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()},
+        }
+
+    def _record(self, timings: Dict[str, float], input_bytes: int, output_bytes: int,
+                input_seconds: float, output_seconds: float, silent: bool = False, chunks: int = 1):
+        for stage, seconds in timings.items():
+            self._latencies[stage].add(seconds)
+        with self._lock:
+            self._counters["silent" if silent else "processed"] += 1
+            self._counters["input_bytes"] += input_bytes
+            self._counters["output_bytes"] += output_bytes
+            self._counters["input_seconds"] += input_seconds
+            self._counters["output_seconds"] += output_seconds
+            if chunks > 1:
+                self._counters["chunked"] += 1
+                self._counters["chunks"] += chunks
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+
+        def latency_ms(window: LatencyWindow, quantile: float) -> Optional[float]:
+            value = window.percentile(quantile)
+            return round(value * 1000, 2) if value is not None else None
+
+        counters["bytes_saved"] = counters["input_bytes"] - counters["output_bytes"]
+        counters["seconds_saved"] = round(counters["input_seconds"] - counters["output_seconds"], 3)
+        counters["input_seconds"] = round(counters["input_seconds"], 3)
+        counters["output_seconds"] = round(counters["output_seconds"], 3)
+        counters["ffmpeg"] = bool(self.ffmpeg)
+        counters["stage_latency_ms"] = {
+            stage: {"p50": latency_ms(window, 0.5), "p95": latency_ms(window, 0.95)}
+            for stage, window in self._latencies.items()
+        }
+        return counters
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import tempfile
+from typing import BinaryIO, Dict, List, Optional
+
+import python_multipart
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.exceptions.domain import InvalidFileFormatException, InvalidRequestDataException
+from app.utils.settings import env_float, env_int
+
+SUPPORTED_AUDIO_FORMATS = ["mp3", "mp4", "mpeg", "mpga", "m4a", "wav", "webm"]
+# Largest file the Whisper API accepts.
+WHISPER_MAX_BYTES = 25 * 1024 * 1024
+# Longer recordings are split into chunks under the Whisper limit before transcription.
+AUDIO_UPLOAD_MAX_BYTES = 4 * WHISPER_MAX_BYTES
+# Room for the multipart boundaries and part headers around the audio itself.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def too_large(size: int, max_bytes: int) -> InvalidFileFormatException:
+    return InvalidFileFormatException(
+        details={"reason": f"File too large (>{max_bytes // (1024 * 1024)}MB)", "file_size": size, "max_bytes": max_bytes}
+    )
+
+
+def check_audio_filename(filename: Optional[str]):
+    if not filename:
+        raise InvalidFileFormatException(details={"reason": "No filename provided"})
+    file_ext = filename.split('.')[-1].lower() if '.' in filename else ''
+    if file_ext not in SUPPORTED_AUDIO_FORMATS:
+        raise InvalidFileFormatException(file_type=file_ext)
+
+
+async def rewind(spool: BinaryIO):
+    """Seek back to the start; a spool that has rolled over to disk is seeked off the event loop."""
+    if getattr(spool, "_rolled", False):
+        await run_in_threadpool(spool.seek, 0)
+    else:
+        spool.seek(0)
+
+
+class AudioUpload:
+    """An uploaded audio file: in memory while small, spooled to a temporary file once larger."""
+
+    __slots__ = ("filename", "file", "size")
+
+    def __init__(self, filename: str, file: BinaryIO, size: int):
+        self.filename = filename
+        self.file = file
+        self.size = size
+
+    def close(self):
+        self.file.close()
+
+
+async def receive_audio_upload(
+    request: Request,
+    field: str = "file",
+    max_bytes: Optional[int] = None,
+    spool_max_size: Optional[int] = None,
+) -> AudioUpload:
+    """Read the audio file part of a multipart request body as it arrives.
+
+    The filename is checked as soon as the part headers are parsed and the
+    size limit while the data is received, so a bad or oversized upload is
+    rejected without reading the rest of the body.
+    """
+    max_bytes = max_bytes if max_bytes is not None else env_int("AUDIO_UPLOAD_MAX_BYTES", AUDIO_UPLOAD_MAX_BYTES)
+    spool_max_size = spool_max_size if spool_max_size is not None else env_int("AUDIO_UPLOAD_SPOOL_BYTES", 1024 * 1024)
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidRequestDataException(field, "expected a multipart/form-data upload")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        raise too_large(int(content_length), max_bytes)
+
+    part: Dict[str, bytes] = {}
+    headers: Dict[bytes, bytes] = {}
+    state = {"in_file": False, "filename": None, "complete": False}
+    pending: List[bytes] = []
+
+    def on_part_begin():
+        headers.clear()
+        part.update(field=b"", value=b"")
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        headers[part["field"].lower()] = part["value"]
+        part.update(field=b"", value=b"")
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        if state["filename"] is None and disposition.get(b"name", b"").decode() == field and b"filename" in disposition:
+            state["in_file"] = True
+            state["filename"] = disposition[b"filename"].decode("latin-1")
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if state["in_file"]:
+            pending.append(data[start:end])
+
+    def on_part_end():
+        if state["in_file"]:
+            state["in_file"], state["complete"] = False, True
+
+    parser = python_multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise InvalidRequestDataException(field, f"malformed multipart body: {e}", original_exception=e)
+            if state["filename"] is not None and size == 0:
+                check_audio_filename(state["filename"])
+            for data in pending:
+                size += len(data)
+                if size > max_bytes:
+                    raise too_large(size, max_bytes)
+                if getattr(spool, "_rolled", False):
+                    await run_in_threadpool(spool.write, data)
+                else:
+                    spool.write(data)
+            pending.clear()
+            if state["complete"]:
+                break
+        if state["filename"] is None:
+            raise InvalidRequestDataException(field, "no audio file in the upload")
+        check_audio_filename(state["filename"])
+        if size == 0:
+            raise InvalidFileFormatException(details={"reason": "Empty file", "file_size": 0})
+    except BaseException:
+        spool.close()
+        raise
+
+    await rewind(spool)
+    return AudioUpload(state["filename"], spool, size)
+
+
+async def receive_audio_stream(
+    websocket: WebSocket,
+    max_bytes: Optional[int] = None,
+    spool_max_size: Optional[int] = None,
+    idle_timeout: Optional[float] = None,
+) -> Optional[AudioUpload]:
+    """Receive one recording sent over a WebSocket while it is being made.
+
+    The client sends a ``{"type": "start", "filename": ...}`` text message,
+    the audio as binary messages as the recorder produces them, then
+    ``{"type": "stop"}``. Chunks are spooled as they arrive under the same
+    size limit as uploads. Returns None if the client closes the socket
+    before starting a recording.
+    """
+    max_bytes = max_bytes if max_bytes is not None else env_int("AUDIO_UPLOAD_MAX_BYTES", AUDIO_UPLOAD_MAX_BYTES)
+    spool_max_size = spool_max_size if spool_max_size is not None else env_int("AUDIO_UPLOAD_SPOOL_BYTES", 1024 * 1024)
+    idle_timeout = idle_timeout if idle_timeout is not None else env_float("VOICE_STREAM_IDLE_TIMEOUT", 30.0)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+    filename: Optional[str] = None
+    size = 0
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), idle_timeout)
+            except asyncio.TimeoutError:
+                raise InvalidRequestDataException("audio", f"nothing received for {idle_timeout} seconds")
+            if message["type"] == "websocket.disconnect":
+                if filename is None:
+                    spool.close()
+                    return None
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                if filename is None:
+                    raise InvalidRequestDataException("audio", "audio received before the start message")
+                data = message["bytes"]
+                size += len(data)
+                if size > max_bytes:
+                    raise too_large(size, max_bytes)
+                if getattr(spool, "_rolled", False):
+                    await run_in_threadpool(spool.write, data)
+                else:
+                    spool.write(data)
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "")
+            except ValueError as e:
+                raise InvalidRequestDataException("message", "expected JSON", original_exception=e)
+            kind = control.get("type") if isinstance(control, dict) else None
+            if kind == "start" and filename is None:
+                filename = control.get("filename") or "recording.webm"
+                check_audio_filename(filename)
+            elif kind == "stop" and filename is not None:
+                if size == 0:
+                    raise InvalidFileFormatException(details={"reason": "Empty file", "file_size": 0})
+                await rewind(spool)
+                return AudioUpload(filename, spool, size)
+            else:
+                raise InvalidRequestDataException("message", f"unexpected message type: {kind}")
+    except BaseException:
+        spool.close()
+        raise
@@ -0,0 +1,237 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tags")
+
+    def __init__(self, value: Any, expires_at: Optional[float], tags: Set[str]):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and tag-based invalidation."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._tag_index: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return default
+            if entry.expires_at is not None and entry.expires_at <= self._clock():
+                self._remove(key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry.value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        tags: Iterable[str] = (),
+    ):
+        if self.max_entries <= 0:
+            return
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = self._clock() + ttl if ttl is not None else None
+        entry = _Entry(value, expires_at, set(tags))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._counters["evictions"] += 1
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self._counters["invalidations"] += removed
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._tag_index.clear()
+            self._counters["invalidations"] += removed
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "backend": "memory",
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                **self._counters,
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+
+class SqliteTTLCache:
+    """LRU/TTL cache of text values in a local SQLite file, shareable between worker processes."""
+
+    _TABLE_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        table: str = "cache_entries",
+        clock: Callable[[], float] = time.time,
+    ):
+        if not self._TABLE_NAME_RE.match(table):
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._table = table
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self._table} WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return default
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(f"DELETE FROM {self._table} WHERE cache_key = ?", (key,))
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return default
+            self._conn.execute(f"UPDATE {self._table} SET last_access = ? WHERE cache_key = ?", (now, key))
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None, tags: Iterable[str] = ()):
+        if self.max_entries <= 0:
+            return
+        now = self._clock()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (cache_key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self._table} WHERE cache_key IN "
+                    f"(SELECT cache_key FROM {self._table} ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._counters["evictions"] += overflow
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(f"DELETE FROM {self._table} WHERE cache_key = ?", (key,))
+            return cursor.rowcount > 0
+
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(f"DELETE FROM {self._table}")
+            self._counters["invalidations"] += cursor.rowcount
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT 1 FROM {self._table} WHERE cache_key = ?", (key,)
+            ).fetchone() is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "size": self._count(),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                **self._counters,
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
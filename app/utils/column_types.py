@@ -0,0 +1,60 @@
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Any, List, Optional, Sequence
+
+# PostgreSQL type OIDs reported in cursor.description by psycopg2 and asyncpg
+_PG_TYPE_NAMES = {
+    16: "boolean",
+    20: "integer",
+    21: "integer",
+    23: "integer",
+    25: "text",
+    700: "float",
+    701: "float",
+    1042: "text",
+    1043: "text",
+    1082: "date",
+    1114: "timestamp",
+    1184: "timestamp",
+    1700: "numeric",
+}
+
+_PYTHON_TYPE_NAMES = (
+    (bool, "boolean"),
+    (int, "integer"),
+    (float, "float"),
+    (Decimal, "numeric"),
+    (datetime, "timestamp"),
+    (date, "date"),
+    (str, "text"),
+)
+
+
+def _python_type_name(value: Any) -> str:
+    for python_type, name in _PYTHON_TYPE_NAMES:
+        if isinstance(value, python_type):
+            return name
+    return type(value).__name__
+
+
+def _infer_from_rows(index: int, rows: Sequence[Sequence[Any]]) -> str:
+    for row in islice(rows, 100):
+        value = row[index]
+        if value is not None:
+            return _python_type_name(value)
+    return "unknown"
+
+
+def describe_column_types(
+    description: Optional[Sequence[Sequence[Any]]],
+    rows: Sequence[Sequence[Any]],
+) -> List[str]:
+    if not description:
+        return []
+    column_types = []
+    for index, column in enumerate(description):
+        type_code = column[1]
+        name = _PG_TYPE_NAMES.get(type_code) if isinstance(type_code, int) else None
+        column_types.append(name or _infer_from_rows(index, rows))
+    return column_types
@@ -0,0 +1,54 @@
+import asyncio
+import inspect
+from typing import Any, AsyncIterator, Callable, List, Sequence, Union
+
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+
+from app.models.row_stream import RowStream, AsyncRowStream
+
+
+async def call_maybe_async(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await coroutine functions directly and run blocking callables in the threadpool."""
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_in_threadpool(func, *args, **kwargs)
+
+
+def to_async_row_stream(stream: Union[RowStream, AsyncRowStream]) -> AsyncRowStream:
+    """Expose a blocking RowStream to async consumers, fetching each batch in the threadpool."""
+    if isinstance(stream, AsyncRowStream):
+        return stream
+    return AsyncRowStream(
+        headers=stream.headers,
+        batches=iterate_in_threadpool(stream.iter_batches()),
+        on_close=lambda: run_in_threadpool(stream.close),
+    )
+
+
+async def iter_generated_sql(service: Any, question: str, **kwargs) -> AsyncIterator[str]:
+    """Yield SQL text as a text-to-SQL service produces it.
+
+    Services without a ``stream_sql`` async generator yield their whole
+    ``generate_sql`` result as a single piece.
+    """
+    stream_sql = getattr(service, "stream_sql", None)
+    if not inspect.isasyncgenfunction(stream_sql):
+        yield await call_maybe_async(service.generate_sql, question, **kwargs)
+        return
+    async for piece in stream_sql(question, **kwargs):
+        yield piece
+
+
+async def generate_sql_batch(service: Any, questions: Sequence[str]) -> List[Union[str, BaseException]]:
+    """SQL for many questions, one entry per question: the SQL or the exception that stopped it.
+
+    Services with a ``generate_sql_batch`` coroutine answer the whole list
+    themselves; others get one concurrent ``generate_sql`` call per question.
+    """
+    batch = getattr(service, "generate_sql_batch", None)
+    if inspect.iscoroutinefunction(batch):
+        return await batch(questions)
+    return list(await asyncio.gather(
+        *(call_maybe_async(service.generate_sql, question) for question in questions),
+        return_exceptions=True,
+    ))
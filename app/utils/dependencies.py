@@ -2,34 +2,460 @@ from fastapi import Depends
 from app.services.base.protocols import (
     TextToSqlProtocol,
     SqlExecutorProtocol,
+    AsyncSqlExecutorProtocol,
     QueryProcessorProtocol,
     VoiceToTextProtocol,
     ReportGeneratorProtocol,
 )
 from app.services.implementations.openai_text_to_sql import OpenAITextToSql
 from app.services.implementations.langchain_executor import LangChainExecutor
+from app.services.implementations.async_sql_executor import AsyncSqlExecutor
+from app.services.implementations.cached_sql_executor import CachedSqlExecutor
+from app.services.implementations.cached_text_to_sql import CachedTextToSql
+from app.services.implementations.similar_question_text_to_sql import SimilarQuestionTextToSql
+from app.services.implementations.rule_based_text_to_sql import RuleBasedTextToSql
 from app.services.implementations.sql_query_service import SqlQueryService
 from app.services.implementations.openai_whisper_service import OpenAIWhisperService
+from app.services.implementations.cached_voice_to_text import CachedVoiceToText, tiered_cache_stats
 from app.services.implementations.pdf_report_service import PDFReportService
+import asyncio
+import hashlib
+import inspect
+import logging
 import os
+import shutil
+import threading
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Union
 from dotenv import load_dotenv
 
+import openai
+
+from app.exceptions.domain import ConfigurationException
+from app.utils.audio_preprocessing import AudioPreprocessor
+from app.utils.openai_client import create_openai_client
+from app.utils.cache import TTLCache, SqliteTTLCache
+from app.utils.question_index import QuestionIndex
+from app.utils.question_rules import QuestionRules
+from app.utils.resilience import CircuitBreaker, ResilientCaller
+from app.utils.schema_catalog import SchemaCatalog
+from app.utils.schema_pruning import SchemaPruner
+from app.utils.singleflight import SingleFlight
+from app.utils.settings import env_str, env_int, env_float, env_bool
+from app.utils.sql_text import normalize_sql
+from app.utils import sql_safety
+from app.utils.prompt_cache import default_prompt_cache_stats
+from app.utils.usage_accounting import default_usage_ledger
+
 load_dotenv()
 
-def get_text_to_sql_service() -> TextToSqlProtocol:
-    return OpenAITextToSql()
+logger = logging.getLogger(__name__)
+
+SQL_EXECUTOR_BACKENDS = ("langchain", "async")
+
+_sql_executor: Optional[Union[LangChainExecutor, AsyncSqlExecutor, CachedSqlExecutor]] = None
+_sql_executor_lock = threading.Lock()
+
+def _build_backend_executor() -> Union[LangChainExecutor, AsyncSqlExecutor]:
+    backend = env_str("SQL_EXECUTOR_BACKEND", "langchain").lower()
+    if backend == "langchain":
+        return LangChainExecutor(db_url=os.getenv("DATABASE_URL"))
+    if backend == "async":
+        return AsyncSqlExecutor(db_url=os.getenv("DATABASE_URL"))
+    raise ConfigurationException(
+        "SQL_EXECUTOR_BACKEND",
+        details={"value": backend, "supported_backends": list(SQL_EXECUTOR_BACKENDS)}
+    )
+
+def _build_sql_executor() -> Union[LangChainExecutor, AsyncSqlExecutor, CachedSqlExecutor]:
+    executor = _build_backend_executor()
+    if not env_bool("SQL_RESULT_CACHE_ENABLED", True):
+        return executor
+    cache = TTLCache(
+        max_entries=env_int("SQL_RESULT_CACHE_MAX_ENTRIES", 256),
+        ttl_seconds=env_float("SQL_RESULT_CACHE_TTL", 300.0),
+    )
+    return CachedSqlExecutor(
+        executor,
+        cache,
+        known_tables=LangChainExecutor.INCLUDE_TABLES,
+        max_cached_rows=env_int("SQL_RESULT_CACHE_MAX_ROWS", 10000),
+        flight=SingleFlight() if env_bool("SINGLEFLIGHT_ENABLED", True) else None,
+    )
+
+def get_sql_result_cache() -> Optional[CachedSqlExecutor]:
+    return _sql_executor if isinstance(_sql_executor, CachedSqlExecutor) else None
+
+def init_sql_executor() -> Union[SqlExecutorProtocol, AsyncSqlExecutorProtocol]:
+    global _sql_executor
+    if _sql_executor is None:
+        with _sql_executor_lock:
+            if _sql_executor is None:
+                _sql_executor = _build_sql_executor()
+                logger.info(f"Shared SQL executor initialized: {type(_sql_executor).__name__}")
+    return _sql_executor
+
+async def close_sql_executor():
+    global _sql_executor
+    with _sql_executor_lock:
+        executor, _sql_executor = _sql_executor, None
+    if executor is not None:
+        closed = executor.close()
+        if inspect.isawaitable(closed):
+            await closed
+
+_openai_client: Optional[openai.AsyncOpenAI] = None
+_openai_client_lock = threading.Lock()
+
+def init_openai_client() -> openai.AsyncOpenAI:
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                _openai_client = create_openai_client()
+                logger.info("Shared OpenAI client initialized")
+    return _openai_client
+
+async def close_openai_client():
+    global _openai_client
+    with _openai_client_lock:
+        client, _openai_client = _openai_client, None
+    if client is not None:
+        await client.close()
+
+def get_openai_client() -> openai.AsyncOpenAI:
+    return init_openai_client()
+
+# Default latency budget, in seconds, of each OpenAI stage across all of its attempts.
+OPENAI_STAGE_BUDGETS = {"sql": 45.0, "whisper": 120.0}
+
+_openai_resilience: Dict[str, ResilientCaller] = {}
+_openai_resilience_lock = threading.Lock()
+
+def init_openai_resilience(stage: str) -> Optional[ResilientCaller]:
+    if not env_bool("OPENAI_RESILIENCE_ENABLED", True):
+        return None
+    caller = _openai_resilience.get(stage)
+    if caller is None:
+        with _openai_resilience_lock:
+            caller = _openai_resilience.get(stage)
+            if caller is None:
+                caller = ResilientCaller(
+                    stage,
+                    budget=env_float(f"OPENAI_{stage.upper()}_BUDGET", OPENAI_STAGE_BUDGETS[stage]),
+                    max_attempts=env_int("OPENAI_RETRY_MAX_ATTEMPTS", 3),
+                    base_delay=env_float("OPENAI_RETRY_BASE_DELAY", 0.25),
+                    max_delay=env_float("OPENAI_RETRY_MAX_DELAY", 4.0),
+                    hedge=env_bool("OPENAI_HEDGE_ENABLED", False),
+                    hedge_quantile=env_float("OPENAI_HEDGE_QUANTILE", 0.95),
+                    hedge_min_samples=env_int("OPENAI_HEDGE_MIN_SAMPLES", 20),
+                    breaker=CircuitBreaker(
+                        failure_threshold=env_int("OPENAI_BREAKER_FAILURE_THRESHOLD", 5),
+                        reset_timeout=env_float("OPENAI_BREAKER_RESET_TIMEOUT", 30.0),
+                    ),
+                )
+                _openai_resilience[stage] = caller
+                logger.info(f"OpenAI resilience for {stage} initialized")
+    return caller
+
+QUESTION_CACHE_BACKENDS = ("memory", "sqlite")
+
+_question_cache: Optional[Union[TTLCache, SqliteTTLCache]] = None
+_question_cache_lock = threading.Lock()
+
+def _build_question_cache() -> Union[TTLCache, SqliteTTLCache]:
+    backend = env_str("QUESTION_CACHE_BACKEND", "memory").lower()
+    max_entries = env_int("QUESTION_CACHE_MAX_ENTRIES", 5000)
+    ttl_seconds = env_float("QUESTION_CACHE_TTL", 7 * 24 * 3600.0)
+    if backend == "memory":
+        return TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        return SqliteTTLCache(
+            path=env_str("QUESTION_CACHE_PATH", "question_cache.sqlite3"),
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+            table="question_sql_cache",
+        )
+    raise ConfigurationException(
+        "QUESTION_CACHE_BACKEND",
+        details={"value": backend, "supported_backends": list(QUESTION_CACHE_BACKENDS)}
+    )
+
+def init_question_cache() -> Optional[Union[TTLCache, SqliteTTLCache]]:
+    global _question_cache
+    if not env_bool("QUESTION_CACHE_ENABLED", True):
+        return None
+    if _question_cache is None:
+        with _question_cache_lock:
+            if _question_cache is None:
+                _question_cache = _build_question_cache()
+                logger.info(f"Question cache initialized: {type(_question_cache).__name__}")
+    return _question_cache
+
+def close_question_cache():
+    global _question_cache
+    with _question_cache_lock:
+        cache, _question_cache = _question_cache, None
+    if isinstance(cache, SqliteTTLCache):
+        cache.close()
+
+_question_index: Optional[QuestionIndex] = None
+_question_index_lock = threading.Lock()
+
+def init_question_index() -> Optional[QuestionIndex]:
+    global _question_index
+    if not env_bool("SIMILAR_QUESTION_ENABLED", True):
+        return None
+    if _question_index is None:
+        with _question_index_lock:
+            if _question_index is None:
+                _question_index = QuestionIndex(max_entries=env_int("SIMILAR_QUESTION_MAX_ENTRIES", 200000))
+                logger.info("Similar-question index initialized")
+    return _question_index
 
-def get_sql_executor_service() -> SqlExecutorProtocol:
-    return LangChainExecutor(db_url=os.getenv("DATABASE_URL"))
+_schema_catalog: Optional[SchemaCatalog] = None
+_schema_catalog_lock = threading.Lock()
+
+def init_schema_catalog() -> Optional[SchemaCatalog]:
+    """Shared catalog over the executor's engine; it stays empty until refreshed."""
+    global _schema_catalog
+    if not env_bool("SCHEMA_CATALOG_ENABLED", True):
+        return None
+    if _schema_catalog is None:
+        with _schema_catalog_lock:
+            if _schema_catalog is None:
+                _schema_catalog = SchemaCatalog(
+                    init_sql_executor().engine,
+                    LangChainExecutor.INCLUDE_TABLES,
+                    statistics=env_bool("SCHEMA_STATISTICS_ENABLED", True),
+                    stats_max_rows=env_int("SCHEMA_STATISTICS_MAX_ROWS", 1000000),
+                    sample_max_distinct=env_int("SCHEMA_SAMPLE_MAX_DISTINCT", 12),
+                    sample_values=env_bool("SCHEMA_SAMPLE_VALUES_ENABLED", False),
+                )
+    return _schema_catalog
+
+def get_schema_catalog() -> Optional[SchemaCatalog]:
+    return _schema_catalog
+
+_schema_pruner: Optional[SchemaPruner] = None
+
+def get_schema_pruner() -> Optional[SchemaPruner]:
+    """Pruner over the loaded catalog; None until the catalog exists or when pruning is off."""
+    global _schema_pruner
+    if _schema_catalog is None or not env_bool("SCHEMA_PRUNING_ENABLED", True):
+        return None
+    with _schema_catalog_lock:
+        if _schema_pruner is None or _schema_pruner.catalog is not _schema_catalog:
+            _schema_pruner = SchemaPruner(
+                _schema_catalog,
+                min_prune_columns=env_int("SCHEMA_PRUNE_MIN_COLUMNS", 20),
+            )
+    return _schema_pruner
+
+_question_rules: Optional[QuestionRules] = None
+_question_rules_lock = threading.Lock()
+
+def get_question_rules() -> Optional[QuestionRules]:
+    """Local rule engine; its checks follow the catalog once one exists."""
+    global _question_rules
+    if not env_bool("TEXT_TO_SQL_RULES_ENABLED", True):
+        return None
+    with _question_rules_lock:
+        if _question_rules is None:
+            _question_rules = QuestionRules(_schema_catalog)
+        elif _question_rules.catalog is not _schema_catalog:
+            _question_rules.catalog = _schema_catalog
+    return _question_rules
+
+async def refresh_schema_catalog_periodically(catalog: SchemaCatalog, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await catalog.refresh()
+        except Exception as e:
+            logger.warning(f"Schema catalog refresh failed: {e}")
+
+def close_schema_catalog():
+    global _schema_catalog
+    with _schema_catalog_lock:
+        _schema_catalog = None
+
+_question_flight = SingleFlight()
+
+def get_question_flight() -> Optional[SingleFlight]:
+    return _question_flight if env_bool("SINGLEFLIGHT_ENABLED", True) else None
+
+_result_registry: Optional[TTLCache] = None
+_result_registry_lock = threading.Lock()
+
+def init_result_registry() -> TTLCache:
+    global _result_registry
+    if _result_registry is None:
+        with _result_registry_lock:
+            if _result_registry is None:
+                _result_registry = TTLCache(
+                    max_entries=env_int("RESULT_REGISTRY_MAX_ENTRIES", 1000),
+                    ttl_seconds=env_float("RESULT_REGISTRY_TTL", 3600.0),
+                )
+    return _result_registry
+
+def register_result(sql: str, headers: Sequence[str]) -> str:
+    """Remember generated SQL and its columns under a short id so its rows can be paged later."""
+    result_id = hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+    init_result_registry().set(result_id, (sql, list(headers)))
+    return result_id
+
+def lookup_result(result_id: str) -> Optional[Tuple[str, List[str]]]:
+    return init_result_registry().get(result_id)
+
+def clear_caches() -> Dict[str, int]:
+    cleared = {}
+    if isinstance(_sql_executor, CachedSqlExecutor):
+        cleared["sql_result_cache"] = _sql_executor.clear()
+    if _question_cache is not None:
+        cleared["question_cache"] = _question_cache.clear()
+    if _question_index is not None:
+        cleared["question_index"] = _question_index.clear()
+    if _transcription_cache is not None:
+        cleared["transcription_cache"] = _transcription_cache.clear()
+        if _transcription_disk_cache is not None:
+            cleared["transcription_cache"] += _transcription_disk_cache.clear()
+    return cleared
+
+def get_runtime_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    if _sql_executor is not None:
+        stats["sql_executor"] = {
+            "pool": _sql_executor.pool_status(),
+            "query_plans": _sql_executor.plan_stats(),
+        }
+        if isinstance(_sql_executor, CachedSqlExecutor):
+            stats["sql_result_cache"] = _sql_executor.cache_stats()
+    stats["singleflight"] = {
+        "questions": _question_flight.stats(),
+        "sql": _sql_executor.flight_stats() if isinstance(_sql_executor, CachedSqlExecutor) else None,
+    }
+    if _question_cache is not None:
+        stats["question_cache"] = _question_cache.stats()
+    if _question_index is not None:
+        stats["question_index"] = _question_index.stats()
+    if _result_registry is not None:
+        stats["result_registry"] = _result_registry.stats()
+    if _schema_catalog is not None:
+        stats["schema_catalog"] = _schema_catalog.stats()
+    if _schema_pruner is not None:
+        stats["schema_pruning"] = _schema_pruner.stats()
+    stats["sql_safety_cache"] = sql_safety.default_validator.cache_stats()
+    stats["openai_prompt_cache"] = default_prompt_cache_stats.stats()
+    stats["usage_accounting"] = default_usage_ledger.stats()
+    stats["openai_resilience"] = {stage: caller.stats() for stage, caller in _openai_resilience.items()}
+    if _question_rules is not None:
+        stats["text_to_sql_engines"] = _question_rules.stats()
+    if _audio_preprocessor is not None:
+        stats["audio_preprocessing"] = _audio_preprocessor.stats()
+    if _transcription_cache is not None:
+        stats["transcription_cache"] = tiered_cache_stats(_transcription_cache, _transcription_disk_cache)
+    return stats
+
+def get_text_to_sql_service(client: openai.AsyncOpenAI = Depends(get_openai_client)) -> TextToSqlProtocol:
+    text_to_sql: TextToSqlProtocol = OpenAITextToSql(
+        client=client,
+        schema_catalog=_schema_catalog,
+        schema_pruner=get_schema_pruner(),
+        resilience=init_openai_resilience("sql"),
+    )
+    question_rules = get_question_rules()
+    if question_rules is not None:
+        text_to_sql = RuleBasedTextToSql(text_to_sql, question_rules)
+    question_index = init_question_index()
+    if question_index is not None:
+        text_to_sql = SimilarQuestionTextToSql(
+            text_to_sql,
+            question_index,
+            reuse_threshold=env_float("SIMILAR_QUESTION_REUSE_THRESHOLD", 0.92),
+            example_threshold=env_float("SIMILAR_QUESTION_EXAMPLE_THRESHOLD", 0.35),
+            max_examples=env_int("SIMILAR_QUESTION_MAX_EXAMPLES", 3),
+        )
+    question_cache = init_question_cache()
+    if question_cache is None:
+        return text_to_sql
+    return CachedTextToSql(text_to_sql, question_cache)
+
+def get_sql_executor_service() -> Union[SqlExecutorProtocol, AsyncSqlExecutorProtocol]:
+    return init_sql_executor()
 
 def get_sql_query_service(
     text_to_sql: TextToSqlProtocol = Depends(get_text_to_sql_service),
-    sql_executor: SqlExecutorProtocol = Depends(get_sql_executor_service)
+    sql_executor: Union[SqlExecutorProtocol, AsyncSqlExecutorProtocol] = Depends(get_sql_executor_service)
 ) -> QueryProcessorProtocol:
-    return SqlQueryService(text_to_sql, sql_executor)
+    return SqlQueryService(text_to_sql, sql_executor, question_flight=get_question_flight())
+
+_audio_preprocessor: Optional[AudioPreprocessor] = None
+_audio_preprocessor_lock = threading.Lock()
+
+def get_audio_preprocessor() -> Optional[AudioPreprocessor]:
+    global _audio_preprocessor
+    if not env_bool("AUDIO_PREPROCESSING_ENABLED", True):
+        return None
+    with _audio_preprocessor_lock:
+        if _audio_preprocessor is None:
+            _audio_preprocessor = AudioPreprocessor(
+                sample_rate=env_int("AUDIO_SAMPLE_RATE", 16000),
+                silence_threshold_db=env_float("AUDIO_SILENCE_THRESHOLD_DB", -40.0),
+                pad_ms=env_int("AUDIO_SILENCE_PAD_MS", 250),
+                ffmpeg=env_str("FFMPEG_PATH") or shutil.which("ffmpeg"),
+                chunk_overlap_ms=env_int("WHISPER_CHUNK_OVERLAP_MS", 1000),
+            )
+            logger.info(f"Audio preprocessing initialized (ffmpeg: {_audio_preprocessor.ffmpeg or 'not found'})")
+    return _audio_preprocessor
+
+_transcription_cache: Optional[TTLCache] = None
+_transcription_disk_cache: Optional[SqliteTTLCache] = None
+_transcription_cache_lock = threading.Lock()
+
+def init_transcription_cache() -> Optional[TTLCache]:
+    """In-memory transcript LRU, plus a SQLite tier when TRANSCRIPTION_CACHE_PATH is set."""
+    global _transcription_cache, _transcription_disk_cache
+    if not env_bool("TRANSCRIPTION_CACHE_ENABLED", True):
+        return None
+    if _transcription_cache is None:
+        with _transcription_cache_lock:
+            if _transcription_cache is None:
+                ttl_seconds = env_float("TRANSCRIPTION_CACHE_TTL", 30 * 24 * 3600.0)
+                path = env_str("TRANSCRIPTION_CACHE_PATH")
+                if path:
+                    _transcription_disk_cache = SqliteTTLCache(
+                        path=path,
+                        max_entries=env_int("TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES", 100000),
+                        ttl_seconds=ttl_seconds,
+                        table="transcription_cache",
+                    )
+                _transcription_cache = TTLCache(
+                    max_entries=env_int("TRANSCRIPTION_CACHE_MAX_ENTRIES", 2000),
+                    ttl_seconds=ttl_seconds,
+                )
+                logger.info(f"Transcription cache initialized (disk tier: {path or 'none'})")
+    return _transcription_cache
+
+def close_transcription_cache():
+    global _transcription_cache, _transcription_disk_cache
+    with _transcription_cache_lock:
+        disk_cache = _transcription_disk_cache
+        _transcription_cache, _transcription_disk_cache = None, None
+    if disk_cache is not None:
+        disk_cache.close()
 
-def get_voice_to_text_service() -> VoiceToTextProtocol:
-    return OpenAIWhisperService()
+def get_voice_to_text_service(client: openai.AsyncOpenAI = Depends(get_openai_client)) -> VoiceToTextProtocol:
+    voice_to_text: VoiceToTextProtocol = OpenAIWhisperService(
+        client=client,
+        resilience=init_openai_resilience("whisper"),
+        preprocessor=get_audio_preprocessor(),
+        max_chunk_seconds=env_float("WHISPER_CHUNK_SECONDS", 60.0) or None,
+        max_parallel_chunks=env_int("WHISPER_MAX_PARALLEL_CHUNKS", 4),
+    )
+    transcription_cache = init_transcription_cache()
+    if transcription_cache is None:
+        return voice_to_text
+    return CachedVoiceToText(voice_to_text, transcription_cache, _transcription_disk_cache)
 
 def get_report_service() -> ReportGeneratorProtocol:
     return PDFReportService()
\ No newline at end of file
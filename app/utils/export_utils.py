@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from app.models.row_stream import AsyncRowStream
+
+EXPORT_MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+async def iter_csv(stream: AsyncRowStream) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    try:
+        writer.writerow(stream.headers)
+        yield buffer.getvalue().encode("utf-8")
+
+        async for batch in stream.iter_batches():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(batch)
+            yield buffer.getvalue().encode("utf-8")
+    finally:
+        await stream.aclose()
+
+
+async def iter_ndjson(stream: AsyncRowStream) -> AsyncIterator[bytes]:
+    headers = stream.headers
+    try:
+        async for batch in stream.iter_batches():
+            if not batch:
+                continue
+            lines = [json.dumps(dict(zip(headers, row)), default=str) for row in batch]
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+    finally:
+        await stream.aclose()
+
+
+async def iter_sse(events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """Encode ``(event, data)`` pairs as Server-Sent Events with JSON data."""
+    async for event, data in events:
+        yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8")
+
+
+def ws_event(event: str, data: Dict[str, Any]) -> str:
+    """Encode an ``(event, data)`` pair as one JSON WebSocket text message."""
+    return json.dumps({"event": event, "data": data}, default=str)
+
+
+EXPORT_ENCODERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+}
+
+
+def export_filename(question: str, export_format: str) -> str:
+    return f'report_{question[:30].replace(" ", "_")}.{export_format}'
@@ -0,0 +1,46 @@
+import importlib.util
+import logging
+import os
+from typing import Optional
+
+import httpx
+import openai
+
+from app.exceptions.domain import ConfigurationException
+from app.utils.settings import env_int, env_float, env_bool
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_openai_client(api_key: Optional[str] = None) -> openai.AsyncOpenAI:
+    api_key = api_key or os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        raise ConfigurationException("OPENAI_API_KEY")
+
+    http2 = env_bool("OPENAI_HTTP2", True)
+    if http2 and not _http2_available():
+        logger.warning("OPENAI_HTTP2 is enabled but the h2 package is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    http_client = openai.DefaultAsyncHttpxClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=env_int("OPENAI_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=env_int("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20),
+            keepalive_expiry=env_float("OPENAI_KEEPALIVE_EXPIRY", 60.0),
+        ),
+        timeout=httpx.Timeout(
+            env_float("OPENAI_TIMEOUT", 60.0),
+            connect=env_float("OPENAI_CONNECT_TIMEOUT", 5.0),
+        ),
+    )
+    return openai.AsyncOpenAI(
+        api_key=api_key,
+        http_client=http_client,
+        # Retries are done by the resilience layer when it is on, so the SDK does not retry as well.
+        max_retries=env_int("OPENAI_MAX_RETRIES", 0 if env_bool("OPENAI_RESILIENCE_ENABLED", True) else 2),
+    )
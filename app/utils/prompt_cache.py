@@ -0,0 +1,51 @@
+import threading
+from typing import Any, Dict, Optional
+
+
+def cached_prompt_tokens(usage: Any) -> Optional[int]:
+    """Prompt tokens the provider served from its prompt cache, if the response reports them."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    return cached if isinstance(cached, int) else None
+
+
+class PromptCacheStats:
+    """Running totals of prompt tokens and the share the provider served from its prompt cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "reported": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "cache_hits": 0,
+            "prefix_builds": 0,
+        }
+
+    def record_usage(self, usage: Any) -> Optional[int]:
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        cached = cached_prompt_tokens(usage)
+        with self._lock:
+            self._counters["requests"] += 1
+            if isinstance(prompt_tokens, int):
+                self._counters["reported"] += 1
+                self._counters["prompt_tokens"] += prompt_tokens
+                self._counters["cached_tokens"] += cached or 0
+                self._counters["cache_hits"] += int(bool(cached))
+        return cached
+
+    def record_prefix_build(self):
+        with self._lock:
+            self._counters["prefix_builds"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            prompt_tokens = self._counters["prompt_tokens"]
+            return {
+                **self._counters,
+                "cached_token_ratio": round(self._counters["cached_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0,
+            }
+
+
+default_prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,136 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from app.exceptions.domain import QueryTooExpensiveException
+from app.utils.settings import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+class PlanEstimate:
+    __slots__ = ("total_cost", "startup_cost", "plan_rows", "node_type")
+
+    def __init__(self, total_cost: float, startup_cost: float, plan_rows: int, node_type: str):
+        self.total_cost = total_cost
+        self.startup_cost = startup_cost
+        self.plan_rows = plan_rows
+        self.node_type = node_type
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "estimated_cost": self.total_cost,
+            "estimated_startup_cost": self.startup_cost,
+            "estimated_rows": self.plan_rows,
+            "plan_node": self.node_type,
+        }
+
+
+def explain_sql(sql: str) -> str:
+    return f"EXPLAIN (FORMAT JSON) {sql}"
+
+
+def parse_plan(explain_output: Any) -> PlanEstimate:
+    """Top-level estimates from PostgreSQL ``EXPLAIN (FORMAT JSON)`` output (parsed or raw JSON)."""
+    if isinstance(explain_output, (str, bytes)):
+        explain_output = json.loads(explain_output)
+    if isinstance(explain_output, list):
+        explain_output = explain_output[0]
+    plan = explain_output["Plan"]
+    return PlanEstimate(
+        total_cost=float(plan.get("Total Cost", 0.0)),
+        startup_cost=float(plan.get("Startup Cost", 0.0)),
+        plan_rows=int(plan.get("Plan Rows", 0)),
+        node_type=plan.get("Node Type", ""),
+    )
+
+
+def transaction_guard_statements(statement_timeout_ms: int) -> List[str]:
+    """Statements that make the current PostgreSQL transaction read-only and time-limited."""
+    statements = ["SET TRANSACTION READ ONLY"]
+    if statement_timeout_ms > 0:
+        statements.append(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+    return statements
+
+
+class QueryCostGuard:
+    """Rejects statements whose planner estimates exceed the limits and keeps recent estimates for tuning."""
+
+    def __init__(
+        self,
+        max_cost: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        statement_timeout_ms: int = 0,
+        explain: bool = True,
+        history_size: int = 200,
+    ):
+        self.max_cost = max_cost or None
+        self.max_rows = max_rows or None
+        self.statement_timeout_ms = statement_timeout_ms
+        self.explain = explain
+        self._history: deque = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._counters = {"checked": 0, "rejected": 0}
+
+    def check(self, sql: str, estimate: PlanEstimate) -> Dict[str, Any]:
+        """Record the estimate and raise QueryTooExpensiveException if it is over a limit."""
+        rejected = (
+            (self.max_cost is not None and estimate.total_cost > self.max_cost)
+            or (self.max_rows is not None and estimate.plan_rows > self.max_rows)
+        )
+        record = {
+            "sql_preview": sql[:100],
+            **estimate.as_dict(),
+            "rejected": rejected,
+            "actual_rows": None,
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            self._counters["checked"] += 1
+            if rejected:
+                self._counters["rejected"] += 1
+            self._history.append(record)
+
+        logger.info(
+            f"Planner estimate: cost={estimate.total_cost} rows={estimate.plan_rows} "
+            f"node={estimate.node_type} rejected={rejected}"
+        )
+        if rejected:
+            raise QueryTooExpensiveException(
+                sql_query=sql,
+                estimate={
+                    "estimated_cost": estimate.total_cost,
+                    "estimated_rows": estimate.plan_rows,
+                    "max_cost": self.max_cost,
+                    "max_rows": self.max_rows,
+                },
+            )
+        return record
+
+    def record_actual_rows(self, record: Dict[str, Any], rows: int):
+        with self._lock:
+            record["actual_rows"] = rows
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "explain": self.explain,
+                "max_cost": self.max_cost,
+                "max_rows": self.max_rows,
+                "statement_timeout_ms": self.statement_timeout_ms,
+                **self._counters,
+                "recent": [dict(record) for record in list(self._history)[-20:]],
+            }
+
+
+def default_cost_guard() -> QueryCostGuard:
+    return QueryCostGuard(
+        max_cost=env_float("SQL_MAX_PLAN_COST", 1000000.0),
+        max_rows=env_int("SQL_MAX_PLAN_ROWS", 5000000),
+        statement_timeout_ms=env_int("SQL_STATEMENT_TIMEOUT_MS", 15000),
+        explain=env_bool("SQL_EXPLAIN_ENABLED", True),
+        history_size=env_int("SQL_PLAN_HISTORY_SIZE", 200),
+    )
@@ -0,0 +1,141 @@
+import math
+import threading
+from array import array
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.utils.text_normalize import question_tokens
+
+
+class QuestionMatch:
+    __slots__ = ("question", "sql", "score")
+
+    def __init__(self, question: str, sql: str, score: float):
+        self.question = question
+        self.sql = sql
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"QuestionMatch(score={self.score:.3f}, question={self.question!r})"
+
+
+def question_features(question: str, ngram: int = 3) -> Dict[str, float]:
+    """Sublinear, L2-normalized counts of word tokens and padded character n-grams."""
+    counts: Dict[str, int] = {}
+    for token in question_tokens(question):
+        counts["w:" + token] = counts.get("w:" + token, 0) + 1
+        padded = f" {token} "
+        for i in range(max(1, len(padded) - ngram + 1)):
+            gram = padded[i:i + ngram]
+            counts[gram] = counts.get(gram, 0) + 1
+    weights = {feature: 1.0 + math.log(count) for feature, count in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    if norm == 0:
+        return {}
+    return {feature: w / norm for feature, w in weights.items()}
+
+
+class QuestionIndex:
+    """Incremental cosine-similarity index over (question, SQL) pairs.
+
+    Each feature keeps a posting list of document ids and weights in growable
+    arrays; a search scores every candidate at once with NumPy over the posting
+    lists of the query's features, so cost scales with matching postings
+    rather than with the number of stored pairs.
+    """
+
+    def __init__(self, max_entries: int = 200000, ngram: int = 3):
+        self.max_entries = max_entries
+        self.ngram = ngram
+        self._feature_ids: Dict[str, int] = {}
+        self._posting_docs: List[array] = []
+        self._posting_weights: List[array] = []
+        self._questions: List[str] = []
+        self._sqls: List[str] = []
+        self._doc_ids: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+        self._outcomes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def add(self, question: str, sql: str) -> bool:
+        key = tuple(question_tokens(question))
+        if not key:
+            return False
+        features = question_features(question, self.ngram)
+        with self._lock:
+            doc_id = self._doc_ids.get(key)
+            if doc_id is not None:
+                self._sqls[doc_id] = sql
+                return True
+            if len(self._questions) >= self.max_entries:
+                return False
+            doc_id = len(self._questions)
+            self._questions.append(question)
+            self._sqls.append(sql)
+            self._doc_ids[key] = doc_id
+            for feature, weight in features.items():
+                feature_id = self._feature_ids.get(feature)
+                if feature_id is None:
+                    feature_id = len(self._posting_docs)
+                    self._feature_ids[feature] = feature_id
+                    self._posting_docs.append(array("i"))
+                    self._posting_weights.append(array("f"))
+                self._posting_docs[feature_id].append(doc_id)
+                self._posting_weights[feature_id].append(weight)
+        return True
+
+    def search(self, question: str, k: int = 3, min_score: float = 0.0) -> List[QuestionMatch]:
+        features = question_features(question, self.ngram)
+        if not features or k <= 0:
+            return []
+        with self._lock:
+            doc_count = len(self._questions)
+            if doc_count == 0:
+                return []
+            scores = np.zeros(doc_count, dtype=np.float32)
+            for feature, weight in features.items():
+                feature_id = self._feature_ids.get(feature)
+                if feature_id is None:
+                    continue
+                docs = np.frombuffer(self._posting_docs[feature_id], dtype=np.int32)
+                doc_weights = np.frombuffer(self._posting_weights[feature_id], dtype=np.float32)
+                scores[docs] += weight * doc_weights
+                del docs, doc_weights
+
+            k = min(k, doc_count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                QuestionMatch(self._questions[i], self._sqls[i], float(scores[i]))
+                for i in top
+                if scores[i] > min_score
+            ]
+
+    def record(self, outcome: str):
+        """Counts how a lookup was used (e.g. reused or passed as examples) for stats()."""
+        with self._lock:
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._questions)
+            self._feature_ids.clear()
+            self._posting_docs.clear()
+            self._posting_weights.clear()
+            self._questions.clear()
+            self._sqls.clear()
+            self._doc_ids.clear()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._questions),
+                "max_entries": self.max_entries,
+                "features": len(self._feature_ids),
+                "postings": sum(len(p) for p in self._posting_docs),
+                **self._outcomes,
+            }
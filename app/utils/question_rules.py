@@ -0,0 +1,282 @@
+import datetime
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.utils.resilience import LatencyWindow
+from app.utils.schema_catalog import SchemaCatalog
+from app.utils.text_normalize import question_tokens
+
+BASE_TABLE, BASE_ALIAS = "ai_service_usage", "u"
+DATE_COLUMN = "usage_date"
+
+# Joins used until the schema catalog is loaded: usage column -> referenced "table.column".
+DEFAULT_FOREIGN_KEYS = {"service_id": "ai_services.id", "client_id": "ai_projects.id"}
+TABLE_ALIASES = {"ai_service_usage": "u", "ai_services": "s", "ai_projects": "p"}
+
+# Group-by dimension: spoken forms -> (table, column, output name).
+DIMENSIONS: Dict[str, Tuple[str, str, str]] = {}
+for _words, _target in (
+    (("model", "models"), ("ai_services", "model", "model")),
+    (("provider", "providers", "vendor", "vendors"), ("ai_services", "provider", "provider")),
+    (("service", "services"), ("ai_services", "name", "service_name")),
+    (("user", "users"), ("ai_service_usage", "user_name", "user_name")),
+    (("country", "countries"), ("ai_projects", "country", "country")),
+    (("client", "clients", "customer", "customers", "project", "projects"), ("ai_projects", "client_name", "client_name")),
+    (("industry", "industries"), ("ai_projects", "industry", "industry")),
+    (("day", "days", "date", "dates", "daily"), ("ai_service_usage", "usage_date", "usage_date")),
+):
+    for _word in _words:
+        DIMENSIONS[_word] = _target
+
+TOKEN_WORDS = {"token", "tokens"}
+TOKEN_KINDS = {
+    "prompt": "prompt_tokens",
+    "input": "prompt_tokens",
+    "completion": "completion_tokens",
+    "output": "completion_tokens",
+}
+COUNT_WORDS = {
+    "count", "counts", "number", "times", "usage", "usages", "uses", "used", "requests", "calls",
+    "queries", "many",
+}
+# Count words that ask how many of a thing there are rather than how often something was used.
+ENTITY_COUNT_WORDS = {"count", "number", "many"}
+# Without one of these a dimension names what to count, not what to group by.
+GROUPING_WORDS = {"per", "by", "each", "every", "across", "breakdown", "grouped", "daily"}
+# Words that may appear around a recognised shape without changing its meaning.
+FILLER_WORDS = {
+    "show", "me", "list", "give", "get", "display", "find", "what", "which", "is", "are", "was", "were",
+    "the", "a", "an", "all", "of", "for", "please", "total", "totals", "sum", "overall", "much", "each",
+    "every", "per", "by", "across", "group", "grouped", "breakdown", "broken", "down", "how", "use", "in",
+    "and", "with", "their", "its", "has", "have", "did", "do", "does", "spent", "consumed", "amount",
+    "report", "activity", "statistics", "stats",
+}
+DATE_UNITS = {"day": "day", "days": "day", "week": "week", "weeks": "week", "month": "month", "months": "month"}
+
+
+def _date(token: str) -> Optional[str]:
+    try:
+        return datetime.date.fromisoformat(token).isoformat()
+    except ValueError:
+        return None
+
+
+def _year(token: str) -> Optional[int]:
+    if len(token) == 4 and token.isdigit() and 1900 <= int(token) <= 2100:
+        return int(token)
+    return None
+
+
+def parse_date_filter(tokens: List[str], column: str) -> Tuple[Optional[str], List[str], bool]:
+    """Find one date-range phrase; return its SQL condition, the tokens left over and whether parsing failed."""
+    found: Optional[Tuple[int, int, str]] = None
+    for start, token in enumerate(tokens):
+        rest = tokens[start:]
+        condition, length = None, 0
+        if token in ("between", "from") and len(rest) >= 4 and rest[2] in ("and", "to", "until", "through"):
+            first, last = _date(rest[1]), _date(rest[3])
+            if first and last:
+                condition, length = f"{column} BETWEEN '{first}' AND '{last}'", 4
+        if condition is None and token in ("since", "after", "from", "before", "until", "on") and len(rest) >= 2:
+            day = _date(rest[1])
+            if day:
+                operator = {"since": ">=", "from": ">=", "after": ">", "before": "<", "until": "<=", "on": "="}[token]
+                condition, length = f"{column} {operator} '{day}'", 2
+        if condition is None and token in ("in", "during") and len(rest) >= 2 and _year(rest[1]):
+            year = _year(rest[1])
+            condition, length = f"{column} >= '{year}-01-01' AND {column} < '{year + 1}-01-01'", 2
+        if condition is None and token in ("last", "past") and len(rest) >= 3 and rest[1].isdigit() and rest[2] in DATE_UNITS:
+            condition, length = f"{column} >= CURRENT_DATE - INTERVAL '{int(rest[1])} {DATE_UNITS[rest[2]]}'", 3
+        if condition is None and token in ("today", "yesterday"):
+            condition, length = f"{column} = CURRENT_DATE" + (" - 1" if token == "yesterday" else ""), 1
+        if condition is None:
+            continue
+        if found is not None:
+            return None, tokens, True
+        found = (start, start + length, condition)
+    if found is None:
+        return None, tokens, False
+    start, end, condition = found
+    return condition, tokens[:start] + tokens[end:], False
+
+
+class RuleMatch:
+    __slots__ = ("rule", "sql")
+
+    def __init__(self, rule: str, sql: str):
+        self.rule = rule
+        self.sql = sql
+
+
+class QuestionRules:
+    """Deterministic SQL for the common aggregate question shapes.
+
+    A question matches when it names one metric (a usage count or a token
+    sum), one group-by dimension and at most one date range, and every
+    other word is filler. The dimension only groups the result when the
+    question says so ("per", "by", "each", ...); otherwise "how many users"
+    is a single distinct count, and other ungrouped shapes are left alone.
+    Joins and columns are checked against the schema catalog when it is
+    loaded, so a rule is skipped rather than producing SQL for a column
+    that no longer exists. Anything else is left to the next engine.
+    """
+
+    # Bump when a rule starts answering differently, so cached answers are not reused.
+    VERSION = "2"
+
+    def __init__(self, catalog: Optional[SchemaCatalog] = None):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._counters = {"lookups": 0, "matched": 0}
+        self._rule_hits: Dict[str, int] = {}
+        self._latencies = {"rules": LatencyWindow(), "fallback": LatencyWindow()}
+        self._fallback_calls = 0
+
+    def _columns(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        if self.catalog is None or not self.catalog.ready:
+            return None
+        return {
+            table.name: {column.name: column for column in table.columns}
+            for table in self.catalog.tables_snapshot()
+        }
+
+    def _join(self, table: str, columns: Optional[Dict[str, Dict[str, Any]]]) -> Optional[str]:
+        if table == BASE_TABLE:
+            return ""
+        if columns is None:
+            foreign_keys = DEFAULT_FOREIGN_KEYS
+        else:
+            foreign_keys = {
+                name: column.foreign_key for name, column in columns.get(BASE_TABLE, {}).items() if column.foreign_key
+            }
+        for name, reference in foreign_keys.items():
+            referenced_table, _, referenced_column = reference.partition(".")
+            if referenced_table == table:
+                alias = TABLE_ALIASES[table]
+                return f"\nLEFT JOIN {table} {alias} ON {BASE_ALIAS}.{name} = {alias}.{referenced_column}"
+        return None
+
+    def match(self, question: str) -> Optional[RuleMatch]:
+        tokens = question_tokens(question)
+        date_column = f"{BASE_ALIAS}.{DATE_COLUMN}"
+        date_condition, tokens, ambiguous = parse_date_filter(tokens, date_column)
+        if ambiguous:
+            return None
+
+        dimensions = {DIMENSIONS[token] for token in tokens if token in DIMENSIONS}
+        if len(dimensions) != 1:
+            return None
+        table, column, output = dimensions.pop()
+
+        token_kinds = {TOKEN_KINDS[token] for token in tokens if token in TOKEN_KINDS}
+        if any(token in TOKEN_WORDS for token in tokens):
+            if len(token_kinds) > 1:
+                return None
+            rule, metric_name = "tokens", "total_tokens"
+            if token_kinds:
+                kind = token_kinds.pop()
+                metric = f"SUM({BASE_ALIAS}.{kind})"
+                rule, metric_name = kind, f"total_{kind}"
+            else:
+                metric = f"SUM({BASE_ALIAS}.prompt_tokens + {BASE_ALIAS}.completion_tokens)"
+        elif any(token in COUNT_WORDS for token in tokens) and not token_kinds:
+            rule, metric_name, metric = "count", "usage_count", f"COUNT({BASE_ALIAS}.id)"
+        else:
+            return None
+
+        known = FILLER_WORDS | COUNT_WORDS | TOKEN_WORDS | set(TOKEN_KINDS) | set(DIMENSIONS)
+        if any(token not in known for token in tokens):
+            return None
+
+        grouped = any(token in GROUPING_WORDS for token in tokens)
+        if not grouped and (rule != "count" or any(token in COUNT_WORDS - ENTITY_COUNT_WORDS for token in tokens)):
+            return None
+
+        columns = self._columns()
+        if columns is not None:
+            needed = [(table, column)]
+            if grouped:
+                needed += [(BASE_TABLE, "id"), (BASE_TABLE, "prompt_tokens"), (BASE_TABLE, "completion_tokens")]
+            if date_condition:
+                needed.append((BASE_TABLE, DATE_COLUMN))
+            if any(name not in columns.get(owner, {}) for owner, name in needed):
+                return None
+
+        if not grouped:
+            return self._distinct_count(table, column, output, date_condition, columns)
+        join = self._join(table, columns)
+        if join is None:
+            return None
+
+        alias = TABLE_ALIASES[table]
+        if table == BASE_TABLE:
+            selected, order = f"{alias}.{column}", f"{alias}.{column}" if column == DATE_COLUMN else f"{metric_name} DESC"
+        else:
+            selected, order = f"COALESCE({alias}.{column}, 'Unknown')", f"{metric_name} DESC"
+        where = f"\nWHERE {date_condition}" if date_condition else ""
+        sql = (
+            f"SELECT {selected} AS {output}, {metric} AS {metric_name}\n"
+            f"FROM {BASE_TABLE} {BASE_ALIAS}{join}{where}\n"
+            f"GROUP BY {alias}.{column}\n"
+            f"ORDER BY {order};"
+        )
+        return RuleMatch(f"{rule}_by_{output}", sql)
+
+    def _distinct_count(
+        self,
+        table: str,
+        column: str,
+        output: str,
+        date_condition: Optional[str],
+        columns: Optional[Dict[str, Dict[str, Any]]],
+    ) -> Optional[RuleMatch]:
+        alias = TABLE_ALIASES[table]
+        if date_condition:
+            # Only usage rows carry a date, so count what was used in the period.
+            join = self._join(table, columns)
+            if join is None:
+                return None
+            source = f"{BASE_TABLE} {BASE_ALIAS}{join}\nWHERE {date_condition}"
+        else:
+            source = f"{table} {alias}"
+        name = output[:-len("_name")] if output.endswith("_name") else output
+        sql = f"SELECT COUNT(DISTINCT {alias}.{column}) AS {name}_count\nFROM {source};"
+        return RuleMatch(f"count_distinct_{output}", sql)
+
+    def record_lookup(self, match: Optional[RuleMatch], seconds: float):
+        self._latencies["rules"].add(seconds)
+        with self._lock:
+            self._counters["lookups"] += 1
+            if match is not None:
+                self._counters["matched"] += 1
+                self._rule_hits[match.rule] = self._rule_hits.get(match.rule, 0) + 1
+
+    def record_fallback(self, seconds: float):
+        self._latencies["fallback"].add(seconds)
+        with self._lock:
+            self._fallback_calls += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups, matched = self._counters["lookups"], self._counters["matched"]
+            rule_hits, fallback_calls = dict(self._rule_hits), self._fallback_calls
+
+        def latency(window: LatencyWindow, quantile: float, scale: float) -> Optional[float]:
+            value = window.percentile(quantile)
+            return round(value * scale, 1) if value is not None else None
+
+        return {
+            "rules": {
+                "lookups": lookups,
+                "matched": matched,
+                "match_rate": round(matched / lookups, 4) if lookups else 0.0,
+                "by_rule": rule_hits,
+                "latency_p50_us": latency(self._latencies["rules"], 0.5, 1e6),
+                "latency_p95_us": latency(self._latencies["rules"], 0.95, 1e6),
+            },
+            "fallback": {
+                "calls": fallback_calls,
+                "latency_p50_ms": latency(self._latencies["fallback"], 0.5, 1e3),
+                "latency_p95_ms": latency(self._latencies["fallback"], 0.95, 1e3),
+            },
+        }
@@ -0,0 +1,24 @@
+import contextvars
+import re
+import uuid
+from typing import Optional
+
+# Caller-supplied ids are kept only when they are short and plain.
+_VALID_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+_correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+
+
+def current_correlation_id() -> Optional[str]:
+    """Correlation id of the request being handled, if any."""
+    return _correlation_id.get()
+
+
+def start_correlation(correlation_id: Optional[str] = None) -> contextvars.Token:
+    if not correlation_id or not _VALID_ID_RE.match(correlation_id):
+        correlation_id = str(uuid.uuid4())
+    return _correlation_id.set(correlation_id)
+
+
+def end_correlation(token: contextvars.Token):
+    _correlation_id.reset(token)
@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import openai
+
+from app.exceptions.domain import OpenAIServiceException
+
+T = TypeVar("T")
+
+# Errors worth another attempt: the request may succeed if sent again.
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class LatencyWindow:
+    """Durations of the most recent successful calls, for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(quantile * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """Opens after consecutive upstream failures and lets one probe through after a cool-down."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._opens = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        if self._state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def abandon_probe(self):
+        """A probe that ended with no verdict (cancelled, or an unexpected error) counts as a failed one."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+
+    def _open(self):
+        if self._state != self.OPEN:
+            self._opens += 1
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self._state,
+            "consecutive_failures": self._failures,
+            "opens": self._opens,
+            "retry_after_s": round(self.retry_after(), 3),
+        }
+
+
+class ResilientCaller:
+    """Runs one upstream stage within a latency budget.
+
+    Retryable errors are retried with full-jitter exponential backoff while
+    the budget lasts. With hedging on, a second identical request is sent
+    once an attempt has run longer than the observed ``hedge_quantile``
+    latency, and whichever answers first wins. While the circuit breaker is
+    open calls fail at once with ``OpenAIServiceException``.
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        budget: float = 45.0,
+        max_attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+        latencies: Optional[LatencyWindow] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.stage = stage
+        self.budget = budget
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = latencies or LatencyWindow()
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0, "rejected": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_quantile)
+
+    async def call(self, func: Callable[[float], Awaitable[T]], timeout: float, hedge: bool = True) -> T:
+        """Await ``func(attempt_timeout)``; streams should pass ``hedge=False`` so no response is left unread."""
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise OpenAIServiceException(
+                api_error=f"Circuit open for {self.stage}",
+                details={"stage": self.stage, "circuit": CircuitBreaker.OPEN, "retry_after_s": round(self.breaker.retry_after(), 3)}
+            )
+        # Only this call may settle a half-open breaker; if it ends without doing so the breaker reopens.
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            return await self._call(func, timeout, hedge)
+        except BaseException:
+            if probe:
+                self.breaker.abandon_probe()
+            raise
+
+    async def _call(self, func: Callable[[float], Awaitable[T]], timeout: float, hedge: bool) -> T:
+        deadline = time.monotonic() + self.budget
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_timeout = min(timeout, deadline - time.monotonic())
+            try:
+                if attempt_timeout <= 0:
+                    raise asyncio.TimeoutError()
+                result = await self._attempt(func, attempt_timeout, hedge)
+            except RETRYABLE_ERRORS as e:
+                delay = self._backoff(attempt)
+                if attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+                    self.breaker.record_failure()
+                    self._count("failures")
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise OpenAIServiceException(
+                            api_error=f"{self.stage} exceeded its {self.budget}s latency budget",
+                            original_exception=e,
+                            details={"stage": self.stage, "attempts": attempt}
+                        )
+                    raise
+                self.logger.warning(f"{self.stage} attempt {attempt} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                self._count("retries")
+                await asyncio.sleep(delay)
+            except openai.APIStatusError:
+                # Upstream answered; a client error says nothing about its health.
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _attempt(self, func: Callable[[float], Awaitable[T]], timeout: float, hedge: bool) -> T:
+        started = time.monotonic()
+        hedge_after = self._hedge_delay() if hedge else None
+        if hedge_after is None or hedge_after >= timeout:
+            result = await asyncio.wait_for(func(timeout), timeout)
+        else:
+            result = await self._hedged(func, timeout, hedge_after)
+        self.latencies.add(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, func: Callable[[float], Awaitable[T]], timeout: float, hedge_after: float) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        tasks = [asyncio.ensure_future(func(timeout))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                self._count("hedges")
+                tasks.append(asyncio.ensure_future(func(deadline - loop.time())))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        p50, p95 = self.latencies.percentile(0.5), self.latencies.percentile(0.95)
+        return {
+            **counters,
+            "budget_s": self.budget,
+            "hedging": self.hedge,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "circuit": self.breaker.stats(),
+        }
+
+
+async def resilient_call(
+    resilience: Optional[ResilientCaller],
+    func: Callable[[float], Awaitable[T]],
+    timeout: float,
+    hedge: bool = True,
+) -> T:
+    """Call ``func(timeout)`` through ``resilience`` when one is configured."""
+    if resilience is None:
+        return await func(timeout)
+    return await resilience.call(func, timeout, hedge=hedge)
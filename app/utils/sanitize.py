@@ -6,7 +6,7 @@ def sanitize_value(value):
     return str(value)
 
 def sanitize_row(row, headers=None):
-    if isinstance(row, list):
+    if isinstance(row, (list, tuple)):
         if headers:
             return {headers[i]: sanitize_value(val) for i, val in enumerate(row) if i < len(headers)}
         return {f"column_{i}": sanitize_value(val) for i, val in enumerate(row)}
@@ -19,7 +19,7 @@ def sanitize_rows(rows, headers=None):
     if not rows:
         return []
 
-    if headers is None and len(rows) > 0 and isinstance(rows[0], list):
+    if headers is None and len(rows) > 0 and isinstance(rows[0], (list, tuple)):
         headers = rows[0]
         rows = rows[1:]
     
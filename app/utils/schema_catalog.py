@@ -0,0 +1,248 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import inspect, types
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnInfo:
+    __slots__ = ("name", "type_name", "nullable", "primary_key", "foreign_key", "distinct_count", "sample_values")
+
+    def __init__(
+        self,
+        name: str,
+        type_name: str,
+        nullable: bool = True,
+        primary_key: bool = False,
+        foreign_key: Optional[str] = None,
+    ):
+        self.name = name
+        self.type_name = type_name
+        self.nullable = nullable
+        self.primary_key = primary_key
+        self.foreign_key = foreign_key
+        self.distinct_count: Optional[int] = None
+        self.sample_values: List[Any] = []
+
+
+class TableInfo:
+    __slots__ = ("name", "columns", "signature", "row_count", "refreshed_at")
+
+    def __init__(self, name: str, columns: List[ColumnInfo], signature: str):
+        self.name = name
+        self.columns = columns
+        self.signature = signature
+        self.row_count: Optional[int] = None
+        self.refreshed_at = time.time()
+
+
+def prompt_type_name(column_type: types.TypeEngine) -> str:
+    """Short, dialect-neutral type names in the style the prompt has always used."""
+    if isinstance(column_type, types.Boolean):
+        return "boolean"
+    if isinstance(column_type, types.Integer):
+        return "int"
+    if isinstance(column_type, types.Float):
+        return "float"
+    if isinstance(column_type, types.Numeric):
+        return "decimal"
+    if isinstance(column_type, types.DateTime):
+        return "timestamp"
+    if isinstance(column_type, types.Date):
+        return "date"
+    if isinstance(column_type, types.Text):
+        return "text"
+    if isinstance(column_type, types.String):
+        return "string"
+    return str(column_type).lower()
+
+
+class SchemaCatalog:
+    """Reflected table metadata and simple statistics, rendered once into the prompt schema.
+
+    ``refresh`` re-reads only the table structure (columns, keys) and compares a
+    per-table signature; statistics are collected again only for tables whose
+    structure changed, so a periodic refresh is cheap when no DDL happened.
+    Readers never touch the database: ``render`` returns the text built by the
+    last refresh. ``fingerprint`` hashes only the table structure, so it stays
+    the same across restarts while the data grows. Sampled column values are
+    real data sent with every prompt, so they are only collected when
+    ``sample_values`` is set.
+    """
+
+    def __init__(
+        self,
+        engine: Any,
+        tables: Sequence[str],
+        statistics: bool = True,
+        stats_max_rows: int = 1000000,
+        sample_max_distinct: int = 12,
+        sample_size: int = 5,
+        sample_values: bool = False,
+    ):
+        self.engine = engine
+        self.tables = list(tables)
+        self.statistics = statistics
+        self.stats_max_rows = stats_max_rows
+        self.sample_max_distinct = sample_max_distinct
+        self.sample_size = sample_size
+        self.sample_values = sample_values
+        self._tables: Dict[str, TableInfo] = {}
+        self._rendered = ""
+        self._fingerprint = ""
+        self._lock = threading.Lock()
+        self._counters = {"refreshes": 0, "changes": 0, "tables_analyzed": 0, "errors": 0}
+        self._last_refresh: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._rendered)
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    def render(self) -> str:
+        return self._rendered
+
+    def tables_snapshot(self) -> List[TableInfo]:
+        with self._lock:
+            return [self._tables[name] for name in self.tables if name in self._tables]
+
+    async def refresh(self) -> List[str]:
+        """Re-read the schema; returns the tables that were (re)analyzed."""
+        try:
+            if isinstance(self.engine, AsyncEngine):
+                async with self.engine.connect() as connection:
+                    return await connection.run_sync(self.refresh_with)
+            return await run_in_threadpool(self.refresh_sync)
+        except Exception:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+
+    def refresh_sync(self) -> List[str]:
+        with self.engine.connect() as connection:
+            return self.refresh_with(connection)
+
+    def refresh_with(self, connection: Connection) -> List[str]:
+        inspector = inspect(connection)
+        existing = set(inspector.get_table_names())
+        current: Dict[str, TableInfo] = {}
+        changed: List[str] = []
+        for name in self.tables:
+            if name not in existing:
+                continue
+            table = self._reflect_table(inspector, name)
+            previous = self._tables.get(name)
+            if previous is not None and previous.signature == table.signature:
+                current[name] = previous
+                continue
+            if self.statistics:
+                self._collect_statistics(connection, table)
+            current[name] = table
+            changed.append(name)
+
+        removed = set(self._tables) - set(current)
+        tables = [current[name] for name in self.tables if name in current]
+        rendered = render_schema(tables)
+        structure = "\n".join(f"{table.name}:{table.signature}" for table in tables)
+        structure += f"\nsample_values:{self.sample_values}"
+        with self._lock:
+            self._tables = current
+            self._rendered = rendered
+            self._fingerprint = hashlib.sha256(structure.encode("utf-8")).hexdigest()[:16]
+            self._last_refresh = time.time()
+            self._counters["refreshes"] += 1
+            self._counters["tables_analyzed"] += len(changed)
+            if changed or removed:
+                self._counters["changes"] += 1
+        if changed or removed:
+            logger.info(f"Schema catalog updated: analyzed={changed} removed={sorted(removed)}")
+        return changed
+
+    def _reflect_table(self, inspector, name: str) -> TableInfo:
+        primary_keys = set(inspector.get_pk_constraint(name).get("constrained_columns") or [])
+        foreign_keys: Dict[str, str] = {}
+        for fk in inspector.get_foreign_keys(name):
+            for column, referred in zip(fk["constrained_columns"], fk["referred_columns"]):
+                foreign_keys[column] = f"{fk['referred_table']}.{referred}"
+
+        columns = []
+        signature_parts = []
+        for column in inspector.get_columns(name):
+            info = ColumnInfo(
+                name=column["name"],
+                type_name=prompt_type_name(column["type"]),
+                nullable=bool(column.get("nullable", True)),
+                primary_key=column["name"] in primary_keys,
+                foreign_key=foreign_keys.get(column["name"]),
+            )
+            columns.append(info)
+            signature_parts.append(
+                f"{info.name}:{column['type']}:{info.nullable}:{info.primary_key}:{info.foreign_key}"
+            )
+        signature = hashlib.sha256("\n".join(signature_parts).encode("utf-8")).hexdigest()
+        return TableInfo(name, columns, signature)
+
+    def _collect_statistics(self, connection: Connection, table: TableInfo):
+        # Plain SQL through the dialect's quoting keeps this usable on any backend.
+        quote = connection.dialect.identifier_preparer.quote
+        table_sql = quote(table.name)
+        try:
+            table.row_count = connection.exec_driver_sql(f"SELECT COUNT(*) FROM {table_sql}").scalar()
+            if table.row_count is None or table.row_count > self.stats_max_rows or not table.columns:
+                return
+            distinct_sql = ", ".join(f"COUNT(DISTINCT {quote(column.name)})" for column in table.columns)
+            counts = connection.exec_driver_sql(f"SELECT {distinct_sql} FROM {table_sql}").one()
+            for column, count in zip(table.columns, counts):
+                column.distinct_count = count
+                if (
+                    self.sample_values and column.type_name == "string" and not column.foreign_key
+                    and 0 < count <= self.sample_max_distinct
+                ):
+                    column_sql = quote(column.name)
+                    column.sample_values = list(connection.exec_driver_sql(
+                        f"SELECT DISTINCT {column_sql} FROM {table_sql} WHERE {column_sql} IS NOT NULL "
+                        f"ORDER BY {column_sql} LIMIT {int(self.sample_size)}"
+                    ).scalars())
+        except Exception as e:
+            # Statistics only sharpen the prompt; the structure is still usable without them.
+            logger.warning(f"Statistics for table {table.name} not collected: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tables": {
+                    name: {"columns": len(table.columns), "row_count": table.row_count}
+                    for name, table in self._tables.items()
+                },
+                "fingerprint": self._fingerprint,
+                "last_refresh": self._last_refresh,
+                **self._counters,
+            }
+
+
+def render_schema(tables: Sequence[TableInfo]) -> str:
+    blocks = []
+    for table in tables:
+        header = f"Table {table.name} ("
+        lines = []
+        for column in table.columns:
+            line = f"    {column.name}: {column.type_name}"
+            if column.foreign_key:
+                line += f" (FK to {column.foreign_key})"
+            if column.sample_values:
+                samples = ", ".join(repr(str(value)) for value in column.sample_values)
+                more = ", ..." if column.distinct_count and column.distinct_count > len(column.sample_values) else ""
+                line += f" (values: {samples}{more})"
+            lines.append(line)
+        blocks.append(header + "\n" + ",\n".join(lines) + "\n)")
+    return "\n" + "\n\n".join(blocks) + "\n" if blocks else ""
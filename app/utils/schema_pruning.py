@@ -0,0 +1,211 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.utils.schema_catalog import SchemaCatalog, TableInfo, render_schema
+from app.utils.text_normalize import question_tokens
+
+logger = logging.getLogger(__name__)
+
+# Words people use for a table or column that do not appear in its name.
+DEFAULT_SYNONYMS: Dict[str, List[str]] = {
+    "client": ["ai_projects"],
+    "customer": ["ai_projects"],
+    "company": ["ai_projects.client_name"],
+    "sector": ["ai_projects.industry"],
+    "nation": ["ai_projects.country"],
+    "service": ["ai_services"],
+    "tool": ["ai_services"],
+    "llm": ["ai_services.model"],
+    "vendor": ["ai_services.provider"],
+    "price": ["ai_services.input_price_per_1k_tokens", "ai_services.output_price_per_1k_tokens"],
+    "cost": ["ai_services.input_price_per_1k_tokens", "ai_services.output_price_per_1k_tokens"],
+    "launch": ["ai_services.launched_at"],
+    "active": ["ai_services.available"],
+    "usage": ["ai_service_usage"],
+    "used": ["ai_service_usage"],
+    "user": ["ai_service_usage.user_name"],
+    "token": ["ai_service_usage.prompt_tokens", "ai_service_usage.completion_tokens"],
+    "date": ["ai_service_usage.usage_date"],
+    "month": ["ai_service_usage.usage_date"],
+    "year": ["ai_service_usage.usage_date"],
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt-token count (about four characters per token for English and SQL)."""
+    return (len(text) + 3) // 4
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ies", "es", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+# Name parts too common in questions to say anything about a table.
+_NAME_STOP_WORDS = {"id", "at", "by", "in", "is", "of", "on", "per", "to", "the", "and", "for"}
+
+
+def _name_terms(name: str) -> Set[str]:
+    return {_stem(part) for part in name.lower().split("_") if part and part not in _NAME_STOP_WORDS}
+
+
+class PrunedSchema:
+    __slots__ = ("tables", "schema")
+
+    def __init__(self, tables: List[str], schema: str):
+        self.tables = tables
+        self.schema = schema
+
+
+class SchemaPruner:
+    """Picks the catalog tables and columns a question needs before the prompt is built.
+
+    Question words are matched against table and column names, configured
+    synonyms and sampled column values; the matched tables are then closed
+    over foreign keys so every table needed to join them is included. A
+    question that matches nothing gets the full schema.
+    """
+
+    def __init__(
+        self,
+        catalog: SchemaCatalog,
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        min_prune_columns: int = 20,
+    ):
+        self.catalog = catalog
+        self.synonyms = synonyms if synonyms is not None else DEFAULT_SYNONYMS
+        self.min_prune_columns = min_prune_columns
+        self._lock = threading.Lock()
+        self._vocabulary_fingerprint: Optional[str] = None
+        self._tables: Dict[str, TableInfo] = {}
+        self._vocabulary: Dict[str, Set[Tuple[str, Optional[str]]]] = {}
+        self._counters = {"requests": 0, "pruned": 0, "full_tokens": 0, "prompt_tokens": 0, "saved_tokens": 0}
+
+    def prune(self, question: str) -> Optional[PrunedSchema]:
+        """Schema text for ``question``, or None while the catalog is not loaded."""
+        if not self.catalog.ready:
+            return None
+        tables, vocabulary = self._current_vocabulary()
+
+        matched_tables: Set[str] = set()
+        matched_columns: Set[Tuple[str, str]] = set()
+        for token in question_tokens(question):
+            for table, column in vocabulary.get(_stem(token), ()):
+                matched_tables.add(table)
+                if column is not None:
+                    matched_columns.add((table, column))
+
+        if not matched_tables:
+            selected = list(tables)
+        else:
+            selected = [name for name in tables if name in self._join_closure(matched_tables, tables)]
+
+        schema = render_schema([self._pruned_columns(tables[name], matched_columns) for name in selected])
+        return PrunedSchema(selected, schema)
+
+    def record(self, full_prompt: str, prompt: str):
+        """Account the prompt actually sent against the one the full schema would have produced."""
+        full_tokens, prompt_tokens = estimate_tokens(full_prompt), estimate_tokens(prompt)
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["pruned"] += int(prompt_tokens < full_tokens)
+            self._counters["full_tokens"] += full_tokens
+            self._counters["prompt_tokens"] += prompt_tokens
+            self._counters["saved_tokens"] += full_tokens - prompt_tokens
+        logger.info(f"Prompt ~{prompt_tokens} tokens instead of ~{full_tokens} (saved ~{full_tokens - prompt_tokens})")
+
+    def _current_vocabulary(self):
+        with self._lock:
+            if self._vocabulary_fingerprint != self.catalog.fingerprint:
+                self._tables = {table.name: table for table in self.catalog.tables_snapshot()}
+                self._vocabulary = self._build_vocabulary(self._tables.values())
+                self._vocabulary_fingerprint = self.catalog.fingerprint
+            return self._tables, self._vocabulary
+
+    def _build_vocabulary(self, tables: Iterable[TableInfo]) -> Dict[str, Set[Tuple[str, Optional[str]]]]:
+        vocabulary: Dict[str, Set[Tuple[str, Optional[str]]]] = {}
+
+        def add(term: str, table: str, column: Optional[str] = None):
+            vocabulary.setdefault(term, set()).add((table, column))
+
+        tables = list(tables)
+        names = {table.name for table in tables}
+        for table in tables:
+            for term in _name_terms(table.name):
+                add(term, table.name)
+            for column in table.columns:
+                # A foreign key column names the table it points to, not this one.
+                if not column.foreign_key:
+                    for term in _name_terms(column.name):
+                        add(term, table.name, column.name)
+                for value in column.sample_values:
+                    for term in question_tokens(str(value)):
+                        if term.isalpha():
+                            add(_stem(term), table.name, column.name)
+
+        # A word shared by every table (such as a common prefix) says nothing about relevance.
+        if len(names) > 1:
+            for term in [term for term, targets in vocabulary.items() if {t for t, _ in targets} == names]:
+                del vocabulary[term]
+
+        # Configured synonyms are deliberate, so they replace whatever the names suggested.
+        for word, targets in self.synonyms.items():
+            vocabulary.pop(_stem(word), None)
+            for target in targets:
+                table, _, column = target.partition(".")
+                if table in names:
+                    add(_stem(word), table, column or None)
+        return vocabulary
+
+    def _join_closure(self, matched: Set[str], tables: Dict[str, TableInfo]) -> Set[str]:
+        """Matched tables plus any table that links two of them through foreign keys."""
+        neighbours: Dict[str, Set[str]] = {name: set() for name in tables}
+        for table in tables.values():
+            for column in table.columns:
+                if column.foreign_key:
+                    referred = column.foreign_key.split(".", 1)[0]
+                    if referred in neighbours and referred != table.name:
+                        neighbours[table.name].add(referred)
+                        neighbours[referred].add(table.name)
+
+        root = min(matched)
+        parents: Dict[str, Optional[str]] = {root: None}
+        frontier = [root]
+        while frontier:
+            current = frontier.pop(0)
+            for neighbour in sorted(neighbours[current]):
+                if neighbour not in parents:
+                    parents[neighbour] = current
+                    frontier.append(neighbour)
+
+        selected = set(matched)
+        for target in matched:
+            node = target if target in parents else None
+            while node is not None:
+                selected.add(node)
+                node = parents[node]
+        return selected
+
+    def _pruned_columns(self, table: TableInfo, matched_columns: Set[Tuple[str, str]]) -> TableInfo:
+        if len(table.columns) < self.min_prune_columns:
+            return table
+        wanted = {column for name, column in matched_columns if name == table.name}
+        if not wanted:
+            return table
+        pruned = TableInfo(table.name, [
+            column for column in table.columns
+            if column.primary_key or column.foreign_key or column.name in wanted
+        ], table.signature)
+        pruned.row_count = table.row_count
+        return pruned
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self._counters["requests"]
+            return {
+                **self._counters,
+                "average_saved_tokens": round(self._counters["saved_tokens"] / requests, 1) if requests else 0.0,
+            }
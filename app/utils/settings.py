@@ -0,0 +1,54 @@
+import os
+from typing import Optional
+from dotenv import load_dotenv
+
+from app.exceptions.domain import ConfigurationException
+
+load_dotenv()
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+_FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+def _raw(name: str) -> Optional[str]:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return None
+    return value.strip()
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = _raw(name)
+    return default if value is None else value
+
+
+def env_int(name: str, default: int) -> int:
+    value = _raw(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError as e:
+        raise ConfigurationException(name, original_exception=e, details={"value": value})
+
+
+def env_float(name: str, default: float) -> float:
+    value = _raw(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError as e:
+        raise ConfigurationException(name, original_exception=e, details={"value": value})
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = _raw(name)
+    if value is None:
+        return default
+    lowered = value.lower()
+    if lowered in _TRUE_VALUES:
+        return True
+    if lowered in _FALSE_VALUES:
+        return False
+    raise ConfigurationException(name, details={"value": value})
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight task.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task and get its result or exception. The
+    task is shielded, so a caller that goes away does not cancel the work
+    the others are waiting for. Keys are forgotten as soon as the work ends,
+    so nothing is cached beyond the flight itself.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "leaders": 0, "followers": 0}
+
+    async def run(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._counters["calls"] += 1
+            task = self._flights.get(key)
+            if task is not None and task.get_loop() is loop and not task.done():
+                self._counters["followers"] += 1
+            else:
+                task = loop.create_task(func(*args, **kwargs))
+                self._flights[key] = task
+                self._counters["leaders"] += 1
+                task.add_done_callback(lambda finished: self._forget(key, finished))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        with self._lock:
+            if self._flights.get(key) is task:
+                del self._flights[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even when every waiter has gone away.
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._counters["calls"]
+            return {
+                **self._counters,
+                "in_flight": len(self._flights),
+                "coalesced_ratio": round(self._counters["followers"] / calls, 4) if calls else 0.0,
+            }
@@ -0,0 +1,181 @@
+import hashlib
+import re
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.cache import TTLCache
+from app.utils.settings import env_int
+
+FORBIDDEN_KEYWORDS = [
+    "INSERT", "UPDATE", "DELETE", "MERGE", "DROP", "ALTER", "TRUNCATE", "CREATE",
+    "EXEC", "EXECUTE", "GRANT", "REVOKE", "COPY", "CALL", "INTO",
+]
+
+FORBIDDEN_FUNCTIONS = [
+    "PG_SLEEP", "PG_TERMINATE_BACKEND", "PG_CANCEL_BACKEND", "PG_RELOAD_CONF", "SET_CONFIG",
+    "LO_IMPORT", "LO_EXPORT", "PG_READ_FILE", "PG_READ_BINARY_FILE", "PG_LS_DIR", "DBLINK", "DBLINK_EXEC",
+    "QUERY_TO_XML", "QUERY_TO_XML_AND_XMLSCHEMA", "CURSOR_TO_XML",
+]
+# Function families that run arbitrary SQL given as text: every dblink_* call,
+# and query_to_xml*/cursor_to_xml* including their schema variants.
+FORBIDDEN_FUNCTION_PREFIXES = ("DBLINK", "QUERY_TO_XML", "CURSOR_TO_XML")
+
+ALLOWED_LEADING_KEYWORDS = ("SELECT", "WITH")
+
+_FORBIDDEN_WORDS = frozenset(FORBIDDEN_KEYWORDS) | frozenset(FORBIDDEN_FUNCTIONS)
+
+# Only these characters can open a string, quoted identifier, comment or
+# dollar quote; a plain character-class search finds them without a Python
+# step per character, then the literal is matched at that spot.
+_LITERAL_START_RE = re.compile(r"[-'\"/$]")
+_LITERAL_RE = re.compile(
+    r"""
+      (?P<string>'(?:[^']|'')*')
+    | (?P<identifier>"(?:[^"]|"")*")
+    | (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*)
+    | (?P<dollar>\$(?:[^\W\d]\w*)?\$)
+    | (?P<unterminated>['"])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_ESCAPE_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'", re.DOTALL)
+_WORD_RE = re.compile(r"[^\W\d][\w$]*")
+_ROW_LOCK_RE = re.compile(r"\bFOR\s+(?:UPDATE|SHARE|NO\s+KEY|KEY\s+SHARE)\b")
+
+# Placeholders keep a literal visible as "something" (so text after a final
+# semicolon is still noticed) without exposing its contents.
+_LITERAL_PLACEHOLDER = " '' "
+_COMMENT_PLACEHOLDER = " "
+
+
+def scan_sql(sql: str) -> Optional[str]:
+    """Single pass over ``sql``; returns why it is not a read-only query, or None if it is."""
+    code, reason = _strip_literals(sql)
+    if reason:
+        return reason
+
+    code = code.upper()
+    head = code.lstrip("( \t\r\n")
+    if not head:
+        return "empty statement"
+    first = _WORD_RE.match(head)
+    if first is None:
+        return "statement does not start with a keyword"
+    if first.group() not in ALLOWED_LEADING_KEYWORDS:
+        return f"statement starts with {first.group()}"
+
+    terminator = code.find(";")
+    if terminator >= 0 and code[terminator:].strip("; \t\r\n"):
+        return "multiple statements"
+
+    words = set(_WORD_RE.findall(code))
+    forbidden = (words & _FORBIDDEN_WORDS) | {word for word in words if word.startswith(FORBIDDEN_FUNCTION_PREFIXES)}
+    if forbidden:
+        return "forbidden keyword " + ", ".join(sorted(forbidden))
+    if "FOR" in words and _ROW_LOCK_RE.search(code):
+        return "row locking clause"
+    return None
+
+
+def _strip_literals(sql: str) -> Tuple[str, Optional[str]]:
+    """Replace strings, quoted identifiers and comments with placeholders."""
+    parts = []
+    position = 0
+    find_start = _LITERAL_START_RE.search
+    while True:
+        candidate = find_start(sql, position)
+        if candidate is None:
+            parts.append(sql[position:])
+            return "".join(parts), None
+        start = candidate.start()
+        char = sql[start]
+
+        if char == "'" and _is_escape_string_prefix(sql, start):
+            match = _ESCAPE_STRING_RE.match(sql, start)
+            kind = "string" if match else "unterminated"
+        elif char == "$" and _follows_identifier(sql, start):
+            # ``a$b$`` is an identifier, not the start of a dollar quote.
+            match, kind = None, None
+        else:
+            match = _LITERAL_RE.match(sql, start)
+            kind = match.lastgroup if match else None
+
+        if kind is None:
+            parts.append(sql[position:start + 1])
+            position = start + 1
+            continue
+
+        parts.append(sql[position:start])
+        if kind == "unterminated":
+            return "", "unterminated quoted text"
+        end = match.end()
+        if kind == "block_comment":
+            end = _skip_block_comment(sql, end)
+            if end < 0:
+                return "", "unterminated comment"
+        elif kind == "dollar":
+            closing = sql.find(match.group(), end)
+            if closing < 0:
+                return "", "unterminated dollar-quoted string"
+            end = closing + len(match.group())
+
+        parts.append(_COMMENT_PLACEHOLDER if kind in ("line_comment", "block_comment") else _LITERAL_PLACEHOLDER)
+        position = end
+
+
+def _follows_identifier(sql: str, index: int) -> bool:
+    return index > 0 and (sql[index - 1].isalnum() or sql[index - 1] in "_$")
+
+
+def _is_escape_string_prefix(sql: str, quote_index: int) -> bool:
+    # E'...' (backslash escapes) only when the E is a token of its own, not the end of a name.
+    return quote_index > 0 and sql[quote_index - 1] in "Ee" and not _follows_identifier(sql, quote_index - 1)
+
+
+def _skip_block_comment(sql: str, position: int) -> int:
+    # PostgreSQL block comments nest.
+    depth = 1
+    while depth:
+        close = sql.find("*/", position)
+        if close < 0:
+            return -1
+        open_ = sql.find("/*", position, close)
+        if open_ >= 0:
+            depth += 1
+            position = open_ + 2
+        else:
+            depth -= 1
+            position = close + 2
+    return position
+
+
+class SqlSafetyValidator:
+    """Caches scan_sql verdicts in an LRU keyed by a digest of the statement."""
+
+    def __init__(self, cache_size: int = 4096):
+        self.cache = TTLCache(max_entries=cache_size)
+
+    def unsafe_reason(self, sql: str) -> Optional[str]:
+        key = hashlib.blake2b(sql.encode("utf-8"), digest_size=16).digest()
+        verdict = self.cache.get(key)
+        if verdict is None:
+            verdict = scan_sql(sql) or ""
+            self.cache.set(key, verdict)
+        return verdict or None
+
+    def is_safe(self, sql: str) -> bool:
+        return self.unsafe_reason(sql) is None
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+default_validator = SqlSafetyValidator(cache_size=env_int("SQL_SAFETY_CACHE_SIZE", 4096))
+
+
+def unsafe_reason(sql: str) -> Optional[str]:
+    return default_validator.unsafe_reason(sql)
+
+
+def is_safe_query(sql: str) -> bool:
+    return default_validator.is_safe(sql)
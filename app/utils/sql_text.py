@@ -0,0 +1,214 @@
+import math
+import re
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+_IDENTIFIER_RE = re.compile(r'"([^"]+)"|\b([A-Za-z_][A-Za-z0-9_]*)\b')
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_ORDER_TERM_RE = re.compile(r"^(.*?)(?:\s+(ASC|DESC))?(?:\s+NULLS\s+(FIRST|LAST))?$", re.IGNORECASE | re.DOTALL)
+_COLUMN_REF_RE = re.compile(r'(?:(?:"[^"]+"|[A-Za-z_][A-Za-z0-9_]*)\.)*(?:"([^"]+)"|([A-Za-z_][A-Za-z0-9_]*))')
+_ORDER_BY_END = ("LIMIT", "OFFSET", "FETCH", "FOR")
+
+# (column, descending, nulls_first)
+KeyColumn = Tuple[str, bool, bool]
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and drop trailing semicolons outside of quoted literals."""
+    parts = []
+    in_quote = None
+    pending_space = False
+    for char in sql.strip():
+        if in_quote:
+            parts.append(char)
+            if char == in_quote:
+                in_quote = None
+            continue
+        if char.isspace():
+            pending_space = True
+            continue
+        if pending_space and parts:
+            parts.append(" ")
+        pending_space = False
+        if char in ("'", '"'):
+            in_quote = char
+        parts.append(char)
+    return "".join(parts).rstrip("; ")
+
+
+def referenced_tables(sql: str, known_tables: Iterable[str]) -> Set[str]:
+    known = {table.lower() for table in known_tables}
+    found = set()
+    for quoted, bare in _IDENTIFIER_RE.findall(sql):
+        name = (quoted or bare).lower()
+        if name in known:
+            found.add(name)
+    return found
+
+
+def clean_generated_sql(content: str) -> str:
+    """Strip the Markdown fence a model sometimes wraps around generated SQL."""
+    if content.startswith("```sql"):
+        content = content.replace("```sql", "").replace("```", "")
+    return content.strip()
+
+
+def strip_statement_terminator(sql: str) -> str:
+    return sql.strip().rstrip("; \t\r\n")
+
+
+def apply_row_limit(sql: str, limit: int) -> str:
+    """Wrap a query so the database stops after ``limit`` rows."""
+    return f"SELECT * FROM (\n{strip_statement_terminator(sql)}\n) AS row_limited LIMIT {int(limit)}"
+
+
+def _unquoted(sql: str) -> Iterator[Tuple[int, str, int]]:
+    """Yield position, character and parenthesis depth of each character outside quotes."""
+    depth, i = 0, 0
+    while i < len(sql):
+        char = sql[i]
+        if char in ("'", '"'):
+            i += 1
+            while i < len(sql):
+                if sql[i] == char:
+                    if sql[i + 1:i + 2] != char:
+                        break
+                    i += 1
+                i += 1
+        else:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            yield i, char, depth
+        i += 1
+
+
+def _top_level_words(sql: str) -> List[Tuple[int, int, str]]:
+    words = []
+    for i, char, depth in _unquoted(sql):
+        if depth == 0 and (char.isalpha() or char == "_") and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] in "_$")):
+            match = _WORD_RE.match(sql, i)
+            words.append((match.start(), match.end(), match.group().upper()))
+    return words
+
+
+def _split_top_level(text: str) -> List[str]:
+    parts, start = [], 0
+    for i, char, depth in _unquoted(text):
+        if char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def order_by_terms(sql: str) -> List[Tuple[str, bool, Optional[bool]]]:
+    """The ``(expression, descending, nulls_first)`` terms of the statement's outermost ORDER BY."""
+    sql = strip_statement_terminator(sql)
+    words = _top_level_words(sql)
+    start = None
+    for (_, _, word), (_, end, following) in zip(words, words[1:]):
+        if word == "ORDER" and following == "BY":
+            start = end
+    if start is None:
+        return []
+    end = next((position for position, _, word in words if position > start and word in _ORDER_BY_END), len(sql))
+
+    terms = []
+    for term in _split_top_level(sql[start:end]):
+        expression, direction, nulls = _ORDER_TERM_RE.match(term).groups()
+        descending = (direction or "").upper() == "DESC"
+        terms.append((expression.strip(), descending, None if nulls is None else nulls.upper() == "FIRST"))
+    return terms
+
+
+def _output_column(expression: str, headers: Sequence[str]) -> Optional[str]:
+    if expression.isdigit():
+        position = int(expression)
+        return headers[position - 1] if 0 < position <= len(headers) else None
+    match = _COLUMN_REF_RE.fullmatch(expression)
+    if match is None:
+        return None
+    quoted, bare = match.groups()
+    found = [header for header in headers if header == quoted or (bare and header.lower() == bare.lower())]
+    return found[0] if len(found) == 1 else None
+
+
+def paging_key(sql: str, headers: Sequence[str]) -> List[KeyColumn]:
+    """Order rows by the query's own ORDER BY, then by every other output column.
+
+    ORDER BY terms count as long as they name output columns; after the
+    first one that does not, the remaining columns only break ties.
+    Columns whose name appears twice cannot be referenced and are left out.
+    NULLs sort as PostgreSQL sorts them by default unless the query says
+    otherwise.
+    """
+    unique = [header for header in headers if list(headers).count(header) == 1]
+    key: List[KeyColumn] = []
+    for expression, descending, nulls_first in order_by_terms(sql):
+        column = _output_column(expression, unique)
+        if column is None:
+            break
+        if all(column != used for used, _, _ in key):
+            key.append((column, descending, descending if nulls_first is None else nulls_first))
+    key.extend((column, False, False) for column in unique if all(column != used for used, _, _ in key))
+    return key
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sql_literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (float, Decimal)):
+        if not math.isfinite(value):
+            raise ValueError(f"Cannot write {value} as an SQL literal")
+        return repr(value) if isinstance(value, float) else str(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    raise ValueError(f"Cannot write {type(value).__name__} as an SQL literal")
+
+
+def _keyset_condition(key: Sequence[KeyColumn], after: Sequence[Any]) -> str:
+    """Rows whose key sorts at or after ``after``, spelled out column by column so NULLs compare."""
+    alternatives, equal = [], []
+    for (column, descending, nulls_first), value in zip(key, after):
+        name = quote_identifier(column)
+        if value is None:
+            follows = f"{name} IS NOT NULL" if nulls_first else None
+            equal_value = f"{name} IS NULL"
+        else:
+            literal = sql_literal(value)
+            follows = f"{name} {'<' if descending else '>'} {literal}"
+            if not nulls_first:
+                follows = f"({follows} OR {name} IS NULL)"
+            equal_value = f"{name} = {literal}"
+        if follows is not None:
+            alternatives.append(" AND ".join(equal + [follows]))
+        equal.append(equal_value)
+    alternatives.append(" AND ".join(equal))
+    return " OR ".join(f"({alternative})" for alternative in alternatives)
+
+
+def keyset_page_sql(sql: str, key: Sequence[KeyColumn], after: Optional[Sequence[Any]], limit: int) -> str:
+    """Select the ``limit`` rows of a query that sort first at or after the key values ``after``.
+
+    Rows are filtered on the key itself, so the database can stop after
+    the page instead of counting past every earlier row.
+    """
+    order = ", ".join(
+        f"{quote_identifier(column)} {'DESC' if descending else 'ASC'} NULLS {'FIRST' if nulls_first else 'LAST'}"
+        for column, descending, nulls_first in key
+    )
+    where = f"WHERE {_keyset_condition(key, after)} " if after is not None else ""
+    return (
+        f"SELECT * FROM (\n{strip_statement_terminator(sql)}\n) AS keyset_source "
+        f"{where}ORDER BY {order} LIMIT {int(limit)}"
+    )
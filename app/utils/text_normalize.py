@@ -0,0 +1,49 @@
+import re
+from typing import List
+
+# Bumped whenever the normal form changes, so keys derived from it under older rules are not reused.
+NORMALIZATION_VERSION = "2"
+
+_TOKEN_RE = re.compile(r"\d{4}-\d{2}-\d{2}|\d+(?:[.,]\d+)*|\w+", re.UNICODE)
+_THOUSANDS_RE = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?")
+
+_NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+    "eleven": "11", "twelve": "12", "thirteen": "13", "fourteen": "14", "fifteen": "15",
+    "sixteen": "16", "seventeen": "17", "eighteen": "18", "nineteen": "19", "twenty": "20",
+    "thirty": "30", "forty": "40", "fifty": "50", "hundred": "100", "thousand": "1000",
+}
+
+
+def _canonical_number(token: str) -> str:
+    if _THOUSANDS_RE.fullmatch(token):
+        token = token.replace(",", "")
+    elif token.count(",") == 1 and "." not in token:
+        # A lone comma is a decimal separator: "1,5" is 1.5, not 15.
+        token = token.replace(",", ".")
+    if "," in token or token.count(".") > 1:
+        # Lists ("1,2,3") and versions ("1.2.3") are kept as written.
+        return token
+    if "." in token:
+        whole, _, fraction = token.partition(".")
+        fraction = fraction.rstrip("0")
+        token = f"{whole}.{fraction}" if fraction else whole
+    stripped = token.lstrip("0")
+    if not stripped or stripped.startswith("."):
+        stripped = "0" + stripped
+    return stripped
+
+
+def question_tokens(question: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(question.lower()):
+        if token[0].isdigit() and "-" not in token:
+            token = _canonical_number(token)
+        tokens.append(_NUMBER_WORDS.get(token, token))
+    return tokens
+
+
+def normalize_question(question: str) -> str:
+    """Case-, whitespace-, punctuation- and number-insensitive form of a question."""
+    return " ".join(question_tokens(question))
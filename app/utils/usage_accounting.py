@@ -0,0 +1,298 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from app.utils.prompt_cache import cached_prompt_tokens
+from app.utils.request_context import current_correlation_id
+from app.utils.settings import env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+# USD per 1k tokens; cached prompt tokens are billed at the discounted rate.
+MODEL_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {"prompt": 0.0025, "cached_prompt": 0.00125, "completion": 0.01},
+}
+# USD per second of audio.
+AUDIO_PRICES: Dict[str, float] = {
+    "whisper-1": 0.0001,
+}
+
+
+def estimate_cost(
+    model: str,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cached_tokens: int = 0,
+    audio_seconds: float = 0.0,
+) -> Optional[float]:
+    if model in AUDIO_PRICES:
+        return round(audio_seconds * AUDIO_PRICES[model], 6)
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return round(
+        (uncached * prices["prompt"] + cached_tokens * prices["cached_prompt"] + completion_tokens * prices["completion"]) / 1000,
+        6,
+    )
+
+
+class UsageEntry:
+    """Filled in by the caller of ``UsageLedger.track`` while the upstream call runs."""
+
+    __slots__ = ("usage", "audio_seconds")
+
+    def __init__(self):
+        self.usage: Any = None
+        self.audio_seconds: Optional[float] = None
+
+
+def _percentile(values: List[float], quantile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def summarize(records: List[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """Totals per stage and per model, plus the most expensive and slowest requests."""
+
+    def group(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = [row["latency_ms"] for row in rows]
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for row in rows if row["status"] != "ok"),
+            "prompt_tokens": sum(row["prompt_tokens"] for row in rows),
+            "completion_tokens": sum(row["completion_tokens"] for row in rows),
+            "cached_tokens": sum(row["cached_tokens"] for row in rows),
+            "audio_seconds": round(sum(row["audio_seconds"] for row in rows), 3),
+            "cost_usd": round(sum(row["cost_usd"] or 0.0 for row in rows), 6),
+            "latency_p50_ms": _percentile(latencies, 0.5),
+            "latency_p95_ms": _percentile(latencies, 0.95),
+        }
+
+    def grouped(key: str) -> Dict[str, Any]:
+        buckets: Dict[str, List[Dict[str, Any]]] = {}
+        for row in records:
+            buckets.setdefault(row[key], []).append(row)
+        return {name: group(rows) for name, rows in buckets.items()}
+
+    return {
+        "totals": group(records),
+        "by_stage": grouped("stage"),
+        "by_model": grouped("model"),
+        "most_expensive": sorted(records, key=lambda row: row["cost_usd"] or 0.0, reverse=True)[:top],
+        "slowest": sorted(records, key=lambda row: row["latency_ms"], reverse=True)[:top],
+    }
+
+
+TIMESTAMP_PREFIX = '{"timestamp": "'
+
+
+def _line_timestamp(line: str) -> datetime:
+    """Timestamp of a ledger line, read without parsing the rest of the record."""
+    if line.startswith(TIMESTAMP_PREFIX):
+        end = line.find('"', len(TIMESTAMP_PREFIX))
+        if end != -1:
+            return datetime.fromisoformat(line[len(TIMESTAMP_PREFIX):end])
+    return datetime.fromisoformat(json.loads(line)["timestamp"])
+
+
+class UsageLedger:
+    """Per-request record of tokens, audio seconds, cost and latency of upstream calls.
+
+    Each record is appended as one JSON line to ``path`` (when set), so the
+    file is an append-only history that survives restarts; the most recent
+    records are also kept in memory for when no file is configured. Lines are
+    written by a background thread, so recording never blocks on disk I/O.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_recent: int = 10000):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=max_recent)
+        self._totals = {"requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                        "cached_tokens": 0, "audio_seconds": 0.0, "cost_usd": 0.0}
+
+    @contextmanager
+    def track(self, stage: str, model: str, question: Optional[str] = None) -> Iterator[UsageEntry]:
+        """Time the enclosed upstream call and record it, including when it raises."""
+        entry = UsageEntry()
+        started = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            yield entry
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.record(
+                stage,
+                model,
+                time.perf_counter() - started,
+                usage=entry.usage,
+                audio_seconds=entry.audio_seconds,
+                error=error,
+                question=question,
+            )
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        latency_s: float,
+        usage: Any = None,
+        audio_seconds: Optional[float] = None,
+        error: Optional[BaseException] = None,
+        question: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        prompt_tokens = prompt_tokens if isinstance(prompt_tokens, int) else 0
+        completion_tokens = completion_tokens if isinstance(completion_tokens, int) else 0
+        cached_tokens = cached_prompt_tokens(usage) or 0
+        audio_seconds = float(audio_seconds) if isinstance(audio_seconds, (int, float)) else 0.0
+        if error is None:
+            status, error_code = "ok", None
+        elif isinstance(error, GeneratorExit) or type(error).__name__ == "CancelledError":
+            status, error_code = "cancelled", None
+        else:
+            code = getattr(error, "error_code", None)
+            status, error_code = "error", getattr(code, "value", None) or type(error).__name__
+
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "correlation_id": current_correlation_id(),
+            "stage": stage,
+            "model": model,
+            "status": status,
+            "error_code": error_code,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "audio_seconds": round(audio_seconds, 3),
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens, audio_seconds),
+            "latency_ms": round(latency_s * 1000, 1),
+            "question": question[:200] if question else None,
+        }
+        with self._lock:
+            self._recent.append(record)
+            self._totals["requests"] += 1
+            self._totals["errors"] += int(status == "error")
+            for key in ("prompt_tokens", "completion_tokens", "cached_tokens", "audio_seconds"):
+                self._totals[key] += record[key]
+            self._totals["cost_usd"] += record["cost_usd"] or 0.0
+            if self.path:
+                self._ensure_writer()
+                self._pending.put(json.dumps(record) + "\n")
+        return record
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_pending, name="usage-ledger-writer", daemon=True)
+            self._writer.start()
+
+    def _write_pending(self):
+        """Append queued lines in batches until ``close`` asks the thread to stop."""
+        while True:
+            items = [self._pending.get()]
+            while True:
+                try:
+                    items.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [item for item in items if isinstance(item, str)]
+            if lines:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as ledger:
+                        ledger.write("".join(lines))
+                except OSError as e:
+                    logger.warning(f"Could not append {len(lines)} records to usage ledger {self.path}: {e}")
+            stop = False
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is None:
+                    stop = True
+            if stop:
+                return
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Block until every record queued so far is in the ledger file."""
+        with self._lock:
+            writer = self._writer
+            if writer is None or not writer.is_alive():
+                return True
+            written = threading.Event()
+            self._pending.put(written)
+        return written.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Write out queued records and stop the writer; a later record starts a new one."""
+        with self._lock:
+            writer = self._writer
+            if writer is None or not writer.is_alive():
+                return
+            self._pending.put(None)
+        writer.join(timeout)
+
+    def records(self, since: Optional[datetime] = None, correlation_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Stored records, oldest first; read from the ledger file when one is configured.
+
+        The file is filtered line by line, so only matching records are parsed
+        and held in memory.
+        """
+        if since is not None and since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if not (self.path and os.path.exists(self.path)):
+            with self._lock:
+                rows = list(self._recent)
+            return [
+                row for row in rows
+                if (since is None or datetime.fromisoformat(row["timestamp"]) >= since)
+                and (correlation_id is None or row["correlation_id"] == correlation_id)
+            ]
+
+        self.flush()
+        marker = f'"correlation_id": {json.dumps(correlation_id)}' if correlation_id is not None else None
+        rows = []
+        with open(self.path, encoding="utf-8") as ledger:
+            for line in ledger:
+                # A line without its newline is still being written by another process.
+                if not line.endswith("\n") or not line.strip():
+                    continue
+                if marker is not None and marker not in line:
+                    continue
+                try:
+                    if since is not None and _line_timestamp(line) < since:
+                        continue
+                    row = json.loads(line)
+                except (ValueError, KeyError):
+                    logger.warning(f"Skipping unreadable line in usage ledger {self.path}")
+                    continue
+                if correlation_id is None or row["correlation_id"] == correlation_id:
+                    rows.append(row)
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+        totals["audio_seconds"] = round(totals["audio_seconds"], 3)
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        totals["ledger_path"] = self.path
+        return totals
+
+
+default_usage_ledger = UsageLedger(
+    path=env_str("USAGE_LEDGER_PATH"),
+    max_recent=env_int("USAGE_LEDGER_MAX_RECENT", 10000),
+)
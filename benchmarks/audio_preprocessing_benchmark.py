@@ -0,0 +1,74 @@
+"""Benchmark for the audio preprocessing stage in front of Whisper.
+
+Builds a browser-like recording (44.1 kHz stereo WAV with leading and
+trailing silence around a speech-like signal), or reads the given files,
+and reports the time spent in each stage and the bytes and seconds saved.
+
+    python -m benchmarks.audio_preprocessing_benchmark
+    python -m benchmarks.audio_preprocessing_benchmark --files recording.webm --ffmpeg ffmpeg
+"""
+import argparse
+import io
+import os
+import shutil
+import wave
+
+import numpy as np
+
+from app.utils.audio_preprocessing import STAGES, AudioPreprocessor
+
+
+def synthetic_recording(speech_seconds: float, silence_seconds: float, rate: int = 44100) -> bytes:
+    """Amplitude-modulated harmonics standing in for speech, between stretches of faint noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(speech_seconds * rate)) / rate
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 8))
+    voice *= 0.25 * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    silence = rng.normal(0, 0.0005, int(silence_seconds * rate))
+    mono = np.concatenate([silence, voice, silence])
+    stereo = np.stack([mono, mono * 0.9], axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as recording:
+        recording.setnchannels(2)
+        recording.setsampwidth(2)
+        recording.setframerate(rate)
+        recording.writeframes((np.clip(stereo, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def report(label: str, preprocessor: AudioPreprocessor, data: bytes, repeat: int):
+    runs = [preprocessor.process(data, label) for _ in range(repeat)]
+    stats = runs[-1].stats
+    if "skipped" in stats:
+        print(f"{label}: sent unprocessed ({stats['skipped']})")
+        return
+    print(f"{label}: {stats['input_bytes']:,} -> {stats['output_bytes']:,} bytes "
+          f"({1 - stats['output_bytes'] / stats['input_bytes']:.1%} saved), "
+          f"{stats['input_seconds']}s -> {stats['output_seconds']}s of audio, sent as {runs[-1].filename}")
+    for stage in STAGES:
+        best = min(run.stats["stage_ms"].get(stage, 0.0) for run in runs)
+        print(f"  {stage:<10} {best:>10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", nargs="*", default=[])
+    parser.add_argument("--speech-seconds", type=float, nargs="+", default=[3, 10, 30])
+    parser.add_argument("--silence-seconds", type=float, default=2.0)
+    parser.add_argument("--ffmpeg", default=None, help="ffmpeg binary for non-WAV input and Opus output")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    preprocessor = AudioPreprocessor(ffmpeg=shutil.which(args.ffmpeg) if args.ffmpeg else None)
+    if args.files:
+        for path in args.files:
+            with open(path, "rb") as audio:
+                report(os.path.basename(path), preprocessor, audio.read(), args.repeat)
+        return
+    for seconds in args.speech_seconds:
+        data = synthetic_recording(seconds, args.silence_seconds)
+        report(f"synthetic_{seconds:g}s.wav", preprocessor, data, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Microbenchmark for the SQL safety validator.
+
+Compares the old upper-case-and-substring check with the single-pass scanner
+(cold) and with cached verdicts, on generated statements of growing size.
+
+    python -m benchmarks.sql_safety_benchmark
+"""
+import argparse
+import timeit
+
+from app.utils.sql_safety import SqlSafetyValidator, scan_sql
+
+LEGACY_KEYWORDS = ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "CREATE", "EXEC", "EXECUTE"]
+
+
+def legacy_is_safe_query(sql: str) -> bool:
+    normalized_sql = sql.strip().upper()
+    return (normalized_sql.startswith("SELECT") and
+            all(keyword not in normalized_sql for keyword in LEGACY_KEYWORDS))
+
+
+def generate_statement(columns: int) -> str:
+    """A wide report query: CASE columns, string literals, comments and a long IN list inside a CTE."""
+    select_list = ",\n    ".join(
+        f"CASE WHEN u.prompt_tokens > {i} THEN 'tier {i} -- ''quoted''' ELSE s.name END AS col_{i} /* c{i} */"
+        for i in range(columns)
+    )
+    in_list = ", ".join(str(i) for i in range(columns * 4))
+    return (
+        "WITH recent AS (\n"
+        "  SELECT * FROM ai_service_usage WHERE usage_date >= '2024-01-01'\n"
+        ")\n"
+        f"SELECT\n    {select_list}\n"
+        "FROM recent u\n"
+        "LEFT JOIN ai_services s ON u.service_id = s.id\n"
+        f"WHERE u.service_id IN ({in_list})\n"
+        "ORDER BY u.usage_date DESC;"
+    )
+
+
+def bench(label: str, func, repeat: int) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {label:<22} {best * 1e6:>12.1f} us")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        sql = generate_statement(size)
+        validator = SqlSafetyValidator()
+        validator.is_safe(sql)
+        print(f"{size} columns, {len(sql):,} chars "
+              f"(legacy verdict: {legacy_is_safe_query(sql)}, scanner verdict: {scan_sql(sql) is None})")
+        bench("legacy substring", lambda: legacy_is_safe_query(sql), args.repeat)
+        bench("scanner (cold)", lambda: scan_sql(sql), args.repeat)
+        bench("cached verdict", lambda: validator.is_safe(sql), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,32 @@
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
-from unittest.mock import patch
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import AsyncMock, patch
 import json
 import io
 import urllib.parse
+import warnings
 
 from app.main import app
+from app.utils.dependencies import clear_caches, get_voice_to_text_service
 
 from app.services.implementations.sql_query_service import SqlQueryService
 from app.services.implementations.openai_text_to_sql import OpenAITextToSql
 from app.services.implementations.langchain_executor import LangChainExecutor
 from app.services.implementations.pdf_report_service import PDFReportService
-from app.models.query_result import QueryResult
+from app.services.implementations.openai_whisper_service import OpenAIWhisperService
+from app.models.query_result import QueryResult, ResultSet
+from app.models.row_stream import RowStream
 from app.exceptions.domain import (
     EmptyQuestionException,
     UnsafeSqlException,
     DatabaseExecutionException,
     InvalidRequestDataException,
     SqlGenerationException, 
-    OpenAIServiceException
+    OpenAIServiceException,
+    QueryTooExpensiveException
 )
 
 @pytest_asyncio.fixture(scope="module")
@@ -27,6 +34,11 @@ async def client():
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
 
+@pytest.fixture(autouse=True)
+def empty_caches():
+    clear_caches()
+    yield
+
 @pytest.mark.asyncio
 async def test_ask_success(client: AsyncClient):
     question = "Show all users"
@@ -192,4 +204,317 @@ async def test_ask_openai_service_error(client: AsyncClient):
         assert response.status_code == 503
         assert response.json()["error"]["code"] == "OPENAI_SERVICE_ERROR"
         assert "OpenAI service is temporarily unavailable" in response.json()["error"]["message"]
-        mock_generate_sql.assert_called_once_with(question)    
\ No newline at end of file
+        mock_generate_sql.assert_called_once_with(question)    
+
+@pytest.mark.asyncio
+async def test_admin_metrics(client: AsyncClient):
+    response = await client.get("/admin/metrics")
+    assert response.status_code == 200
+    assert "timestamp" in response.json()
+
+
+@pytest.mark.asyncio
+async def test_export_csv_streams_rows(client: AsyncClient):
+    question = "Show all users"
+    generated_sql = "SELECT user_name, prompt_tokens FROM ai_service_usage;"
+    row_stream = RowStream(
+        headers=["user_name", "prompt_tokens"],
+        batches=iter([[("alice", 1200), ("bob", 1000)], [("carol", 800)]])
+    )
+
+    with patch.object(OpenAITextToSql, 'generate_sql', return_value=generated_sql), \
+         patch.object(LangChainExecutor, 'stream', return_value=row_stream) as mock_stream:
+
+        response = await client.post("/export", data={"question": question, "format": "csv"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.text.splitlines() == ["user_name,prompt_tokens", "alice,1200", "bob,1000", "carol,800"]
+        mock_stream.assert_called_once_with(generated_sql)
+
+@pytest.mark.asyncio
+async def test_export_unsupported_format(client: AsyncClient):
+    response = await client.post("/export", data={"question": "Show all users", "format": "xlsx"})
+    assert response.status_code == 400
+    assert response.json()["error"]["code"] == "INVALID_REQUEST_DATA"
+
+@pytest.mark.asyncio
+async def test_invalidate_sql_cache(client: AsyncClient):
+    response = await client.post("/admin/cache/sql/invalidate", params={"table": "ai_services"})
+    assert response.status_code == 200
+    assert "removed" in response.json()
+
+@pytest.mark.asyncio
+async def test_truncated_result_pages_through_api(client: AsyncClient):
+    question = "Show every usage row"
+    generated_sql = "SELECT user_name FROM ai_service_usage ORDER BY user_name DESC;"
+    first_page = ResultSet(["user_name"], [("user3",), ("user2",)], ["text"], truncated=True)
+    ordered_page = ResultSet(["user_name"], [("user3",), ("user2",), ("user1",)], ["text"])
+    next_page = ResultSet(["user_name"], [("user1",)], ["text"])
+
+    with patch.object(OpenAITextToSql, 'generate_sql', return_value=generated_sql), \
+         patch.object(LangChainExecutor, 'execute', side_effect=[first_page, ordered_page, next_page]) as mock_execute:
+
+        response = await client.post("/ask", data={"question": question})
+        assert response.status_code == 200
+        assert "loadMoreRowsBtn" in response.text
+        result_id = response.text.split('data-result-id="')[1].split('"')[0]
+
+        page = await client.get(f"/api/results/{result_id}", params={"limit": 2})
+
+        assert page.status_code == 200
+        assert page.json()["headers"] == ["user_name"]
+        assert page.json()["rows"] == [["user3"], ["user2"]]
+        assert 'ORDER BY "user_name" DESC NULLS FIRST LIMIT 3' in mock_execute.call_args[0][0]
+
+        page = await client.get(f"/api/results/{result_id}", params={"cursor": page.json()["next_cursor"], "limit": 2})
+
+        assert page.json()["rows"] == [["user1"]]
+        assert page.json()["next_cursor"] is None
+        assert "\"user_name\" < 'user2'" in mock_execute.call_args[0][0]
+
+        too_large = await client.get(f"/api/results/{result_id}", params={"limit": 100000})
+
+        assert too_large.status_code == 400
+        assert too_large.json()["error"]["code"] == "INVALID_REQUEST_DATA"
+
+@pytest.mark.asyncio
+async def test_result_page_unknown_id(client: AsyncClient):
+    response = await client.get("/api/results/does-not-exist")
+    assert response.status_code == 404
+    assert response.json()["error"]["code"] == "RESULT_NOT_FOUND"
+
+@pytest.mark.asyncio
+async def test_ask_query_too_expensive(client: AsyncClient):
+    question = "Pair every usage with every other usage"
+    generated_sql = "SELECT * FROM ai_service_usage a, ai_service_usage b;"
+    rejection = QueryTooExpensiveException(sql_query=generated_sql, estimate={"estimated_cost": 5e6})
+
+    with patch.object(OpenAITextToSql, 'generate_sql', return_value=generated_sql), \
+         patch.object(LangChainExecutor, 'execute', side_effect=rejection):
+
+        response = await client.post("/ask", data={"question": question})
+
+        assert response.status_code == 403
+        assert response.json()["error"]["code"] == "QUERY_TOO_EXPENSIVE"
+        assert response.json()["error"]["sql_query"] == generated_sql
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+@pytest.mark.asyncio
+async def test_ask_stream_emits_progress_rows_and_summary(client: AsyncClient):
+    question = "Show all users"
+    generated_sql = "SELECT user_name, prompt_tokens FROM ai_service_usage;"
+    row_stream = RowStream(
+        headers=["user_name", "prompt_tokens"],
+        batches=iter([[("alice", 1200), ("bob", 1000)], [("carol", 800)]])
+    )
+
+    async def stream_sql(self, question, examples=None):
+        yield "SELECT user_name, prompt_tokens "
+        yield "FROM ai_service_usage;"
+
+    with patch.object(OpenAITextToSql, 'stream_sql', new=stream_sql), \
+         patch.object(LangChainExecutor, 'stream', return_value=row_stream) as mock_stream:
+
+        response = await client.post("/ask/stream", data={"question": question})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        assert [event for event, _ in events] == [
+            "sql_token", "sql_token", "sql", "execution_started", "columns", "rows", "rows", "done"
+        ]
+        assert events[2][1]["sql"] == generated_sql
+        assert events[5][1]["rows"] == [["alice", 1200], ["bob", 1000]]
+        assert events[-1][1]["row_count"] == 3
+        assert "result_id" not in events[-1][1]
+        mock_stream.assert_called_once_with(generated_sql)
+
+@pytest.mark.asyncio
+async def test_ask_stream_reports_execution_errors_as_events(client: AsyncClient):
+    async def stream_sql(self, question, examples=None):
+        yield "SELECT * FROM missing_table;"
+
+    with patch.object(OpenAITextToSql, 'stream_sql', new=stream_sql), \
+         patch.object(LangChainExecutor, 'stream', side_effect=DatabaseExecutionException(sql_preview="SELECT")):
+
+        response = await client.post("/ask/stream", data={"question": "Broken"})
+
+        assert response.status_code == 200
+        event, data = parse_sse(response.text)[-1]
+        assert event == "error"
+        assert data["error"]["code"] == "DATABASE_EXECUTION_ERROR"
+        assert data["error"]["sql_query"] == "SELECT * FROM missing_table;"
+
+@pytest.mark.asyncio
+async def test_ask_stream_generation_failure_is_an_http_error(client: AsyncClient):
+    async def stream_sql(self, question, examples=None):
+        raise OpenAIServiceException(api_error="Service down")
+        yield
+
+    with patch.object(OpenAITextToSql, 'stream_sql', new=stream_sql):
+        response = await client.post("/ask/stream", data={"question": "Show all users"})
+
+    assert response.status_code == 503
+    assert response.json()["error"]["code"] == "OPENAI_SERVICE_ERROR"
+
+@pytest.mark.asyncio
+async def test_ask_stream_empty_question(client: AsyncClient):
+    response = await client.post("/ask/stream", data={"question": "   "})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_ask_batch_returns_results_and_errors_per_question(client: AsyncClient):
+    questions = ["Show all users", "show all users", "Invalid query"]
+    generated_sql = "SELECT user_name FROM ai_service_usage;"
+
+    with patch.object(OpenAITextToSql, 'generate_sql_batch', return_value=[
+            generated_sql, SqlGenerationException(question="Invalid query")
+         ]) as mock_batch, \
+         patch.object(LangChainExecutor, 'execute', return_value=ResultSet(["user_name"], [("alice",)])) as mock_execute:
+
+        response = await client.post("/api/ask/batch", json={"questions": questions})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["count"], body["failed"]) == (3, 1)
+        assert [result["question"] for result in body["results"]] == questions
+        assert body["results"][0]["rows"] == [["alice"]] and body["results"][1]["rows"] == [["alice"]]
+        assert body["results"][2]["error"]["code"] == "SQL_GENERATION_FAILED"
+        mock_batch.assert_called_once_with(["Show all users", "Invalid query"])
+        mock_execute.assert_called_once_with(generated_sql)
+
+@pytest.mark.asyncio
+async def test_ask_batch_requires_questions(client: AsyncClient):
+    response = await client.post("/api/ask/batch", json={"questions": []})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_admin_usage_filters_by_correlation_id(client: AsyncClient):
+    def fail(question):
+        raise SqlGenerationException(question=question)
+
+    with patch.object(OpenAITextToSql, 'generate_sql', side_effect=fail):
+        response = await client.post("/ask", data={"question": "Invalid query"}, headers={"X-Correlation-ID": "nightly-42"})
+
+    assert response.headers["x-correlation-id"] == "nightly-42"
+    assert response.json()["error"]["correlation_id"] == "nightly-42"
+
+    response = await client.get("/admin/usage", params={"correlation_id": "nightly-42"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["records"] == 0
+    assert set(body) >= {"totals", "by_stage", "by_model", "most_expensive", "slowest"}
+
+@pytest.mark.asyncio
+async def test_ask_voice_transcribes_repeated_audio_once(client: AsyncClient):
+    generated_sql = "SELECT user_name FROM ai_service_usage;"
+    audio = b"\x1a\x45\xdf\xa3voice"
+    received = []
+    async def transcribe(audio, filename=None):
+        received.append((audio.read(), filename))
+        return "Show all users"
+
+    with patch.object(OpenAIWhisperService, 'transcribe', side_effect=transcribe), \
+         patch.object(OpenAITextToSql, 'generate_sql', return_value=generated_sql) as mock_generate_sql, \
+         patch.object(LangChainExecutor, 'execute', return_value=[{"user_name": "user1"}]):
+        first = await client.post("/ask-voice", files={"file": ("recording.webm", audio, "audio/webm")})
+        second = await client.post("/ask-voice", files={"file": ("again.webm", audio, "audio/webm")})
+
+    assert first.status_code == second.status_code == 200
+    assert "user1" in first.text and "Show all users" in second.text
+    assert received == [(audio, "recording.webm")]
+    assert mock_generate_sql.call_count == 1
+
+@pytest.mark.asyncio
+async def test_html_pages_render_without_template_deprecation(client: AsyncClient):
+    with warnings.catch_warnings(record=True) as caught, \
+         patch.object(OpenAIWhisperService, 'transcribe', AsyncMock(return_value="Show all users")), \
+         patch.object(OpenAITextToSql, 'generate_sql', return_value="SELECT user_name FROM ai_service_usage;"), \
+         patch.object(LangChainExecutor, 'execute', return_value=[{"user_name": "user1"}]):
+        warnings.simplefilter("always")
+        index = await client.get("/")
+        voice = await client.post("/ask-voice", files={"file": ("recording.webm", b"\x1a\x45\xdf\xa3voice", "audio/webm")})
+
+    assert index.status_code == voice.status_code == 200
+    assert not [w for w in caught if "TemplateResponse" in str(w.message)]
+
+@pytest.mark.asyncio
+async def test_ask_voice_rejects_unsupported_format(client: AsyncClient):
+    with patch.object(OpenAIWhisperService, 'transcribe') as transcribe:
+        response = await client.post("/ask-voice", files={"file": ("notes.txt", b"hello", "text/plain")})
+
+    assert response.status_code == 400
+    assert response.json()["error"]["code"] == "INVALID_FILE_FORMAT"
+    transcribe.assert_not_called()
+
+def test_ws_ask_voice_streams_stage_events():
+    chunks = [b"\x1a\x45\xdf\xa3", b"chunk-1", b"chunk-2"]
+    row_stream = RowStream(headers=["user_name"], batches=iter([[("alice",)]]))
+    received = []
+    async def transcribe(audio, filename=None):
+        received.append((audio.read(), filename))
+        return "Show all users"
+
+    async def stream_sql(self, question, examples=None):
+        yield "SELECT user_name FROM ai_service_usage;"
+
+    with patch.object(OpenAIWhisperService, 'transcribe', side_effect=transcribe), \
+         patch.object(OpenAITextToSql, 'stream_sql', new=stream_sql), \
+         patch.object(LangChainExecutor, 'stream', return_value=row_stream), \
+         TestClient(app).websocket_connect("/ws/ask-voice") as websocket:
+        websocket.send_json({"type": "start", "filename": "recording.webm"})
+        for chunk in chunks:
+            websocket.send_bytes(chunk)
+        websocket.send_json({"type": "stop"})
+        messages = [websocket.receive_json()]
+        while messages[-1]["event"] not in ("done", "error"):
+            messages.append(websocket.receive_json())
+
+    assert [message["event"] for message in messages] == [
+        "received", "transcript", "sql_token", "sql", "execution_started", "columns", "rows", "done"
+    ]
+    assert messages[0]["data"] == {"filename": "recording.webm", "bytes": sum(len(chunk) for chunk in chunks)}
+    assert messages[1]["data"]["question"] == "Show all users"
+    assert messages[6]["data"]["rows"] == [["alice"]]
+    assert received == [(b"".join(chunks), "recording.webm")]
+
+def test_ws_ask_voice_rejects_unsupported_format():
+    with patch.object(OpenAIWhisperService, 'transcribe') as transcribe, \
+         TestClient(app).websocket_connect("/ws/ask-voice") as websocket:
+        websocket.send_json({"type": "start", "filename": "notes.txt"})
+        message = websocket.receive_json()
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+
+    assert message["event"] == "error"
+    assert message["data"]["error"]["code"] == "INVALID_FILE_FORMAT"
+    assert exc_info.value.code == 1008
+    transcribe.assert_not_called()
+
+@pytest.mark.parametrize("error, close_code", [
+    (OpenAIServiceException(api_error="no API key"), 1011),
+    (InvalidRequestDataException("audio", "not accepted"), 1008),
+])
+def test_ws_ask_voice_reports_dependency_failures(error, close_code):
+    def failing_dependency():
+        raise error
+
+    app.dependency_overrides[get_voice_to_text_service] = failing_dependency
+    try:
+        with TestClient(app).websocket_connect("/ws/ask-voice") as websocket:
+            message = websocket.receive_json()
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                websocket.receive_json()
+    finally:
+        app.dependency_overrides.pop(get_voice_to_text_service)
+
+    assert message["event"] == "error"
+    assert message["data"]["error"]["code"] == error.error_code.value
+    assert exc_info.value.code == close_code
@@ -0,0 +1,117 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from app.models.row_stream import RowStream
+from app.services.implementations.cached_text_to_sql import CachedTextToSql
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.services.implementations.sql_query_service import SqlQueryService
+from app.utils.cache import TTLCache
+from app.utils.export_utils import iter_sse
+from app.exceptions.domain import SqlGenerationException
+
+class PieceTextToSql:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.calls = 0
+
+    async def generate_sql(self, question):
+        return "".join(self.pieces).strip()
+
+    async def stream_sql(self, question):
+        self.calls += 1
+        for piece in self.pieces:
+            yield piece
+
+def make_chunk(content=None, usage=None):
+    chunk = MagicMock()
+    chunk.choices = [] if content is None else [MagicMock()]
+    if content is not None:
+        chunk.choices[0].delta.content = content
+    chunk.usage = usage
+    return chunk
+
+async def aiter_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+def make_service(pieces, batches):
+    closed = []
+    executor = MagicMock()
+    executor.stream = MagicMock(return_value=RowStream(["id"], iter(batches), on_close=lambda: closed.append(True)))
+    return SqlQueryService(PieceTextToSql(pieces), executor), executor, closed
+
+async def collect(events):
+    return [event async for event in events]
+
+@pytest.mark.asyncio
+async def test_stream_answer_emits_stages_in_order():
+    service, executor, closed = make_service(["SELECT id ", "FROM ai_services;"], [[(1,), (2,)], [(3,)]])
+
+    events = await collect(service.stream_answer("List services"))
+
+    assert [event for event, _ in events] == [
+        "sql_token", "sql_token", "sql", "execution_started", "columns", "rows", "rows", "done"
+    ]
+    assert events[2][1]["sql"] == "SELECT id FROM ai_services;"
+    executor.stream.assert_called_once_with("SELECT id FROM ai_services;")
+    assert events[4][1] == {"headers": ["id"]}
+    summary = events[-1][1]
+    assert (summary["row_count"], summary["truncated"]) == (3, False)
+    assert summary["total_ms"] >= summary["time_to_first_row_ms"] >= summary["generation_ms"] >= 0
+    assert closed == [True]
+
+@pytest.mark.asyncio
+async def test_stream_answer_stops_at_max_rows_and_closes_cursor():
+    batches = [[(i,) for i in range(4)], [(i,) for i in range(4, 8)], [(99,)]]
+    service, _, closed = make_service(["SELECT id FROM ai_services"], batches)
+
+    events = await collect(service.stream_answer("List services", max_rows=6))
+
+    rows = [row for event, data in events if event == "rows" for row in data["rows"]]
+    assert rows == [(i,) for i in range(6)]
+    assert events[-1][1]["truncated"] is True
+    assert closed == [True]
+
+@pytest.mark.asyncio
+async def test_openai_stream_sql_yields_deltas_and_records_usage():
+    client = MagicMock()
+    usage = MagicMock(prompt_tokens=1100)
+    usage.prompt_tokens_details.cached_tokens = 1024
+    client.chat.completions.create = AsyncMock(return_value=aiter_chunks([
+        make_chunk("```sql\nSELECT "), make_chunk("1;"), make_chunk("\n```"), make_chunk(usage=usage)
+    ]))
+
+    pieces = [piece async for piece in OpenAITextToSql(client=client).stream_sql("Anything")]
+
+    assert "".join(pieces) == "```sql\nSELECT 1;\n```"
+    _, kwargs = client.chat.completions.create.call_args
+    assert kwargs["stream"] is True
+    assert kwargs["stream_options"] == {"include_usage": True}
+
+@pytest.mark.asyncio
+async def test_openai_stream_sql_rejects_empty_output():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=aiter_chunks([make_chunk("  "), make_chunk(usage=None)]))
+
+    with pytest.raises(SqlGenerationException):
+        [piece async for piece in OpenAITextToSql(client=client).stream_sql("Anything")]
+
+@pytest.mark.asyncio
+async def test_cached_text_to_sql_streams_once_then_serves_from_cache():
+    inner = PieceTextToSql(["```sql\nSELECT id ", "FROM ai_services;\n```"])
+    cached = CachedTextToSql(inner, TTLCache(max_entries=8))
+
+    first = [piece async for piece in cached.stream_sql("List services")]
+    second = [piece async for piece in cached.stream_sql("list services?")]
+
+    assert len(first) == 2
+    assert second == ["SELECT id FROM ai_services;"]
+    assert inner.calls == 1
+    assert await cached.generate_sql("List services") == "SELECT id FROM ai_services;"
+
+@pytest.mark.asyncio
+async def test_iter_sse_encodes_events():
+    async def events():
+        yield "rows", {"rows": [(1, "a")]}
+
+    assert [chunk async for chunk in iter_sse(events())] == [b'event: rows\ndata: {"rows": [[1, "a"]]}\n\n']
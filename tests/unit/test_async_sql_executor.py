@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from app.database import to_async_url
+from app.models.query_result import ResultSet
+from app.services.implementations.async_sql_executor import AsyncSqlExecutor
+from app.services.implementations.sql_query_service import SqlQueryService
+from app.utils.sql_text import apply_row_limit
+from app.exceptions.domain import (
+    UnsafeSqlException,
+    DatabaseExecutionException,
+    ConfigurationException
+)
+
+@pytest.fixture
+def mock_connection():
+    return MagicMock()
+
+@pytest.fixture
+def async_executor_instance(mock_connection):
+    engine = MagicMock()
+    engine.connect.return_value.__aenter__ = AsyncMock(return_value=mock_connection)
+    engine.connect.return_value.__aexit__ = AsyncMock(return_value=False)
+    engine.dispose = AsyncMock()
+    return AsyncSqlExecutor(engine=engine)
+
+def test_to_async_url():
+    assert to_async_url("postgresql://u:p@db:5432/x") == "postgresql+asyncpg://u:p@db:5432/x"
+    assert to_async_url("postgresql+asyncpg://u:p@db/x") == "postgresql+asyncpg://u:p@db/x"
+    assert to_async_url("sqlite:///./local.db") == "sqlite+aiosqlite:///./local.db"
+    with pytest.raises(ConfigurationException):
+        to_async_url("not-a-url")
+
+@pytest.mark.asyncio
+async def test_execute_success(async_executor_instance, mock_connection):
+    sql_query = "SELECT id, name FROM ai_services;"
+    mock_result = MagicMock()
+    mock_result.keys.return_value = ["id", "name"]
+    mock_result.__iter__.return_value = iter([(1, "Service A"), (2, "Service B")])
+    mock_result.cursor.description = [("id", None), ("name", None)]
+    mock_connection.execute = AsyncMock(return_value=mock_result)
+
+    result = await async_executor_instance.execute(sql_query)
+
+    assert result.headers == ["id", "name"]
+    assert result.rows == [(1, "Service A"), (2, "Service B")]
+    assert result.column_types == ["integer", "text"]
+    assert mock_connection.execute.call_args[0][0].text == apply_row_limit(sql_query, async_executor_instance.max_rows + 1)
+
+@pytest.mark.asyncio
+async def test_execute_unsafe_sql(async_executor_instance, mock_connection):
+    mock_connection.execute = AsyncMock()
+    with pytest.raises(UnsafeSqlException):
+        await async_executor_instance.execute("DELETE FROM ai_services;")
+    mock_connection.execute.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_execute_db_error(async_executor_instance, mock_connection):
+    mock_connection.execute = AsyncMock(side_effect=Exception("boom"))
+    with pytest.raises(DatabaseExecutionException):
+        await async_executor_instance.execute("SELECT missing FROM ai_services;")
+
+@pytest.mark.asyncio
+async def test_query_service_awaits_async_executor(async_executor_instance):
+    text_to_sql = MagicMock()
+    text_to_sql.generate_sql.return_value = "SELECT name FROM ai_services;"
+    async_executor_instance.execute = AsyncMock(return_value=ResultSet(["name"], [("GPT-4o",)], ["text"]))
+
+    service = SqlQueryService(text_to_sql, async_executor_instance)
+    result = await service.process_question("Which models exist?")
+
+    assert result.headers == ["name"]
+    assert result.rows == [("GPT-4o",)]
+    assert result.column_types == ["text"]
+    async_executor_instance.execute.assert_awaited_once_with("SELECT name FROM ai_services;")
+
+@pytest.mark.asyncio
+async def test_execute_on_sqlite_url(tmp_path):
+    executor = AsyncSqlExecutor(db_url=f"sqlite:///{tmp_path / 'local.db'}")
+    try:
+        result = await executor.execute("SELECT 1 AS one;")
+    finally:
+        await executor.close()
+
+    assert (result.headers, result.rows) == (["one"], [(1,)])
@@ -0,0 +1,184 @@
+import io
+import wave
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.implementations.openai_whisper_service import OpenAIWhisperService
+from app.utils.audio_preprocessing import (
+    AudioPreprocessor,
+    decode_wav,
+    resample,
+    speech_bounds,
+    split_points,
+    stitch_transcripts,
+)
+
+def wav_bytes(samples: np.ndarray, rate: int, width: int = 2) -> bytes:
+    samples = samples.reshape(samples.shape[0], -1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as recording:
+        recording.setnchannels(samples.shape[1])
+        recording.setsampwidth(width)
+        recording.setframerate(rate)
+        if width == 2:
+            recording.writeframes((samples * 32767).astype("<i2").tobytes())
+        else:
+            recording.writeframes((samples * 2147483647).astype("<i4").tobytes())
+    return buffer.getvalue()
+
+def recording(rate=44100, silence=1.0, speech=1.5, channels=2, gain=1.0):
+    t = np.arange(int(speech * rate)) / rate
+    voice = gain * 0.3 * np.sin(2 * np.pi * 220 * t)
+    quiet = np.random.default_rng(0).normal(0, gain * 0.0003, int(silence * rate))
+    mono = np.concatenate([quiet, voice, quiet])
+    return np.stack([mono] * channels, axis=1)
+
+@pytest.mark.parametrize("width", [2, 4])
+def test_decode_wav_round_trips_pcm(width):
+    samples = recording(rate=8000, silence=0.1, speech=0.2)
+
+    decoded, rate = decode_wav(wav_bytes(samples, 8000, width))
+
+    assert rate == 8000 and decoded.shape == samples.shape
+    assert np.abs(decoded - samples).max() < 1e-3
+
+def test_resample_keeps_the_pitch():
+    t = np.arange(44100) / 44100
+    tone = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+
+    resampled = resample(tone, 44100, 16000)
+
+    assert resampled.size == 16000
+    assert np.argmax(np.abs(np.fft.rfft(resampled))) == 440
+
+def test_speech_bounds_cover_only_the_loud_part():
+    samples = recording(rate=16000, channels=1)[:, 0]
+
+    start, end = speech_bounds(samples, 16000, pad_ms=0)
+
+    assert abs(start - 16000) <= 480 and abs(end - 40000) <= 480
+    assert speech_bounds(np.zeros(16000, dtype=np.float32), 16000) is None
+
+def test_speech_bounds_find_quietly_recorded_speech():
+    # Speech peaking around -60 dBFS, well under any fixed "loud enough" level.
+    samples = recording(rate=16000, channels=1, gain=0.003)[:, 0]
+
+    start, end = speech_bounds(samples, 16000, pad_ms=0)
+
+    assert abs(start - 16000) <= 480 and abs(end - 40000) <= 480
+
+def test_quiet_recording_is_trimmed_not_rejected():
+    audio = AudioPreprocessor(pad_ms=100).process(wav_bytes(recording(gain=0.01), 44100), "recording.wav")
+
+    assert audio.speech
+    assert 1.5 <= audio.stats["output_seconds"] <= 1.8
+
+def test_wav_recording_is_downmixed_resampled_and_trimmed():
+    data = wav_bytes(recording(), 44100)
+    preprocessor = AudioPreprocessor(pad_ms=100)
+
+    audio = preprocessor.process(data, "recording.wav")
+    decoded, rate = decode_wav(audio.data)
+
+    assert audio.speech and audio.filename == "recording.wav"
+    assert (rate, decoded.shape[1]) == (16000, 1)
+    assert audio.stats["input_seconds"] == 3.5
+    assert 1.5 <= audio.stats["output_seconds"] <= 1.8
+    assert len(audio.data) < len(data) / 5
+    stats = preprocessor.stats()
+    assert stats["processed"] == 1 and stats["bytes_saved"] == len(data) - len(audio.data)
+    assert set(stats["stage_latency_ms"]) == {"decode", "downmix", "trim", "resample", "split", "encode"}
+
+def test_unsupported_input_passes_through_without_ffmpeg():
+    preprocessor = AudioPreprocessor()
+
+    audio = preprocessor.process(b"\x1a\x45\xdf\xa3webm", "recording.webm")
+
+    assert (audio.data, audio.filename, audio.speech) == (b"\x1a\x45\xdf\xa3webm", "recording.webm", True)
+    assert preprocessor.stats()["passed_through"] == 1
+
+@pytest.mark.asyncio
+async def test_whisper_receives_preprocessed_audio_and_original_when_no_speech_is_found():
+    client = MagicMock()
+    client.audio.transcriptions.create = AsyncMock(return_value=MagicMock(text="Show all users", duration=1.7))
+    service = OpenAIWhisperService(client=client, preprocessor=AudioPreprocessor())
+
+    assert await service.transcribe(wav_bytes(recording(), 44100), filename="recording.wav") == "Show all users"
+    name, sent = client.audio.transcriptions.create.call_args.kwargs["file"]
+    assert name == "recording.wav" and decode_wav(sent)[1] == 16000
+
+    silent = wav_bytes(np.zeros((44100, 2)), 44100)
+    assert await service.transcribe(silent, filename="recording.wav") == "Show all users"
+    assert client.audio.transcriptions.create.call_args.kwargs["file"] == ("recording.wav", silent)
+    assert service.preprocessor.stats()["silent"] == 1
+
+def dictation(rate=16000, sentences=6, seconds=4.0, pause=0.6):
+    """Sentences of tone separated by short pauses, like a long dictated request."""
+    t = np.arange(int(seconds * rate)) / rate
+    voice = 0.3 * np.sin(2 * np.pi * 220 * t)
+    gap = np.zeros(int(pause * rate))
+    return np.concatenate([part for _ in range(sentences) for part in (voice, gap)][:-1]).astype(np.float32)
+
+def test_split_points_cut_in_pauses_and_bound_chunk_length():
+    samples = dictation()
+    rate = 16000
+
+    cuts = split_points(samples, rate, max_chunk_seconds=10)
+
+    lengths = np.diff([0] + [cut for cut, _ in cuts] + [samples.size]) / rate
+    assert len(cuts) == 2 and lengths.max() <= 10
+    assert all(silent for _, silent in cuts)
+    assert all(np.abs(samples[cut - 80:cut + 80]).max() == 0 for cut, _ in cuts)
+    assert split_points(samples, rate, max_chunk_seconds=60) == []
+
+def test_split_points_fall_back_to_overlapping_cuts_in_continuous_speech():
+    t = np.arange(25 * 16000) / 16000
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+    cuts = split_points(samples, 16000, max_chunk_seconds=10)
+
+    assert len(cuts) == 2 and not any(silent for _, silent in cuts)
+
+def test_stitch_transcripts_drops_overlap_only_at_overlapping_cuts():
+    parts = ["Show total tokens per user for the", "for the last month, and then", "then group by model."]
+
+    assert stitch_transcripts(parts, [True, True]) == "Show total tokens per user for the last month, and then group by model."
+    assert stitch_transcripts(["Usage by day", "day by day"], [False]) == "Usage by day day by day"
+
+def test_long_recording_is_encoded_as_chunks():
+    audio = AudioPreprocessor(pad_ms=0).process(wav_bytes(dictation(), 16000), "dictation.wav", max_chunk_seconds=10)
+
+    assert audio.stats["chunks"] == len(audio.chunks) == 3
+    assert [name for name, _ in audio.chunks] == ["dictation_part1.wav", "dictation_part2.wav", "dictation_part3.wav"]
+    assert audio.overlapped == [False, False]
+    assert sum(decode_wav(data)[0].shape[0] for _, data in audio.chunks) / 16000 == audio.stats["output_seconds"]
+
+@pytest.mark.asyncio
+async def test_chunks_are_transcribed_concurrently_and_stitched_in_order():
+    import asyncio
+
+    running, peak = 0, 0
+    texts = {"dictation_part1.wav": "Show tokens per user", "dictation_part2.wav": "for each model",
+             "dictation_part3.wav": "in 2024."}
+
+    async def create(file, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        # Finish in reverse order to prove the transcript keeps chunk order.
+        await asyncio.sleep(0.01 * (4 - int(file[0][-5])))
+        running -= 1
+        return MagicMock(text=texts[file[0]], duration=5.0)
+
+    client = MagicMock()
+    client.audio.transcriptions.create = AsyncMock(side_effect=create)
+    service = OpenAIWhisperService(
+        client=client, preprocessor=AudioPreprocessor(pad_ms=0), max_chunk_seconds=10, max_parallel_chunks=2
+    )
+
+    transcript = await service.transcribe(wav_bytes(dictation(), 16000), filename="dictation.wav")
+
+    assert transcript == "Show tokens per user for each model in 2024."
+    assert client.audio.transcriptions.create.await_count == 3
+    assert peak == 2
@@ -0,0 +1,152 @@
+import io
+import threading
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from starlette.requests import Request
+
+from app.exceptions.domain import InvalidFileFormatException, InvalidRequestDataException, VoiceTranscriptionException
+from app.services.implementations.openai_whisper_service import OpenAIWhisperService
+from app.utils.audio_upload import receive_audio_stream, receive_audio_upload
+
+BOUNDARY = "audio-boundary"
+
+def multipart_body(filename="question.webm", data=b"\x1a\x45\xdf\xa3" * 1000, field="file"):
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhello\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: audio/webm\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def make_request(body: bytes, chunk_size: int = 1000, content_length: bool = True):
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    received = []
+
+    async def receive():
+        chunk = chunks.pop(0)
+        received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive), received
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("spool_max_size, rolled", [(1024 * 1024, False), (1024, True)])
+async def test_upload_is_received_in_memory_or_spooled(spool_max_size, rolled):
+    data = bytes(range(256)) * 40
+    request, _ = make_request(multipart_body(data=data), chunk_size=333)
+
+    upload = await receive_audio_upload(request, spool_max_size=spool_max_size)
+
+    assert (upload.filename, upload.size) == ("question.webm", len(data))
+    assert getattr(upload.file, "_rolled") is rolled
+    assert upload.file.read() == data
+    upload.close()
+
+@pytest.mark.asyncio
+async def test_size_limit_is_enforced_while_receiving():
+    body = multipart_body(data=b"\x00" * 50_000)
+    request, received = make_request(body, content_length=False)
+
+    with pytest.raises(InvalidFileFormatException) as exc_info:
+        await receive_audio_upload(request, max_bytes=10_000)
+
+    assert exc_info.value.details["max_bytes"] == 10_000
+    assert len(received) < len(body) // 1000
+
+@pytest.mark.asyncio
+async def test_declared_length_over_limit_is_rejected_before_reading():
+    request, received = make_request(multipart_body(data=b"\x00" * 200_000))
+
+    with pytest.raises(InvalidFileFormatException):
+        await receive_audio_upload(request, max_bytes=100_000)
+
+    assert received == []
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body, error", [
+    (multipart_body(filename="notes.txt"), InvalidFileFormatException),
+    (multipart_body(filename=""), InvalidFileFormatException),
+    (multipart_body(data=b""), InvalidFileFormatException),
+    (multipart_body(field="audio"), InvalidRequestDataException),
+])
+async def test_invalid_uploads_are_rejected(body, error):
+    request, _ = make_request(body)
+
+    with pytest.raises(error):
+        await receive_audio_upload(request)
+
+def whisper_client(text="Show all users"):
+    client = MagicMock()
+    client.audio.transcriptions.create = AsyncMock(return_value=MagicMock(text=text, duration=1.0))
+    return client
+
+@pytest.mark.asyncio
+async def test_transcribe_accepts_bytes_and_file_objects():
+    request, _ = make_request(multipart_body(data=b"voice"))
+    upload = await receive_audio_upload(request)
+    client = whisper_client()
+    service = OpenAIWhisperService(client=client)
+
+    assert await service.transcribe(upload.file, filename=upload.filename) == "Show all users"
+    assert client.audio.transcriptions.create.call_args.kwargs["file"] == ("question.webm", b"voice")
+
+    await service.transcribe(b"more voice", filename="/uploads/clip.m4a")
+    assert client.audio.transcriptions.create.call_args.kwargs["file"] == ("clip.m4a", b"more voice")
+
+    with pytest.raises(VoiceTranscriptionException):
+        await service.transcribe(b"", filename="clip.m4a")
+
+@pytest.mark.asyncio
+async def test_transcribe_reads_file_objects_off_the_event_loop(tmp_path):
+    readers = []
+    class RecordingFile(io.BytesIO):
+        def read(self, size=-1):
+            readers.append(threading.get_ident())
+            return super().read(size)
+    path = tmp_path / "clip.webm"
+    path.write_bytes(b"voice")
+    client = whisper_client()
+    service = OpenAIWhisperService(client=client)
+
+    await service.transcribe(RecordingFile(b"voice"), filename="clip.webm")
+    await service.transcribe(str(path))
+
+    assert readers and threading.get_ident() not in readers
+    assert client.audio.transcriptions.create.call_args.kwargs["file"] == ("clip.webm", b"voice")
+
+def fake_websocket(*messages):
+    websocket = MagicMock()
+    websocket.receive = AsyncMock(side_effect=[
+        {"type": "websocket.receive", "bytes": message} if isinstance(message, bytes)
+        else {"type": "websocket.receive", "text": message} if isinstance(message, str)
+        else message
+        for message in messages
+    ])
+    return websocket
+
+@pytest.mark.asyncio
+async def test_audio_stream_is_spooled_as_it_arrives():
+    websocket = fake_websocket('{"type": "start", "filename": "memo.m4a"}', b"a" * 700, b"b" * 700, '{"type": "stop"}')
+
+    upload = await receive_audio_stream(websocket, spool_max_size=1000)
+
+    assert (upload.filename, upload.size, getattr(upload.file, "_rolled")) == ("memo.m4a", 1400, True)
+    assert upload.file.read() == b"a" * 700 + b"b" * 700
+    upload.close()
+
+@pytest.mark.asyncio
+async def test_audio_stream_returns_none_when_closed_before_start():
+    assert await receive_audio_stream(fake_websocket({"type": "websocket.disconnect", "code": 1000})) is None
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("messages, error", [
+    ((b"audio",), InvalidRequestDataException),
+    (('{"type": "start"}', '{"type": "stop"}'), InvalidFileFormatException),
+    (('{"type": "start"}', b"a" * 600), InvalidFileFormatException),
+    (('{"type": "start"}', "not json"), InvalidRequestDataException),
+])
+async def test_invalid_audio_streams_are_rejected(messages, error):
+    with pytest.raises(error):
+        await receive_audio_stream(fake_websocket(*messages), max_bytes=500)
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from app.models.query_result import ResultSet
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.services.implementations.sql_query_service import SqlQueryService
+from app.exceptions.domain import (
+    DatabaseExecutionException,
+    EmptyQuestionException,
+    OpenAIServiceException,
+    SqlGenerationException,
+)
+
+def json_response(queries):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = json.dumps({"queries": queries})
+    return response
+
+@pytest.mark.asyncio
+async def test_openai_batch_asks_several_questions_per_call():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=[
+        json_response([{"id": 1, "sql": "SELECT 1;"}, {"id": 3, "sql": "```sql\nSELECT 3;\n```"}]),
+        json_response([{"id": 1, "sql": "SELECT 4;"}]),
+    ])
+    text_to_sql = OpenAITextToSql(client=client, batch_size=3)
+
+    results = await text_to_sql.generate_sql_batch(["First?", "Second?", "Third?", "Fourth?"])
+
+    assert results[0] == "SELECT 1;" and results[2] == "SELECT 3;"
+    assert isinstance(results[1], SqlGenerationException)
+    assert client.chat.completions.create.await_count == 2
+    _, kwargs = client.chat.completions.create.call_args_list[0]
+    assert kwargs["response_format"] == {"type": "json_object"}
+    assert "1. First?\n2. Second?\n3. Third?" in kwargs["messages"][-1]["content"]
+    assert kwargs["messages"][0]["content"] == text_to_sql.build_messages("Anything")[0]["content"]
+
+@pytest.mark.asyncio
+async def test_unreadable_batch_response_falls_back_to_single_questions():
+    client = MagicMock()
+    broken = MagicMock()
+    broken.choices = [MagicMock()]
+    broken.choices[0].message.content = "not json"
+    single = MagicMock()
+    single.choices = [MagicMock()]
+    single.choices[0].message.content = "SELECT 2;"
+    client.chat.completions.create = AsyncMock(side_effect=[broken, single, single])
+
+    results = await OpenAITextToSql(client=client).generate_sql_batch(["First?", "Second?"])
+
+    assert results == ["SELECT 2;", "SELECT 2;"]
+
+@pytest.mark.asyncio
+async def test_failed_batch_gives_each_question_its_own_error():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=OpenAIServiceException(api_error="Circuit open for sql"))
+
+    results = await OpenAITextToSql(client=client).generate_sql_batch(["First?", "Second?", "Third?"])
+
+    assert all(isinstance(result, OpenAIServiceException) for result in results)
+    assert len({id(result) for result in results}) == 3
+    assert len({id(result.details) for result in results}) == 3
+    assert [result.details["question_preview"] for result in results] == ["First?", "Second?", "Third?"]
+    assert results[0].details["api_error"] == "Circuit open for sql"
+    results[0].details["note"] = "only this one"
+    assert "note" not in results[1].details
+
+@pytest.mark.asyncio
+async def test_process_batch_dedupes_and_reports_errors_per_item():
+    text_to_sql = MagicMock()
+    text_to_sql.generate_sql_batch = AsyncMock(return_value=[
+        "SELECT name FROM ai_services;",
+        "SELECT  name FROM ai_services",
+        SqlGenerationException(question="Nonsense"),
+        "SELECT * FROM missing;",
+    ])
+    running, peak = 0, 0
+
+    async def execute(sql):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if "missing" in sql:
+            raise DatabaseExecutionException(sql_preview=sql)
+        return ResultSet(["name"], [("GPT-4o",)])
+
+    executor = MagicMock()
+    executor.execute = AsyncMock(side_effect=execute)
+    service = SqlQueryService(text_to_sql, executor)
+
+    questions = ["Service names", "service names?", "List services", "", "Nonsense", "Broken"]
+    items = await service.process_batch(questions, max_concurrency=1)
+
+    text_to_sql.generate_sql_batch.assert_awaited_once_with(["Service names", "List services", "Nonsense", "Broken"])
+    assert executor.execute.await_count == 2
+    assert peak == 1
+    assert [item.question for item in items] == questions
+    assert all(item.result.rows == [("GPT-4o",)] for item in items[:3])
+    assert isinstance(items[3].error, EmptyQuestionException)
+    assert isinstance(items[4].error, SqlGenerationException)
+    assert isinstance(items[5].error, DatabaseExecutionException)
+    assert items[5].error.details["sql_query"] == "SELECT * FROM missing;"
+
+@pytest.mark.asyncio
+async def test_process_batch_without_batch_support_asks_concurrently():
+    text_to_sql = MagicMock()
+    text_to_sql.generate_sql = AsyncMock(side_effect=lambda question: f"SELECT '{question}';")
+    executor = MagicMock()
+    executor.execute = AsyncMock(return_value=ResultSet(["x"], [(1,)]))
+
+    items = await SqlQueryService(text_to_sql, executor).process_batch(["a", "b"])
+
+    assert [item.sql for item in items] == ["SELECT 'a';", "SELECT 'b';"]
+    assert all(item.error is None for item in items)
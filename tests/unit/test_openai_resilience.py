@@ -0,0 +1,204 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+import pytest_asyncio
+
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.utils.resilience import CircuitBreaker, LatencyWindow, ResilientCaller
+from app.exceptions.domain import OpenAIServiceException
+
+def completion(content):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+    }
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """Answers chat completions from a script of (status, delay, content) steps; the last step repeats."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeOpenAIHandler)
+        self.script = [(200, 0.0, "SELECT 1;")]
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def next_step(self):
+        with self.lock:
+            step = self.script[min(self.requests, len(self.script) - 1)]
+            self.requests += 1
+            return step
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, delay, content = self.server.next_step()
+        time.sleep(delay)
+        body = json.dumps(completion(content) if status == 200 else {"error": {"message": "upstream failure"}})
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_openai():
+    server = FakeOpenAI()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest_asyncio.fixture
+async def client(fake_openai):
+    client = openai.AsyncOpenAI(
+        api_key="test", base_url=f"http://127.0.0.1:{fake_openai.server_address[1]}/v1", max_retries=0
+    )
+    yield client
+    await client.close()
+
+def caller(**kwargs):
+    kwargs.setdefault("base_delay", 0.01)
+    kwargs.setdefault("max_delay", 0.02)
+    return ResilientCaller("sql", **kwargs)
+
+@pytest.mark.asyncio
+async def test_retries_server_errors_then_succeeds(fake_openai, client):
+    fake_openai.script = [(500, 0.0, None), (503, 0.0, None), (200, 0.0, "SELECT 2;")]
+    resilience = caller(max_attempts=3)
+
+    sql = await OpenAITextToSql(client=client, resilience=resilience).generate_sql("Anything")
+
+    assert sql == "SELECT 2;"
+    assert fake_openai.requests == 3
+    assert resilience.stats()["retries"] == 2
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(fake_openai, client):
+    fake_openai.script = [(400, 0.0, None)]
+    resilience = caller(max_attempts=3)
+
+    with pytest.raises(OpenAIServiceException):
+        await OpenAITextToSql(client=client, resilience=resilience).generate_sql("Anything")
+
+    assert fake_openai.requests == 1
+    assert resilience.breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_without_calling_upstream(fake_openai, client):
+    fake_openai.script = [(500, 0.0, None)]
+    resilience = caller(max_attempts=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    text_to_sql = OpenAITextToSql(client=client, resilience=resilience)
+
+    for _ in range(2):
+        with pytest.raises(OpenAIServiceException):
+            await text_to_sql.generate_sql("Anything")
+    with pytest.raises(OpenAIServiceException) as exc_info:
+        await text_to_sql.generate_sql("Anything")
+
+    assert fake_openai.requests == 2
+    assert exc_info.value.details["circuit"] == "open"
+    assert resilience.stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_latency_budget_bounds_a_slow_upstream(fake_openai, client):
+    fake_openai.script = [(200, 2.0, "SELECT 1;")]
+    resilience = caller(budget=0.3, max_attempts=5)
+
+    started = time.monotonic()
+    with pytest.raises(OpenAIServiceException):
+        await OpenAITextToSql(client=client, timeout=10, resilience=resilience).generate_sql("Anything")
+
+    assert time.monotonic() - started < 1.5
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_over_a_stalled_one(fake_openai, client):
+    fake_openai.script = [(200, 2.0, "SELECT 'slow';"), (200, 0.0, "SELECT 'fast';")]
+    latencies = LatencyWindow()
+    for _ in range(20):
+        latencies.add(0.05)
+    resilience = caller(hedge=True, hedge_min_samples=20, latencies=latencies)
+
+    started = time.monotonic()
+    sql = await OpenAITextToSql(client=client, resilience=resilience).generate_sql("Anything")
+
+    assert sql == "SELECT 'fast';"
+    assert time.monotonic() - started < 1.5
+    stats = resilience.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+def test_breaker_half_opens_after_cool_down():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("outcome", ["cancelled", "unexpected_error"])
+async def test_abandoned_half_open_probe_reopens_the_breaker(outcome):
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    resilience = caller(max_attempts=1, breaker=breaker)
+    breaker.record_failure()
+    now[0] = 10.0
+    started = asyncio.Event()
+
+    async def probe(timeout):
+        started.set()
+        if outcome == "unexpected_error":
+            raise ValueError("not an upstream error")
+        await asyncio.sleep(3600)
+
+    task = asyncio.ensure_future(resilience.call(probe, timeout=60))
+    await started.wait()
+    task.cancel()
+    with pytest.raises((asyncio.CancelledError, ValueError)):
+        await task
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    now[0] = 1010.0
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+@pytest.mark.asyncio
+async def test_cancelled_call_on_closed_breaker_is_not_a_failure():
+    breaker = CircuitBreaker(failure_threshold=1)
+    resilience = caller(breaker=breaker)
+
+    task = asyncio.ensure_future(resilience.call(lambda timeout: asyncio.sleep(3600), timeout=60))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,150 @@
+import sqlite3
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from app.models.query_result import ResultSet
+from app.services.implementations.sql_query_service import SqlQueryService
+from app.utils.sql_text import apply_row_limit, keyset_page_sql, order_by_terms, paging_key
+from app.exceptions.domain import InvalidRequestDataException
+
+SCORES = [
+    (1, "alpha", 30), (2, "beta", 20), (3, "gamma", 30), (4, None, 10), (5, "delta", None),
+    (6, "beta", 20), (7, "O'Brien", 20), (8, "beta", 20), (9, None, None), (10, "epsilon", 10),
+]
+
+@pytest.fixture
+def connection():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE ai_service_usage (id INTEGER PRIMARY KEY, user_name TEXT)")
+    conn.executemany(
+        "INSERT INTO ai_service_usage (id, user_name) VALUES (?, ?)",
+        [(i, f"user{i}") for i in range(1, 8)]
+    )
+    conn.execute("CREATE TABLE scores (id INTEGER PRIMARY KEY, team TEXT, score INTEGER)")
+    conn.executemany("INSERT INTO scores (id, team, score) VALUES (?, ?, ?)", SCORES)
+    yield conn
+    conn.close()
+
+class SqliteExecutor:
+    def __init__(self, connection, max_rows=500):
+        self.connection = connection
+        self.max_rows = max_rows
+        self.statements = []
+
+    def execute(self, sql):
+        self.statements.append(sql)
+        cursor = self.connection.execute(apply_row_limit(sql, self.max_rows + 1))
+        rows = cursor.fetchall()
+        return ResultSet(
+            [column[0] for column in cursor.description],
+            rows[:self.max_rows],
+            truncated=len(rows) > self.max_rows
+        )
+
+async def all_pages(service, sql, headers, limit):
+    rows, cursor = [], None
+    while True:
+        page = await service.fetch_page(sql, headers, cursor=cursor, limit=limit)
+        rows.extend(page.rows)
+        if page.next_cursor is None:
+            return rows
+        cursor = page.next_cursor
+
+def test_apply_row_limit_wraps_query(connection):
+    sql = apply_row_limit("SELECT user_name FROM ai_service_usage ORDER BY id DESC;\n", 3)
+    assert connection.execute(sql).fetchall() == [("user7",), ("user6",), ("user5",)]
+
+def test_order_by_terms_reads_only_the_outer_clause():
+    sql = (
+        "SELECT team, ROW_NUMBER() OVER (ORDER BY id) AS n FROM (SELECT * FROM scores ORDER BY id) s "
+        "WHERE team <> 'order by x' ORDER BY s.\"team\" DESC NULLS LAST, 2, score + 1 LIMIT 5;"
+    )
+    assert order_by_terms(sql) == [('s."team"', True, False), ("2", False, None), ("score + 1", False, None)]
+    assert order_by_terms("SELECT team FROM scores") == []
+
+def test_paging_key_follows_query_order_then_breaks_ties_on_other_columns():
+    assert paging_key("SELECT team, score, id FROM scores ORDER BY score DESC", ["team", "score", "id"]) == [
+        ("score", True, True), ("team", False, False), ("id", False, False)
+    ]
+    # Terms after one that is not an output column no longer decide the order.
+    assert paging_key("SELECT team, score FROM scores ORDER BY length(team), score", ["team", "score"]) == [
+        ("team", False, False), ("score", False, False)
+    ]
+    assert paging_key("SELECT s.id, t.id, team FROM s, t", ["id", "id", "team"]) == [("team", False, False)]
+
+def test_keyset_page_filters_on_key_instead_of_counting_rows():
+    sql = keyset_page_sql("SELECT team, score FROM scores;", [("score", True, True), ("team", False, False)], [20, "beta"], 3)
+
+    assert "ROW_NUMBER" not in sql and "OFFSET" not in sql
+    assert '"score" < 20' in sql and "\"team\" = 'beta'" in sql
+    assert sql.endswith('ORDER BY "score" DESC NULLS FIRST, "team" ASC NULLS LAST LIMIT 3')
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sql", [
+    "SELECT team, score FROM scores ORDER BY score DESC;",
+    "SELECT team, score FROM scores",
+    "SELECT team FROM scores ORDER BY team NULLS FIRST",
+])
+@pytest.mark.parametrize("limit", [1, 2, 3, 4])
+async def test_pages_cover_every_row_once_in_key_order(connection, sql, limit):
+    cursor = connection.execute(sql)
+    headers = [column[0] for column in cursor.description]
+    key = paging_key(sql, headers)
+    expected = connection.execute(keyset_page_sql(sql, key, None, 100)).fetchall()
+    service = SqlQueryService(MagicMock(), SqliteExecutor(connection))
+
+    assert await all_pages(service, sql, headers, limit) == expected
+    assert sorted(expected, key=repr) == sorted(cursor.fetchall(), key=repr)
+
+@pytest.mark.asyncio
+async def test_duplicate_rows_longer_than_a_page_are_not_lost(connection):
+    service = SqlQueryService(MagicMock(), SqliteExecutor(connection))
+    rows = await all_pages(service, "SELECT score FROM scores WHERE team = 'beta'", ["score"], 1)
+    assert rows == [(20,), (20,), (20,)]
+
+@pytest.mark.asyncio
+async def test_pages_shrink_rather_than_exceed_the_executor_row_cap(connection):
+    executor = SqliteExecutor(connection, max_rows=3)
+    service = SqlQueryService(MagicMock(), executor)
+
+    rows = await all_pages(service, "SELECT id FROM scores", ["id"], 3)
+
+    assert rows == [(i,) for i in range(1, 11)]
+
+@pytest.mark.asyncio
+async def test_fetch_page_returns_columns_and_cursor():
+    executor = MagicMock()
+    executor.execute = AsyncMock(return_value=ResultSet(
+        ["user_name"], [("alice",), ("bob",), ("carol",)], ["text"]
+    ))
+    service = SqlQueryService(MagicMock(), executor)
+
+    page = await service.fetch_page("SELECT user_name FROM ai_service_usage", ["user_name"], limit=2)
+
+    assert page.headers == ["user_name"]
+    assert page.rows == [("alice",), ("bob",)]
+    assert page.column_types == ["text"]
+    assert page.next_cursor
+    assert 'ORDER BY "user_name" ASC NULLS LAST LIMIT 3' in executor.execute.call_args[0][0]
+
+@pytest.mark.asyncio
+async def test_fetch_page_last_page_has_no_cursor():
+    executor = MagicMock()
+    executor.execute = AsyncMock(return_value=ResultSet(["user_name"], [("alice",)]))
+    service = SqlQueryService(MagicMock(), executor)
+
+    page = await service.fetch_page("SELECT user_name FROM ai_service_usage", ["user_name"], limit=2)
+
+    assert page.next_cursor is None
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cursor", [
+    "abc",
+    "eyJhZnRlciI6WzEsMl0sInNraXAiOjB9",  # two key values for a one-column key
+    "eyJhZnRlciI6W1sxXV0sInNraXAiOjB9",  # a list where a scalar belongs
+    "eyJhZnRlciI6WzFdLCJza2lwIjotMX0",  # negative skip
+])
+async def test_fetch_page_rejects_invalid_cursor(cursor):
+    service = SqlQueryService(MagicMock(), MagicMock())
+    with pytest.raises(InvalidRequestDataException):
+        await service.fetch_page("SELECT 1 AS one", ["one"], cursor=cursor)
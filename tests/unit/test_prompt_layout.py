@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import create_engine
+from unittest.mock import MagicMock, AsyncMock
+
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.utils.prompt_cache import PromptCacheStats, default_prompt_cache_stats
+from app.utils.schema_catalog import SchemaCatalog
+from app.utils.schema_pruning import SchemaPruner
+
+QUESTIONS = ["Show all clients from the USA", "Total tokens per user", "Which clients use Anthropic?", "Hello"]
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'layout.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE ai_services (id INTEGER PRIMARY KEY, provider VARCHAR(255))")
+        connection.exec_driver_sql("CREATE TABLE ai_projects (id INTEGER PRIMARY KEY, client_name VARCHAR(255))")
+        connection.exec_driver_sql(
+            "CREATE TABLE ai_service_usage (id INTEGER PRIMARY KEY, service_id INT REFERENCES ai_services(id), "
+            "client_id INT REFERENCES ai_projects(id), user_name VARCHAR(255), prompt_tokens INT)"
+        )
+        connection.exec_driver_sql("INSERT INTO ai_services (provider) VALUES ('Anthropic')")
+    yield engine
+    engine.dispose()
+
+def prefixes(text_to_sql, questions=QUESTIONS):
+    return [text_to_sql.build_messages(question)[0]["content"] for question in questions]
+
+def test_system_prefix_is_identical_for_every_question():
+    text_to_sql = OpenAITextToSql(client=MagicMock())
+
+    first, *rest = prefixes(text_to_sql)
+
+    assert all(prefix is first for prefix in rest)
+    assert all(question not in first for question in QUESTIONS)
+
+def test_system_prefix_survives_schema_refresh_without_ddl(engine):
+    catalog = SchemaCatalog(engine, ["ai_services", "ai_projects", "ai_service_usage"])
+    catalog.refresh_sync()
+    text_to_sql = OpenAITextToSql(client=MagicMock(), schema_catalog=catalog)
+    before = prefixes(text_to_sql)
+
+    catalog.refresh_sync()
+    after = prefixes(text_to_sql)
+
+    assert [prefix.encode("utf-8") for prefix in after] == [prefix.encode("utf-8") for prefix in before]
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE ai_projects ADD COLUMN country VARCHAR(255)")
+    catalog.refresh_sync()
+
+    assert prefixes(text_to_sql)[0] != before[0]
+
+def test_pruned_prefixes_are_stable_per_table_selection(engine):
+    catalog = SchemaCatalog(engine, ["ai_services", "ai_projects", "ai_service_usage"])
+    catalog.refresh_sync()
+    text_to_sql = OpenAITextToSql(client=MagicMock(), schema_catalog=catalog, schema_pruner=SchemaPruner(catalog))
+
+    before = prefixes(text_to_sql)
+    catalog.refresh_sync()
+
+    assert prefixes(text_to_sql) == before
+    assert prefixes(text_to_sql, ["Show all clients"]) == prefixes(text_to_sql, ["List every client"])
+
+def test_record_usage_counts_cached_prompt_tokens():
+    stats = PromptCacheStats()
+    usage = MagicMock(prompt_tokens=1500)
+    usage.prompt_tokens_details.cached_tokens = 1280
+
+    assert stats.record_usage(usage) == 1280
+    stats.record_usage(MagicMock())
+
+    result = stats.stats()
+    assert (result["requests"], result["reported"], result["cache_hits"]) == (2, 1, 1)
+    assert result["cached_token_ratio"] == round(1280 / 1500, 4)
+
+@pytest.mark.asyncio
+async def test_generate_sql_records_cached_tokens():
+    client = MagicMock()
+    response = MagicMock()
+    response.choices[0].message.content = "SELECT 1;"
+    response.usage.prompt_tokens = 1200
+    response.usage.prompt_tokens_details.cached_tokens = 1024
+    client.chat.completions.create = AsyncMock(return_value=response)
+
+    before = default_prompt_cache_stats.stats()["cached_tokens"]
+
+    await OpenAITextToSql(client=client).generate_sql("Anything")
+
+    assert default_prompt_cache_stats.stats()["cached_tokens"] == before + 1024
@@ -0,0 +1,91 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.services.implementations.langchain_executor import LangChainExecutor
+from app.utils.query_plan import QueryCostGuard, parse_plan, transaction_guard_statements
+from app.exceptions.domain import QueryTooExpensiveException
+
+def explain_output(total_cost, plan_rows, node_type="Seq Scan"):
+    return [{"Plan": {"Node Type": node_type, "Startup Cost": 0.0, "Total Cost": total_cost, "Plan Rows": plan_rows}}]
+
+@pytest.fixture
+def postgres_executor():
+    with patch("langchain_community.utilities.sql_database.SQLDatabase.from_uri") as mock_from_uri:
+        mock_db = MagicMock()
+        mock_db._engine.dialect.name = "postgresql"
+        mock_from_uri.return_value = mock_db
+        guard = QueryCostGuard(max_cost=1000.0, max_rows=10000, statement_timeout_ms=5000)
+        yield LangChainExecutor(db_url="postgresql://u:p@db/x", max_rows=0, cost_guard=guard)
+
+def connect(executor, explain_result, rows=()):
+    connection = MagicMock()
+    explain = MagicMock()
+    explain.scalar.return_value = explain_result
+    query = MagicMock()
+    query.keys.return_value = ["id"]
+    query.__iter__.return_value = iter(rows)
+    query.cursor.description = [("id", 23)]
+
+    def execute(statement):
+        if statement.text.startswith("EXPLAIN"):
+            return explain
+        if statement.text.startswith("SET"):
+            return MagicMock()
+        return query
+
+    connection.execute.side_effect = execute
+    executor.engine.connect.return_value.__enter__.return_value = connection
+    return connection
+
+def executed_statements(connection):
+    return [call.args[0].text for call in connection.execute.call_args_list]
+
+def test_parse_plan_accepts_raw_and_decoded_json():
+    plan = explain_output(123.5, 42, "Hash Join")
+    for output in (plan, json.dumps(plan)):
+        estimate = parse_plan(output)
+        assert (estimate.total_cost, estimate.plan_rows, estimate.node_type) == (123.5, 42, "Hash Join")
+
+def test_transaction_guard_statements():
+    assert transaction_guard_statements(2500) == ["SET TRANSACTION READ ONLY", "SET LOCAL statement_timeout = 2500"]
+    assert transaction_guard_statements(0) == ["SET TRANSACTION READ ONLY"]
+
+def test_guard_rejects_expensive_plan_before_execution(postgres_executor):
+    connection = connect(postgres_executor, explain_output(5e6, 2e8, "Nested Loop"))
+
+    with pytest.raises(QueryTooExpensiveException) as excinfo:
+        postgres_executor.execute("SELECT * FROM ai_service_usage a, ai_service_usage b;")
+
+    assert excinfo.value.http_status == 403
+    assert excinfo.value.details["estimated_cost"] == 5e6
+    assert executed_statements(connection) == [
+        "SET TRANSACTION READ ONLY",
+        "SET LOCAL statement_timeout = 5000",
+        "EXPLAIN (FORMAT JSON) SELECT * FROM ai_service_usage a, ai_service_usage b;",
+    ]
+    assert postgres_executor.plan_stats()["rejected"] == 1
+
+def test_guard_records_estimates_and_actual_rows(postgres_executor):
+    connection = connect(postgres_executor, explain_output(12.0, 3), rows=[(1,), (2,)])
+
+    result = postgres_executor.execute("SELECT id FROM ai_services;")
+
+    assert result.rows == [(1,), (2,)]
+    assert executed_statements(connection)[-1] == "SELECT id FROM ai_services;"
+    stats = postgres_executor.plan_stats()
+    assert stats["checked"] == 1 and stats["rejected"] == 0
+    assert stats["recent"][-1]["estimated_rows"] == 3
+    assert stats["recent"][-1]["actual_rows"] == 2
+
+def test_guard_skipped_for_other_dialects():
+    guard = QueryCostGuard(max_cost=1.0)
+    with patch("langchain_community.utilities.sql_database.SQLDatabase.from_uri") as mock_from_uri:
+        mock_from_uri.return_value._engine.dialect.name = "sqlite"
+        executor = LangChainExecutor(db_url="sqlite:///:memory:", max_rows=0, cost_guard=guard)
+    connection = connect(executor, None, rows=[(1,)])
+
+    executor.execute("SELECT id FROM ai_services;")
+
+    assert executed_statements(connection) == ["SELECT id FROM ai_services;"]
+    assert guard.stats()["checked"] == 0
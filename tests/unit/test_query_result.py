@@ -0,0 +1,49 @@
+from datetime import date
+from decimal import Decimal
+
+from app.models.query_result import QueryResult
+from app.utils.column_types import describe_column_types
+from app.utils.sanitize import sanitize_rows
+from app.services.implementations.pdf_report_service import PDFReportService
+
+def make_result(rows):
+    return QueryResult(
+        question="Token usage",
+        headers=["user_name", "tokens", "usage_date"],
+        rows=rows,
+        execution_time_ms=5,
+        sql="SELECT user_name, tokens, usage_date FROM ai_service_usage;",
+    )
+
+def test_query_result_uses_slots():
+    result = make_result([])
+    assert not hasattr(result, "__dict__")
+
+def test_row_views_do_not_copy_rows():
+    rows = [("alice", 1200, date(2024, 12, 1)), ("bob", None, date(2024, 12, 2))]
+    result = make_result(rows)
+
+    assert result.rows is rows
+    assert result.row_count == 2
+    assert list(result.iter_rows(limit=1)) == [rows[0]]
+    assert list(result.column("tokens")) == [1200, None]
+    assert list(result.column(0)) == ["alice", "bob"]
+    assert next(result.iter_dicts()) == {"user_name": "alice", "tokens": 1200, "usage_date": date(2024, 12, 1)}
+
+def test_describe_column_types():
+    rows = [(None, Decimal("0.5"), "x"), (True, Decimal("1.5"), "y")]
+    description = [("available", None), ("price", 1700), ("name", None)]
+    assert describe_column_types(description, rows) == ["boolean", "numeric", "text"]
+    assert describe_column_types(None, rows) == []
+
+def test_sanitize_rows_accepts_tuples():
+    rows = [("alice", None)]
+    assert sanitize_rows(rows, headers=["user_name", "tokens"]) == [{"user_name": "alice", "tokens": "NULL"}]
+
+def test_pdf_table_data_truncates_and_limits_rows():
+    rows = [("x" * 60, i, None) for i in range(5)]
+    table_data = PDFReportService()._format_table_data(make_result(rows), max_rows=2)
+
+    assert table_data[0] == ["user_name", "tokens", "usage_date"]
+    assert len(table_data) == 3
+    assert table_data[1] == ["x" * 47 + "...", "0", ""]
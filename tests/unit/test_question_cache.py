@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from app.services.implementations.cached_text_to_sql import CachedTextToSql
+from app.utils.cache import TTLCache, SqliteTTLCache
+from app.utils.text_normalize import normalize_question
+
+@pytest.fixture
+def inner_text_to_sql():
+    service = MagicMock()
+    service.prompt_fingerprint = "v1"
+    service.generate_sql = AsyncMock(return_value="SELECT name FROM ai_services;")
+    return service
+
+def test_normalize_question():
+    assert normalize_question("  Top THREE models, by price?? ") == "top 3 models by price"
+    assert normalize_question("Top 3 models by price") == "top 3 models by price"
+    assert normalize_question("Usage over 1,000 tokens") == normalize_question("usage over 1000.00 tokens")
+    assert normalize_question("Usage since 2024-12-01!") == "usage since 2024-12-01"
+
+def test_normalize_question_keeps_non_ascii_words_and_decimal_commas():
+    assert normalize_question("Покажи всех пользователей?") == "покажи всех пользователей"
+    assert normalize_question("Покажи всех пользователей") != normalize_question("Покажи все проекты")
+    assert normalize_question("Welche Modelle kosten über 1,5 $?") == normalize_question("welche modelle kosten über 1.50")
+    assert normalize_question("Models over 1,5 dollars") != normalize_question("Models over 15 dollars")
+    assert normalize_question("Projects 1,2,3") != normalize_question("Projects 123")
+    assert normalize_question("使用量はいくら") != normalize_question("プロジェクトはいくつ")
+
+@pytest.mark.asyncio
+async def test_cached_text_to_sql_hits_for_equivalent_questions(inner_text_to_sql):
+    service = CachedTextToSql(inner_text_to_sql, TTLCache(max_entries=10))
+
+    first = await service.generate_sql("Which models are available?")
+    second = await service.generate_sql("which models are  AVAILABLE")
+
+    assert first == second == "SELECT name FROM ai_services;"
+    inner_text_to_sql.generate_sql.assert_awaited_once_with("Which models are available?")
+    assert service.cache_stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_cache_key_depends_on_prompt_fingerprint(inner_text_to_sql):
+    cache = TTLCache(max_entries=10)
+    service = CachedTextToSql(inner_text_to_sql, cache)
+    await service.generate_sql("Which models are available?")
+
+    inner_text_to_sql.prompt_fingerprint = "v2"
+    await service.generate_sql("Which models are available?")
+
+    assert inner_text_to_sql.generate_sql.await_count == 2
+    assert len(cache) == 2
+
+@pytest.mark.asyncio
+async def test_unsafe_sql_is_not_cached(inner_text_to_sql):
+    inner_text_to_sql.generate_sql.return_value = "DELETE FROM ai_services;"
+    cache = TTLCache(max_entries=10)
+    service = CachedTextToSql(inner_text_to_sql, cache)
+
+    await service.generate_sql("Remove everything")
+    assert len(cache) == 0
+
+def test_sqlite_cache_persists_and_evicts(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SqliteTTLCache(path, max_entries=2, ttl_seconds=60, table="question_sql_cache", clock=clock)
+    cache.set("a", "SELECT 1")
+    clock.now += 1
+    cache.set("b", "SELECT 2")
+    clock.now += 1
+    assert cache.get("a") == "SELECT 1"
+    clock.now += 1
+    cache.set("c", "SELECT 3")
+    cache.close()
+
+    reopened = SqliteTTLCache(path, max_entries=2, ttl_seconds=60, table="question_sql_cache", clock=clock)
+    assert reopened.get("b") is None
+    assert reopened.get("a") == "SELECT 1"
+    assert reopened.get("c") == "SELECT 3"
+
+    clock.now += 120
+    assert reopened.get("a") is None
+    assert reopened.stats()["expirations"] == 1
+    reopened.close()
+
+def test_wired_chain_keys_on_prompt_fingerprint(monkeypatch):
+    from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+    from app.services.implementations.rule_based_text_to_sql import RuleBasedTextToSql
+    from app.services.implementations.similar_question_text_to_sql import SimilarQuestionTextToSql
+    from app.utils.dependencies import get_text_to_sql_service
+
+    for name in ("QUESTION_CACHE_ENABLED", "SIMILAR_QUESTION_ENABLED", "TEXT_TO_SQL_RULES_ENABLED"):
+        monkeypatch.setenv(name, "true")
+    chain = get_text_to_sql_service(client=MagicMock())
+
+    assert isinstance(chain, CachedTextToSql)
+    assert isinstance(chain.text_to_sql_service, SimilarQuestionTextToSql)
+    assert isinstance(chain.text_to_sql_service.text_to_sql_service, RuleBasedTextToSql)
+    assert chain.text_to_sql_service.prompt_fingerprint
+    key = chain.cache_key("Show all services")
+    monkeypatch.setattr(OpenAITextToSql, "PROMPT_VERSION", OpenAITextToSql.PROMPT_VERSION + "-next")
+    assert chain.cache_key("Show all services") != key
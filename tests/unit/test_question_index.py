@@ -0,0 +1,125 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.services.implementations.similar_question_text_to_sql import SimilarQuestionTextToSql
+from app.utils.question_index import QuestionIndex
+
+class RecordingTextToSql:
+    def __init__(self, sql="SELECT 1;"):
+        self.sql = sql
+        self.calls = []
+
+    async def generate_sql(self, question, examples=None):
+        self.calls.append((question, examples))
+        return self.sql
+
+def test_index_ranks_closest_question_first():
+    index = QuestionIndex()
+    index.add("How many times each model was used?", "SELECT model, COUNT(*) FROM usage GROUP BY model;")
+    index.add("Which countries do clients come from?", "SELECT DISTINCT country FROM ai_projects;")
+    index.add("Total tokens per user", "SELECT user_name, SUM(prompt_tokens) FROM ai_service_usage GROUP BY user_name;")
+
+    matches = index.search("how many times was each model used", k=2)
+
+    assert len(matches) == 2
+    assert matches[0].question == "How many times each model was used?"
+    assert matches[0].score > matches[1].score
+    assert index.search("How many times each model was used?", k=1)[0].score == pytest.approx(1.0, abs=1e-5)
+
+def test_index_insert_is_incremental_and_deduplicates():
+    index = QuestionIndex(max_entries=2)
+
+    assert index.add("Show all services", "SELECT * FROM ai_services;")
+    assert index.add("show ALL services!", "SELECT id, name FROM ai_services;")
+    assert len(index) == 1
+    assert index.search("show all services", k=1)[0].sql == "SELECT id, name FROM ai_services;"
+
+    assert index.add("List projects", "SELECT * FROM ai_projects;")
+    assert not index.add("List users", "SELECT user_name FROM ai_service_usage;")
+    assert index.stats()["size"] == 2
+
+def test_index_search_on_empty_or_unrelated_input():
+    index = QuestionIndex()
+    assert index.search("anything") == []
+
+    index.add("Show all services", "SELECT * FROM ai_services;")
+    assert index.search("???") == []
+    assert index.search("zzz qqq", min_score=0.5) == []
+
+@pytest.mark.asyncio
+async def test_similar_question_reuses_sql_above_threshold():
+    inner = RecordingTextToSql("SELECT name FROM ai_services WHERE available;")
+    service = SimilarQuestionTextToSql(inner, QuestionIndex(), reuse_threshold=0.9)
+
+    first = await service.generate_sql("Which services are available?")
+    second = await service.generate_sql("which services are available")
+
+    assert first == second
+    assert len(inner.calls) == 1
+    assert service.index.stats()["reused"] == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stored, asked", [
+    ("Show users who used the gpt model", "Show users who never used the gpt model"),
+    ("Show all services that are available", "Show all services that are not available"),
+    ("Show services sorted by price ascending", "Show services sorted by price descending"),
+    ("Which model was used the most", "Which model was used the least"),
+    ("Which model has the min price", "Which model has the max price"),
+    ("Top 3 cheapest models", "Top 5 cheapest models"),
+])
+async def test_similar_question_does_not_reuse_sql_of_opposite_question(stored, asked):
+    inner = RecordingTextToSql("SELECT 2;")
+    index = QuestionIndex()
+    index.add(stored, "SELECT 1;")
+    service = SimilarQuestionTextToSql(inner, index)
+
+    assert await service.generate_sql(asked) == "SELECT 2;"
+    assert [question for question, _ in inner.calls] == [asked]
+    assert "reused" not in index.stats()
+
+@pytest.mark.asyncio
+async def test_similar_question_reuses_rephrasing_with_filler_words():
+    inner = RecordingTextToSql("SELECT 2;")
+    index = QuestionIndex()
+    index.add("Show me all services that are available", "SELECT 1;")
+    service = SimilarQuestionTextToSql(inner, index, reuse_threshold=0.9)
+
+    assert await service.generate_sql("show all the services that are available?") == "SELECT 1;"
+    assert inner.calls == []
+
+@pytest.mark.asyncio
+async def test_similar_question_passes_neighbours_as_examples():
+    inner = RecordingTextToSql("SELECT model FROM ai_services ORDER BY input_price_per_1k_tokens LIMIT 5;")
+    index = QuestionIndex()
+    index.add("Top 3 cheapest models", "SELECT model FROM ai_services ORDER BY input_price_per_1k_tokens LIMIT 3;")
+    service = SimilarQuestionTextToSql(inner, index, reuse_threshold=0.9, example_threshold=0.2)
+
+    await service.generate_sql("Top 5 cheapest models")
+
+    question, examples = inner.calls[0]
+    assert question == "Top 5 cheapest models"
+    assert examples == [("Top 3 cheapest models", "SELECT model FROM ai_services ORDER BY input_price_per_1k_tokens LIMIT 3;")]
+    assert len(index) == 2
+
+@pytest.mark.asyncio
+async def test_similar_question_skips_examples_for_services_without_support():
+    inner = MagicMock()
+    inner.generate_sql = AsyncMock(return_value="DROP TABLE ai_services;")
+    index = QuestionIndex()
+    index.add("Remove the services table please", "SELECT 1;")
+    service = SimilarQuestionTextToSql(inner, index, example_threshold=0.1)
+
+    await service.generate_sql("Drop the services table")
+
+    inner.generate_sql.assert_awaited_once_with("Drop the services table")
+    assert len(index) == 1
+
+def test_build_messages_includes_examples():
+    service = OpenAITextToSql(client=MagicMock())
+
+    messages = service.build_messages("Top 5 models", [("Top 3 models", "SELECT model FROM ai_services LIMIT 3;")])
+    prompt = messages[-1]["content"]
+
+    assert "Question: Top 3 models\nSQL: SELECT model FROM ai_services LIMIT 3;" in prompt
+    assert prompt.index("Top 3 models") < prompt.index("QUESTION: Top 5 models")
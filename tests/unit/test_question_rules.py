@@ -0,0 +1,110 @@
+import pytest
+from sqlalchemy import create_engine
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.implementations.rule_based_text_to_sql import RuleBasedTextToSql
+from app.utils.question_rules import QuestionRules
+from app.utils.schema_catalog import SchemaCatalog
+from app.utils.sql_safety import is_safe_query
+
+@pytest.mark.parametrize("question, rule", [
+    ("How many times each model was used?", "count_by_model"),
+    ("Usage count per provider", "count_by_provider"),
+    ("Total tokens per user", "tokens_by_user_name"),
+    ("token totals by client", "tokens_by_client_name"),
+    ("Usage by country in 2024", "count_by_country"),
+    ("Completion tokens per service since 2024-03-01", "completion_tokens_by_service_name"),
+    ("Token usage per day in the last 7 days", "tokens_by_usage_date"),
+])
+def test_common_shapes_match(question, rule):
+    match = QuestionRules().match(question)
+
+    assert match is not None and match.rule == rule
+    assert is_safe_query(match.sql)
+
+@pytest.mark.parametrize("question", [
+    "Show all users",
+    "Show all OpenAI models",
+    "Clients from USA",
+    "Group models by provider",
+    "All active user by total token usage",
+    "Top 5 users by tokens",
+    "Usage per country since 2024-02-30",
+    "Usage per model in 2023 and in 2024",
+    "Users usage",
+    "Total tokens of users",
+])
+def test_other_questions_fall_through(question):
+    assert QuestionRules().match(question) is None
+
+@pytest.mark.parametrize("question, sql", [
+    ("How many users?", "SELECT COUNT(DISTINCT u.user_name) AS user_count\nFROM ai_service_usage u;"),
+    ("number of services", "SELECT COUNT(DISTINCT s.name) AS service_count\nFROM ai_services s;"),
+    ("How many clients in 2024?", (
+        "SELECT COUNT(DISTINCT p.client_name) AS client_count\n"
+        "FROM ai_service_usage u\n"
+        "LEFT JOIN ai_projects p ON u.client_id = p.id\n"
+        "WHERE u.usage_date >= '2024-01-01' AND u.usage_date < '2025-01-01';"
+    )),
+])
+def test_counts_without_grouping_word_are_scalar(question, sql):
+    match = QuestionRules().match(question)
+
+    assert match.sql == sql
+    assert "GROUP BY" not in match.sql
+
+@pytest.mark.parametrize("question", ["How many requests per day?", "number of requests by user", "Usage count for each service"])
+def test_counts_with_grouping_word_are_grouped(question):
+    assert "GROUP BY" in QuestionRules().match(question).sql
+
+def test_generated_sql_follows_prompt_conventions():
+    sql = QuestionRules().match("Prompt tokens per provider between 2024-01-01 and 2024-03-31").sql
+
+    assert sql == (
+        "SELECT COALESCE(s.provider, 'Unknown') AS provider, SUM(u.prompt_tokens) AS total_prompt_tokens\n"
+        "FROM ai_service_usage u\n"
+        "LEFT JOIN ai_services s ON u.service_id = s.id\n"
+        "WHERE u.usage_date BETWEEN '2024-01-01' AND '2024-03-31'\n"
+        "GROUP BY s.provider\n"
+        "ORDER BY total_prompt_tokens DESC;"
+    )
+
+def test_rules_follow_the_schema_catalog(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rules.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE ai_projects (id INTEGER PRIMARY KEY, client_name VARCHAR(255))")
+        connection.exec_driver_sql(
+            "CREATE TABLE ai_service_usage (id INTEGER PRIMARY KEY, project_ref INT REFERENCES ai_projects(id), "
+            "user_name VARCHAR(255), usage_date DATE, prompt_tokens INT, completion_tokens INT)"
+        )
+    catalog = SchemaCatalog(engine, ["ai_services", "ai_projects", "ai_service_usage"])
+    catalog.refresh_sync()
+    rules = QuestionRules(catalog)
+
+    assert "ON u.project_ref = p.id" in rules.match("Tokens per client").sql
+    assert rules.match("Usage per country") is None
+    assert rules.match("Usage per model") is None
+    engine.dispose()
+
+@pytest.mark.asyncio
+async def test_rule_engine_answers_locally_and_falls_through():
+    inner = MagicMock()
+    inner.generate_sql = AsyncMock(return_value="SELECT * FROM ai_projects WHERE country = 'USA';")
+    rules = QuestionRules()
+    text_to_sql = RuleBasedTextToSql(inner, rules)
+
+    local = await text_to_sql.generate_sql("Total tokens per user")
+    remote = await text_to_sql.generate_sql("Clients from USA")
+    streamed = [piece async for piece in text_to_sql.stream_sql("Usage per model")]
+
+    assert local.startswith("SELECT u.user_name AS user_name")
+    assert remote == "SELECT * FROM ai_projects WHERE country = 'USA';"
+    inner.generate_sql.assert_awaited_once_with("Clients from USA")
+    assert len(streamed) == 1 and "GROUP BY s.model" in streamed[0]
+
+    stats = rules.stats()
+    assert (stats["rules"]["lookups"], stats["rules"]["matched"]) == (3, 2)
+    assert stats["rules"]["match_rate"] == round(2 / 3, 4)
+    assert stats["rules"]["by_rule"] == {"tokens_by_user_name": 1, "count_by_model": 1}
+    assert stats["fallback"]["calls"] == 1
+    assert stats["rules"]["latency_p95_us"] is not None
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import create_engine, event
+from unittest.mock import MagicMock
+
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.utils.schema_catalog import SchemaCatalog
+
+TABLES = ["ai_projects", "ai_service_usage"]
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE ai_projects (id INTEGER PRIMARY KEY, client_name VARCHAR(255) NOT NULL, country VARCHAR(255))"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE ai_service_usage (id INTEGER PRIMARY KEY, client_id INT REFERENCES ai_projects(id), "
+            "prompt_tokens INT, usage_date DATE)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO ai_projects (client_name, country) VALUES ('Acme', 'USA'), ('Globex', 'Germany'), ('Initech', 'USA')"
+        )
+    yield engine
+    engine.dispose()
+
+def count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+def test_refresh_renders_schema_with_keys_and_statistics(engine):
+    catalog = SchemaCatalog(engine, TABLES)
+    assert catalog.refresh_sync() == TABLES
+
+    schema = catalog.render()
+    assert "Table ai_projects (\n" in schema
+    assert "rows" not in schema
+    assert "    country: string\n)" in schema
+    assert "USA" not in schema
+    assert "    client_id: int (FK to ai_projects.id)" in schema
+    assert "    usage_date: date" in schema
+    assert catalog.stats()["tables"]["ai_service_usage"] == {"columns": 4, "row_count": 0}
+
+def test_sample_values_are_opt_in(engine):
+    statements = count_statements(engine)
+    SchemaCatalog(engine, TABLES).refresh_sync()
+    assert not any("SELECT DISTINCT" in statement for statement in statements)
+
+    catalog = SchemaCatalog(engine, TABLES, sample_values=True)
+    catalog.refresh_sync()
+
+    assert "    country: string (values: 'Germany', 'USA')" in catalog.render()
+
+def test_fingerprint_survives_restart_after_data_grows(engine):
+    catalog = SchemaCatalog(engine, TABLES, sample_values=True)
+    catalog.refresh_sync()
+    fingerprint = OpenAITextToSql(client=MagicMock(), schema_catalog=catalog).prompt_fingerprint
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO ai_projects (client_name, country) VALUES ('Umbrella', 'France')")
+
+    restarted = SchemaCatalog(engine, TABLES, sample_values=True)
+    restarted.refresh_sync()
+
+    assert "'France'" in restarted.render()
+    assert restarted.fingerprint == catalog.fingerprint
+    assert OpenAITextToSql(client=MagicMock(), schema_catalog=restarted).prompt_fingerprint == fingerprint
+
+def test_refresh_without_ddl_skips_statistics(engine):
+    catalog = SchemaCatalog(engine, TABLES)
+    catalog.refresh_sync()
+    fingerprint = catalog.fingerprint
+    statements = count_statements(engine)
+
+    assert catalog.refresh_sync() == []
+    assert catalog.fingerprint == fingerprint
+    assert not any("COUNT" in statement for statement in statements)
+
+def test_refresh_reanalyzes_only_changed_tables(engine):
+    catalog = SchemaCatalog(engine, TABLES)
+    catalog.refresh_sync()
+    fingerprint = catalog.fingerprint
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE ai_service_usage ADD COLUMN completion_tokens INT")
+
+    assert catalog.refresh_sync() == ["ai_service_usage"]
+    assert "    completion_tokens: int" in catalog.render()
+    assert catalog.fingerprint != fingerprint
+
+def test_text_to_sql_prompt_uses_catalog_schema(engine):
+    catalog = SchemaCatalog(engine, TABLES)
+    text_to_sql = OpenAITextToSql(client=MagicMock(), schema_catalog=catalog)
+    assert text_to_sql.schema == OpenAITextToSql.DATABASE_SCHEMA
+
+    catalog.refresh_sync()
+    fallback_fingerprint = OpenAITextToSql(client=MagicMock()).prompt_fingerprint
+
+    assert catalog.render().strip("\n") in text_to_sql.build_messages("Which countries?")[0]["content"]
+    assert text_to_sql.prompt_fingerprint != fallback_fingerprint
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine
+from unittest.mock import MagicMock
+
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.utils.schema_catalog import SchemaCatalog
+from app.utils.schema_pruning import SchemaPruner
+
+TABLES = ["ai_services", "ai_projects", "ai_service_usage"]
+
+@pytest.fixture
+def catalog(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pruning.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE ai_services (id INTEGER PRIMARY KEY, name VARCHAR(255), provider VARCHAR(255), model VARCHAR(255))"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE ai_projects (id INTEGER PRIMARY KEY, client_name VARCHAR(255), country VARCHAR(255))"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE ai_service_usage (id INTEGER PRIMARY KEY, service_id INT REFERENCES ai_services(id), "
+            "client_id INT REFERENCES ai_projects(id), user_name VARCHAR(255), prompt_tokens INT)"
+        )
+        connection.exec_driver_sql("INSERT INTO ai_services (name, provider, model) VALUES ('Claude', 'Anthropic', 'claude-3')")
+        connection.exec_driver_sql("INSERT INTO ai_projects (client_name, country) VALUES ('Acme', 'USA')")
+    catalog = SchemaCatalog(engine, TABLES, sample_values=True)
+    catalog.refresh_sync()
+    yield catalog
+    engine.dispose()
+
+def test_prune_keeps_only_matching_tables(catalog):
+    pruned = SchemaPruner(catalog).prune("Show all clients from the USA")
+
+    assert pruned.tables == ["ai_projects"]
+    assert "Table ai_projects" in pruned.schema
+    assert "ai_service_usage" not in pruned.schema
+
+def test_prune_adds_tables_needed_to_join(catalog):
+    pruned = SchemaPruner(catalog).prune("Which clients use Anthropic?")
+
+    assert pruned.tables == ["ai_services", "ai_projects", "ai_service_usage"]
+
+def test_prune_falls_back_to_full_schema(catalog):
+    pruned = SchemaPruner(catalog).prune("Hello there")
+
+    assert pruned.tables == TABLES
+    assert pruned.schema == catalog.render()
+
+def test_pruned_prompt_drops_unrelated_examples_and_reports_savings(catalog):
+    pruner = SchemaPruner(catalog)
+    text_to_sql = OpenAITextToSql(client=MagicMock(), schema_catalog=catalog, schema_pruner=pruner)
+
+    prompt = text_to_sql.build_messages("Show all clients from the USA")[0]["content"]
+
+    assert "Table ai_services" not in prompt
+    assert "Question: Full usage report" not in prompt
+    stats = pruner.stats()
+    assert stats["requests"] == 1 and stats["pruned"] == 1
+    assert stats["saved_tokens"] == stats["full_tokens"] - stats["prompt_tokens"] > 0
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+
+from app.models.query_result import ResultSet
+from app.services.implementations.cached_sql_executor import CachedSqlExecutor
+from app.services.implementations.sql_query_service import SqlQueryService
+from app.utils.cache import TTLCache
+from app.utils.singleflight import SingleFlight
+from app.exceptions.domain import DatabaseExecutionException
+
+def slow(result=None, error=None, delay=0.05):
+    calls = []
+
+    async def func(*args):
+        calls.append(args)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return func, calls
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_questions_share_one_run():
+    generate_sql, generate_calls = slow("SELECT user_name FROM ai_service_usage;")
+    execute, execute_calls = slow(ResultSet(["user_name"], [("alice",)]))
+    text_to_sql, executor = MagicMock(), MagicMock()
+    text_to_sql.generate_sql, executor.execute = generate_sql, execute
+    flight = SingleFlight()
+    service = SqlQueryService(text_to_sql, executor, question_flight=flight)
+
+    questions = ["Show all users", "show all users?", "  Show ALL users "]
+    results = await asyncio.gather(*(service.process_question(question) for question in questions))
+
+    assert len(generate_calls) == 1 and len(execute_calls) == 1
+    assert [result.question for result in results] == questions
+    assert all(result.rows == [("alice",)] for result in results)
+    stats = flight.stats()
+    assert (stats["leaders"], stats["followers"], stats["in_flight"]) == (1, 2, 0)
+    assert stats["coalesced_ratio"] == round(2 / 3, 4)
+
+@pytest.mark.asyncio
+async def test_followers_receive_the_leaders_exception():
+    generate_sql, _ = slow("SELECT 1;")
+    execute, execute_calls = slow(error=DatabaseExecutionException(sql_preview="SELECT 1;"))
+    text_to_sql, executor = MagicMock(), MagicMock()
+    text_to_sql.generate_sql, executor.execute = generate_sql, execute
+    service = SqlQueryService(text_to_sql, executor, question_flight=SingleFlight())
+
+    results = await asyncio.gather(
+        service.process_question("Broken question"),
+        service.process_question("broken question"),
+        return_exceptions=True,
+    )
+
+    assert len(execute_calls) == 1
+    assert all(isinstance(result, DatabaseExecutionException) for result in results)
+    assert results[0].details["sql_query"] == "SELECT 1;"
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+    work, calls = slow("done", delay=0.05)
+
+    leader = asyncio.create_task(flight.run("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.run("key", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "done"
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_cached_executor_coalesces_identical_misses():
+    execute, calls = slow(ResultSet(["id"], [(1,)]))
+    backend = MagicMock()
+    backend.execute = execute
+    executor = CachedSqlExecutor(backend, TTLCache(max_entries=8), ["ai_services"], flight=SingleFlight())
+
+    results = await asyncio.gather(
+        executor.execute("SELECT id FROM ai_services;"),
+        executor.execute("SELECT id\n  FROM ai_services"),
+    )
+
+    assert len(calls) == 1
+    assert results[0] is results[1]
+    assert executor.flight_stats()["followers"] == 1
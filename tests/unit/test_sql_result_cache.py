@@ -0,0 +1,97 @@
+import pytest
+from unittest.mock import MagicMock
+
+from app.models.query_result import ResultSet
+from app.services.implementations.cached_sql_executor import CachedSqlExecutor
+from app.utils.cache import TTLCache
+from app.utils.sql_text import normalize_sql, referenced_tables
+
+KNOWN_TABLES = ["ai_services", "ai_projects", "ai_service_usage"]
+
+@pytest.fixture
+def inner_executor():
+    executor = MagicMock()
+    executor.execute.side_effect = lambda sql: ResultSet(["n"], [(1,)], ["integer"])
+    return executor
+
+@pytest.fixture
+def cached_executor(inner_executor, clock):
+    cache = TTLCache(max_entries=2, ttl_seconds=60, clock=clock)
+    return CachedSqlExecutor(inner_executor, cache, known_tables=KNOWN_TABLES)
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT  *\n  FROM ai_services ;") == "SELECT * FROM ai_services"
+    assert normalize_sql("SELECT 'a  b' FROM t") == "SELECT 'a  b' FROM t"
+    assert normalize_sql("SELECT 'x;'  ;") == "SELECT 'x;'"
+
+def test_referenced_tables():
+    sql = 'SELECT * FROM ai_service_usage u LEFT JOIN "ai_services" s ON u.service_id = s.id'
+    assert referenced_tables(sql, KNOWN_TABLES) == {"ai_service_usage", "ai_services"}
+
+def test_ttl_cache_lru_eviction(clock):
+    cache = TTLCache(max_entries=2, ttl_seconds=None, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_cache_expiry(clock):
+    cache = TTLCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl_seconds=20)
+    clock.now += 10
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_ttl_cache_tag_invalidation(clock):
+    cache = TTLCache(max_entries=10, clock=clock)
+    cache.set("q1", 1, tags={"ai_services"})
+    cache.set("q2", 2, tags={"ai_services", "ai_projects"})
+    cache.set("q3", 3, tags={"ai_projects"})
+
+    assert cache.invalidate_tags(["ai_services"]) == 2
+    assert "q3" in cache
+    assert len(cache) == 1
+
+@pytest.mark.asyncio
+async def test_cached_executor_hits_on_normalized_sql(cached_executor, inner_executor):
+    first = await cached_executor.execute("SELECT count(*) AS n FROM ai_services;")
+    second = await cached_executor.execute("select count(*) AS n\n FROM ai_services")
+    third = await cached_executor.execute("SELECT count(*) AS n FROM ai_services")
+
+    assert first is third
+    assert inner_executor.execute.call_count == 2
+    assert second.rows == [(1,)]
+    stats = cached_executor.cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+@pytest.mark.asyncio
+async def test_cached_executor_table_invalidation(cached_executor, inner_executor):
+    await cached_executor.execute("SELECT name FROM ai_services")
+    await cached_executor.execute("SELECT client_name FROM ai_projects")
+
+    assert cached_executor.invalidate_tables(["AI_SERVICES"]) == 1
+    await cached_executor.execute("SELECT name FROM ai_services")
+    await cached_executor.execute("SELECT client_name FROM ai_projects")
+
+    assert inner_executor.execute.call_count == 3
+
+@pytest.mark.asyncio
+async def test_cached_executor_skips_large_results(inner_executor, clock):
+    inner_executor.execute.side_effect = lambda sql: ResultSet(["n"], [(i,) for i in range(5)])
+    executor = CachedSqlExecutor(inner_executor, TTLCache(10, clock=clock), KNOWN_TABLES, max_cached_rows=3)
+
+    await executor.execute("SELECT id FROM ai_services")
+    await executor.execute("SELECT id FROM ai_services")
+    assert inner_executor.execute.call_count == 2
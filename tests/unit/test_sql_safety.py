@@ -0,0 +1,62 @@
+import pytest
+
+from app.utils.sql_safety import SqlSafetyValidator, scan_sql
+
+@pytest.mark.parametrize("sql", [
+    "SELECT name FROM ai_services WHERE description LIKE '%DELETE%';",
+    "SELECT created_at, updated_by, drop_rate FROM ai_service_usage",
+    "WITH recent AS (SELECT * FROM ai_service_usage) SELECT * FROM recent;",
+    "(SELECT 1) UNION ALL (SELECT 2)",
+    "SELECT 'it''s' AS \"update\" -- DROP TABLE x\nFROM t;",
+    "SELECT /* outer /* DROP */ still comment */ 1",
+    "SELECT $body$ DELETE FROM t; $body$ AS text",
+    "SELECT 1; -- trailing comment",
+])
+def test_scan_sql_accepts_read_only_statements(sql):
+    assert scan_sql(sql) is None
+
+@pytest.mark.parametrize("sql, reason", [
+    ("", "empty statement"),
+    ("UPDATE t SET x = 1", "statement starts with UPDATE"),
+    ("SELECT 1; DROP TABLE t", "multiple statements"),
+    ("WITH gone AS (DELETE FROM t RETURNING *) SELECT * FROM gone", "forbidden keyword DELETE"),
+    ("SELECT * INTO backup FROM t", "forbidden keyword INTO"),
+    ("SELECT pg_sleep(60)", "forbidden keyword PG_SLEEP"),
+    ("SELECT * FROM t FOR SHARE", "row locking clause"),
+    ("SELECT E'\\'' ; DROP TABLE t", "multiple statements"),
+    ("SELECT 'abc", "unterminated quoted text"),
+    ("SELECT /* abc", "unterminated comment"),
+    ("SELECT $x$ abc", "unterminated dollar-quoted string"),
+])
+def test_scan_sql_rejects_unsafe_statements(sql, reason):
+    assert scan_sql(sql) == reason
+
+@pytest.mark.parametrize("sql, function", [
+    ("SELECT query_to_xml('DELETE FROM t RETURNING *', true, false, '')", "QUERY_TO_XML"),
+    ("SELECT query_to_xml_and_xmlschema('SELECT * FROM pg_authid', true, false, '')", "QUERY_TO_XML_AND_XMLSCHEMA"),
+    ("SELECT query_to_xmlschema('SELECT 1', true, false, '')", "QUERY_TO_XMLSCHEMA"),
+    ("SELECT cursor_to_xml('c', 10, true, false, '')", "CURSOR_TO_XML"),
+    ("SELECT pg_read_binary_file('/etc/passwd')", "PG_READ_BINARY_FILE"),
+    ("SELECT lo_import('/etc/passwd')", "LO_IMPORT"),
+    ("SELECT lo_export(16384, '/tmp/out')", "LO_EXPORT"),
+    ("SELECT * FROM dblink('host=x', 'SELECT 1') AS t(n int)", "DBLINK"),
+    ("SELECT dblink_exec('host=x', 'DROP TABLE t')", "DBLINK_EXEC"),
+    ("SELECT dblink_connect('c', 'host=x')", "DBLINK_CONNECT"),
+    ("SELECT dblink_send_query('c', 'DELETE FROM t')", "DBLINK_SEND_QUERY"),
+    ("SELECT * FROM public.DbLink_Get_Result('c') AS t(n int)", "DBLINK_GET_RESULT"),
+])
+def test_scan_sql_rejects_functions_that_run_sql_or_read_files(sql, function):
+    assert scan_sql(sql) == f"forbidden keyword {function}"
+
+def test_validator_caches_verdicts():
+    validator = SqlSafetyValidator(cache_size=8)
+    sql = "SELECT * FROM ai_services"
+
+    assert validator.is_safe(sql) is True
+    assert validator.is_safe(sql) is True
+    assert validator.unsafe_reason("DROP TABLE ai_services") == "statement starts with DROP"
+    assert validator.unsafe_reason("DROP TABLE ai_services") == "statement starts with DROP"
+
+    stats = validator.cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
@@ -1,74 +1,92 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import os
-import openai 
+import openai
 
 from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.utils.openai_client import create_openai_client
 from app.exceptions.domain import SqlGenerationException, OpenAIServiceException, ConfigurationException
 
+def make_response(content):
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = content
+    return mock_response
+
+@pytest.fixture
+def mock_client():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock()
+    return client
+
 @pytest.fixture
-def openai_text_to_sql_instance():
-    with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-        yield OpenAITextToSql()
+def openai_text_to_sql_instance(mock_client):
+    yield OpenAITextToSql(client=mock_client, timeout=5.0)
 
-def test_generate_sql_success(openai_text_to_sql_instance):
+@pytest.mark.asyncio
+async def test_generate_sql_success(openai_text_to_sql_instance, mock_client):
     question = "Show all clients from USA"
     expected_sql = "SELECT * FROM ai_projects WHERE country = 'USA';"
+    mock_client.chat.completions.create.return_value = make_response(expected_sql)
 
-    with patch("openai.chat.completions.create") as mock_create:
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message.content = expected_sql
-        mock_create.return_value = mock_response
+    generated_sql = await openai_text_to_sql_instance.generate_sql(question)
+    assert generated_sql == expected_sql
+    mock_client.chat.completions.create.assert_awaited_once()
+    args, kwargs = mock_client.chat.completions.create.call_args
+    assert kwargs["model"] == "gpt-4o"
+    assert kwargs["timeout"] == 5.0
+    assert kwargs["messages"][0]["role"] == "system"
+    assert question not in kwargs["messages"][0]["content"]
+    assert question in kwargs["messages"][-1]["content"]
 
-        generated_sql = openai_text_to_sql_instance.generate_sql(question)
-        assert generated_sql == expected_sql
-        mock_create.assert_called_once()
-        args, kwargs = mock_create.call_args
-        assert kwargs["model"] == "gpt-4o"
-        assert question in kwargs["messages"][0]["content"]
-
-def test_generate_sql_empty_content(openai_text_to_sql_instance):
+@pytest.mark.asyncio
+async def test_generate_sql_empty_content(openai_text_to_sql_instance, mock_client):
     question = "Some question"
+    mock_client.chat.completions.create.return_value = make_response("   ")
 
-    with patch("openai.chat.completions.create") as mock_create:
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message.content = "   "
-        mock_create.return_value = mock_response
-
-        with pytest.raises(SqlGenerationException):
-            openai_text_to_sql_instance.generate_sql(question)
+    with pytest.raises(SqlGenerationException):
+        await openai_text_to_sql_instance.generate_sql(question)
 
-def test_generate_sql_openai_api_error(openai_text_to_sql_instance):
+@pytest.mark.asyncio
+async def test_generate_sql_openai_api_error(openai_text_to_sql_instance, mock_client):
     question = "One more question"
+    mock_client.chat.completions.create.side_effect = openai.APIError("API error occurred", request=MagicMock(), body=MagicMock())
 
-    with patch("openai.chat.completions.create") as mock_create:
-        mock_create.side_effect = openai.APIError("API error occurred", request=MagicMock(), body=MagicMock()) 
-
-        with pytest.raises(OpenAIServiceException):
-            openai_text_to_sql_instance.generate_sql(question)
+    with pytest.raises(OpenAIServiceException):
+        await openai_text_to_sql_instance.generate_sql(question)
 
 def test_init_missing_api_key():
     original_api_key = os.environ.pop("OPENAI_API_KEY", None)
-    
+
     with pytest.raises(ConfigurationException) as excinfo:
         OpenAITextToSql()
     assert "OPENAI_API_KEY" in str(excinfo.value)
-    
+
     if original_api_key is not None:
         os.environ["OPENAI_API_KEY"] = original_api_key
 
-def test_generate_sql_strips_markdown(openai_text_to_sql_instance):
+@pytest.mark.asyncio
+async def test_generate_sql_strips_markdown(openai_text_to_sql_instance, mock_client):
     question = "Use report"
     raw_sql_with_markdown = "```sql\nSELECT * FROM usage;\n```"
     expected_sql = "SELECT * FROM usage;"
+    mock_client.chat.completions.create.return_value = make_response(raw_sql_with_markdown)
+
+    generated_sql = await openai_text_to_sql_instance.generate_sql(question)
+    assert generated_sql == expected_sql
 
-    with patch("openai.chat.completions.create") as mock_create:
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message.content = raw_sql_with_markdown
-        mock_create.return_value = mock_response
+@pytest.mark.asyncio
+async def test_create_openai_client_pool_settings():
+    pool_env = {
+        "OPENAI_MAX_CONNECTIONS": "12",
+        "OPENAI_MAX_KEEPALIVE_CONNECTIONS": "6",
+        "OPENAI_MAX_RETRIES": "1",
+    }
+    with patch.dict(os.environ, pool_env):
+        client = create_openai_client(api_key="test-key")
 
-        generated_sql = openai_text_to_sql_instance.generate_sql(question)
-        assert generated_sql == expected_sql
\ No newline at end of file
+    pool = client._client._transport._pool
+    assert pool._max_connections == 12
+    assert pool._max_keepalive_connections == 6
+    assert client.max_retries == 1
+    await client.close()
@@ -0,0 +1,93 @@
+import io
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.exceptions.domain import VoiceTranscriptionException
+from app.services.implementations.cached_voice_to_text import CachedVoiceToText
+from app.utils.cache import TTLCache, SqliteTTLCache
+
+@pytest.fixture
+def inner_voice_to_text():
+    service = MagicMock()
+    service.MODEL = "whisper-1"
+    service.transcribe = AsyncMock(return_value="Show all users")
+    return service
+
+@pytest.mark.asyncio
+async def test_identical_audio_is_transcribed_once(inner_voice_to_text, tmp_path):
+    path = tmp_path / "clip.wav"
+    path.write_bytes(b"RIFF-audio")
+    service = CachedVoiceToText(inner_voice_to_text, TTLCache(max_entries=10))
+    upload = io.BytesIO(b"RIFF-audio")
+
+    first = await service.transcribe(upload, filename="recording.wav")
+    second = await service.transcribe(b"RIFF-audio")
+    third = await service.transcribe(str(path))
+    other = await service.transcribe(b"RIFF-other", filename="other.wav")
+
+    assert first == second == third == other == "Show all users"
+    assert inner_voice_to_text.transcribe.await_args_list[0].args == (upload,)
+    assert inner_voice_to_text.transcribe.await_args_list[0].kwargs == {"filename": "recording.wav"}
+    assert inner_voice_to_text.transcribe.await_count == 2
+    stats = service.cache_stats()
+    assert (stats["lookups"], stats["memory_hits"], stats["misses"], stats["hit_ratio"]) == (4, 2, 2, 0.5)
+
+class ChunkRecordingFile(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+@pytest.mark.asyncio
+async def test_uploads_are_hashed_in_chunks_and_passed_on_rewound(inner_voice_to_text, monkeypatch):
+    monkeypatch.setattr("app.services.implementations.cached_voice_to_text.HASH_CHUNK_BYTES", 4)
+    upload = ChunkRecordingFile(b"RIFF-audio-clip")
+    positions = []
+    inner_voice_to_text.transcribe.side_effect = lambda audio, filename=None: positions.append(audio.tell()) or "Show all users"
+    service = CachedVoiceToText(inner_voice_to_text, TTLCache(max_entries=10))
+
+    assert await service.transcribe(upload, filename="clip.wav") == "Show all users"
+    assert await service.transcribe(b"RIFF-audio-clip") == "Show all users"
+
+    assert upload.reads == [4, 4, 4, 4, 4]
+    assert positions == [0]
+    assert inner_voice_to_text.transcribe.await_count == 1
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_a_restart_and_fills_memory(inner_voice_to_text, tmp_path):
+    path = str(tmp_path / "transcripts.sqlite3")
+    disk = SqliteTTLCache(path, max_entries=10, table="transcription_cache")
+    await CachedVoiceToText(inner_voice_to_text, TTLCache(max_entries=10), disk).transcribe(b"clip")
+    disk.close()
+
+    disk = SqliteTTLCache(path, max_entries=10, table="transcription_cache")
+    memory = TTLCache(max_entries=10)
+    service = CachedVoiceToText(inner_voice_to_text, memory, disk)
+    assert await service.transcribe(b"clip") == "Show all users"
+    assert await service.transcribe(b"clip") == "Show all users"
+
+    assert inner_voice_to_text.transcribe.await_count == 1
+    stats = service.cache_stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+    disk.close()
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached(inner_voice_to_text):
+    inner_voice_to_text.transcribe.side_effect = [VoiceTranscriptionException(), "Show all users"]
+    service = CachedVoiceToText(inner_voice_to_text, TTLCache(max_entries=10))
+
+    with pytest.raises(VoiceTranscriptionException):
+        await service.transcribe(b"clip")
+    assert await service.transcribe(b"clip") == "Show all users"
+    assert inner_voice_to_text.transcribe.await_count == 2
+
+@pytest.mark.asyncio
+async def test_missing_file_is_reported_by_the_wrapped_service(inner_voice_to_text):
+    service = CachedVoiceToText(inner_voice_to_text, TTLCache(max_entries=10))
+
+    await service.transcribe("/nonexistent/clip.wav")
+
+    inner_voice_to_text.transcribe.assert_awaited_once_with("/nonexistent/clip.wav")
@@ -0,0 +1,119 @@
+import json
+import threading
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, AsyncMock
+
+from app.services.implementations.openai_text_to_sql import OpenAITextToSql
+from app.services.implementations.openai_whisper_service import OpenAIWhisperService
+from app.utils.request_context import start_correlation, end_correlation
+from app.utils.usage_accounting import UsageLedger, default_usage_ledger, estimate_cost, summarize
+from app.exceptions.domain import OpenAIServiceException
+
+def make_usage(prompt_tokens, completion_tokens, cached_tokens=0):
+    usage = MagicMock(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    usage.prompt_tokens_details.cached_tokens = cached_tokens
+    return usage
+
+def test_track_records_tokens_cost_and_correlation_id(tmp_path):
+    ledger = UsageLedger(path=str(tmp_path / "usage.jsonl"))
+    token = start_correlation("req-123")
+    try:
+        with ledger.track("sql", "gpt-4o", question="Total tokens per user") as entry:
+            entry.usage = make_usage(2000, 100, cached_tokens=1024)
+        with pytest.raises(OpenAIServiceException):
+            with ledger.track("sql", "gpt-4o"):
+                raise OpenAIServiceException(api_error="down")
+    finally:
+        end_correlation(token)
+    ledger.close()
+
+    first, second = UsageLedger(path=ledger.path).records()
+    assert (first["correlation_id"], first["status"], first["cached_tokens"]) == ("req-123", "ok", 1024)
+    assert first["cost_usd"] == estimate_cost("gpt-4o", 2000, 100, 1024) == round((976 * 0.0025 + 1024 * 0.00125 + 100 * 0.01) / 1000, 6)
+    assert (second["status"], second["error_code"]) == ("error", "OPENAI_SERVICE_ERROR")
+    assert ledger.stats()["errors"] == 1
+
+def test_records_filter_by_time_and_correlation_id():
+    ledger = UsageLedger()
+    ledger.record("sql", "gpt-4o", 0.2, usage=make_usage(10, 5))
+    token = start_correlation("req-9")
+    ledger.record("transcription", "whisper-1", 1.5, audio_seconds=30)
+    end_correlation(token)
+
+    assert len(ledger.records(since=datetime.now(timezone.utc) - timedelta(minutes=1))) == 2
+    assert ledger.records(since=datetime.now(timezone.utc) + timedelta(minutes=1)) == []
+    assert [row["stage"] for row in ledger.records(correlation_id="req-9")] == ["transcription"]
+
+def test_record_leaves_file_writes_to_the_writer_thread(tmp_path, monkeypatch):
+    writers = []
+    def tracking_open(*args, **kwargs):
+        writers.append(threading.get_ident())
+        return open(*args, **kwargs)
+    monkeypatch.setattr("app.utils.usage_accounting.open", tracking_open, raising=False)
+    ledger = UsageLedger(path=str(tmp_path / "usage.jsonl"))
+
+    for _ in range(20):
+        ledger.record("sql", "gpt-4o", 0.1, usage=make_usage(10, 5))
+    assert ledger.flush()
+
+    assert threading.get_ident() not in writers
+    assert len((tmp_path / "usage.jsonl").read_text().splitlines()) == 20
+    ledger.close()
+
+def test_file_records_are_filtered_while_streaming(tmp_path):
+    path = tmp_path / "usage.jsonl"
+    old = {"timestamp": "2026-01-01T00:00:00+00:00", "correlation_id": "req-1", "stage": "sql"}
+    new = {"timestamp": "2026-06-01T00:00:00.500000+00:00", "correlation_id": "req-2", "stage": "transcription"}
+    # The last line is still being appended by another worker.
+    path.write_text(json.dumps(old) + "\n" + json.dumps(new) + "\n" + '{"timestamp": "2026-06-02')
+    ledger = UsageLedger(path=str(path))
+
+    assert [row["stage"] for row in ledger.records()] == ["sql", "transcription"]
+    assert ledger.records(since=datetime(2026, 3, 1)) == [new]
+    assert ledger.records(correlation_id="req-1") == [old]
+    assert ledger.records(since=datetime(2026, 3, 1), correlation_id="req-1") == []
+
+def test_summarize_groups_by_stage_and_model():
+    ledger = UsageLedger()
+    ledger.record("sql", "gpt-4o", 0.2, usage=make_usage(1000, 50))
+    ledger.record("sql", "gpt-4o", 0.8, usage=make_usage(1000, 50))
+    ledger.record("transcription", "whisper-1", 2.0, audio_seconds=60)
+
+    summary = summarize(ledger.records(), top=1)
+
+    assert summary["by_stage"]["sql"]["requests"] == 2
+    assert summary["by_stage"]["sql"]["latency_p95_ms"] == 800.0
+    assert summary["by_model"]["whisper-1"]["audio_seconds"] == 60.0
+    assert summary["totals"]["cost_usd"] == pytest.approx(2 * (2.5 + 0.5) / 1000 + 0.006)
+    assert [row["stage"] for row in summary["slowest"]] == ["transcription"]
+
+@pytest.mark.asyncio
+async def test_generate_sql_is_recorded():
+    client = MagicMock()
+    response = MagicMock()
+    response.choices[0].message.content = "SELECT 1;"
+    response.usage = make_usage(1200, 8)
+    client.chat.completions.create = AsyncMock(return_value=response)
+    before = default_usage_ledger.stats()["prompt_tokens"]
+
+    await OpenAITextToSql(client=client).generate_sql("Anything")
+
+    assert default_usage_ledger.stats()["prompt_tokens"] == before + 1200
+    assert default_usage_ledger.records()[-1]["question"] == "Anything"
+
+@pytest.mark.asyncio
+async def test_transcription_records_audio_seconds(tmp_path):
+    audio = tmp_path / "question.webm"
+    audio.write_bytes(b"\x1a\x45\xdf\xa3" + b"\x00" * 64)
+    client = MagicMock()
+    client.audio.transcriptions.create = AsyncMock(return_value=MagicMock(text=" Show all users ", duration=4.2))
+
+    transcript = await OpenAIWhisperService(client=client).transcribe(str(audio))
+
+    assert transcript == "Show all users"
+    _, kwargs = client.audio.transcriptions.create.call_args
+    assert kwargs["response_format"] == "verbose_json"
+    assert kwargs["file"] == ("question.webm", audio.read_bytes())
+    record = default_usage_ledger.records()[-1]
+    assert (record["stage"], record["audio_seconds"], record["cost_usd"]) == ("transcription", 4.2, 0.00042)